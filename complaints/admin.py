@@ -54,17 +54,8 @@ class ComplaintAdmin(admin.ModelAdmin):
     created_by_display.admin_order_field = 'created_by__username'
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        # Менеджер видит все рекламации
-        if hasattr(request.user, 'role') and request.user.role == 'manager':
-            return qs
-        # Клиент видит рекламации только своих машин
-        elif hasattr(request.user, 'role') and request.user.role == 'client':
-            return qs.filter(machine__client=request.user)
-        # Сервисная организация видит рекламации обслуживаемых машин
-        elif hasattr(request.user, 'role') and request.user.role == 'service':
-            return qs.filter(machine__service_organization=request.user)
-        return qs
+        # Та же область видимости, что и в API (silant_project.scoping)
+        return super().get_queryset(request).for_user(request.user)
     
     def save_model(self, request, obj, form, change):
         if not change:  # Только при создании
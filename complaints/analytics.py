@@ -0,0 +1,147 @@
+"""
+Аналитика надежности по рекламациям для /api/analytics/reliability/.
+
+Все показатели считаются агрегатами на стороне базы данных:
+- failures - количество отказов;
+- total_downtime / mean_downtime - суммарный и средний простой, дни;
+- mtbf - средняя наработка на отказ, м/час: среднее приращение наработки
+  между соседними отказами одной машины (внутри группы: для узла отказа -
+  между отказами этого узла). intervals - число таких приращений.
+
+Результат кэшируется по области видимости пользователя и набору фильтров.
+Версия кэша меняется при изменении рекламаций, машин и справочников
+(см. complaints.signals), поэтому устаревшие данные не отдаются.
+"""
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import Avg, Count, F, Sum, Window
+from django.db.models.functions import Lag
+
+from directories import cache as directories_cache
+from silant_project.scoping import scope_key
+
+VERSION_KEY = 'complaints:analytics:version'
+RELIABILITY_KEY = 'complaints:reliability:{version}:{directories}:{scope}:{filters}'
+RELIABILITY_TIMEOUT = 60 * 60
+
+# Группировка: (поле группы, поле названия)
+RELIABILITY_GROUPS = {
+    'technique_model': ('machine__technique_model', 'machine__technique_model__name'),
+    'failure_node': ('failure_node', 'failure_node__name'),
+    'engine_model': ('machine__engine_model', 'machine__engine_model__name'),
+    'service_company': ('service_company', 'service_company__name'),
+}
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def invalidate():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def filters_key(params):
+    payload = json.dumps(sorted(params.items()), ensure_ascii=False)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def round_value(value):
+    return round(value, 2) if value is not None else None
+
+
+def mtbf_by_group(queryset, group_field=None):
+    """
+    {значение группы: (mtbf, intervals)}.
+    Приращения наработки считаются оконной функцией LAG внутри
+    (машина, группа), усредняются внешним запросом с GROUP BY
+    """
+    partition = [F('machine_id')]
+    if group_field:
+        partition.append(F(group_field))
+    deltas = queryset.order_by().annotate(
+        group_key=F(group_field or 'machine_id'),
+        hours_delta=F('operating_hours') - Window(
+            Lag('operating_hours'),
+            partition_by=partition,
+            order_by=[F('operating_hours').asc(), F('failure_date').asc(), F('id').asc()],
+        ),
+    ).values('group_key', 'hours_delta')
+
+    try:
+        sql, params = deltas.query.sql_with_params()
+    except EmptyResultSet:
+        # Пустая область видимости (queryset.none())
+        return {}
+    if group_field:
+        select, group_by = '"group_key"', ' GROUP BY "group_key"'
+    else:
+        select, group_by = 'NULL', ''
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f'SELECT {select}, AVG("hours_delta"), COUNT("hours_delta") '
+            f'FROM ({sql}) deltas{group_by}',
+            params
+        )
+        return {key: (mtbf, intervals) for key, mtbf, intervals in cursor.fetchall()}
+
+
+def downtime_aggregates():
+    return {
+        'failures': Count('id'),
+        'total_downtime': Sum('downtime'),
+        'mean_downtime': Avg('downtime'),
+    }
+
+
+def format_row(row, mtbf):
+    mtbf_value, intervals = mtbf or (None, 0)
+    return {
+        'failures': row['failures'],
+        'total_downtime': row['total_downtime'] or 0,
+        'mean_downtime': round_value(row['mean_downtime']),
+        'mtbf': round_value(mtbf_value),
+        'intervals': intervals,
+    }
+
+
+def build_reliability(queryset):
+    """Сводка и показатели по каждой группировке"""
+    summary = queryset.aggregate(**downtime_aggregates())
+    report = {'summary': format_row(summary, mtbf_by_group(queryset).get(None))}
+
+    for group, (group_field, name_field) in RELIABILITY_GROUPS.items():
+        mtbf = mtbf_by_group(queryset, group_field)
+        rows = queryset.order_by().values(
+            group_id=F(group_field), name=F(name_field)
+        ).annotate(**downtime_aggregates()).order_by('-failures', 'name')
+        report[group] = [
+            {'id': row['group_id'], 'name': row['name'], **format_row(row, mtbf.get(row['group_id']))}
+            for row in rows
+        ]
+    return report
+
+
+def get_reliability(queryset, user, params):
+    """Отчет из кэша; params - значения фильтров запроса"""
+    key = RELIABILITY_KEY.format(
+        version=get_version(),
+        directories=directories_cache.get_version(),
+        scope=scope_key(user),
+        filters=filters_key(params),
+    )
+    report = cache.get(key)
+    if report is None:
+        report = build_reliability(queryset)
+        cache.set(key, report, RELIABILITY_TIMEOUT)
+    return report
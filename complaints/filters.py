@@ -1,6 +1,6 @@
 import django_filters
-from .models import Complaint
-from directories.models import FailureNode, RecoveryMethod, ServiceCompany
+from .models import Complaint, FailureRollup
+from directories.models import FailureNode, RecoveryMethod, ServiceCompany, TechniqueModel
 
 class ComplaintFilter(django_filters.FilterSet):
     """Фильтры для таблицы рекламаций согласно техническому заданию"""
@@ -56,3 +56,57 @@ class ComplaintFilter(django_filters.FilterSet):
             'failure_date_from',
             'failure_date_to'
         ]
+
+
+class FailureCubeFilter(django_filters.FilterSet):
+    """
+    Детализация среза /api/analytics/failures/. Поля совпадают у куба
+    FailureRollup и рекламаций с полями измерений (complaints.rollup.cube_complaints)
+    """
+    
+    failure_node = django_filters.ModelChoiceFilter(
+        queryset=FailureNode.objects.all(),
+        field_name='failure_node',
+        empty_label="Все узлы отказов"
+    )
+    
+    recovery_method = django_filters.ModelChoiceFilter(
+        queryset=RecoveryMethod.objects.all(),
+        field_name='recovery_method',
+        empty_label="Все способы восстановления"
+    )
+    
+    # У рекламаций technique_model - аннотация с id модели
+    technique_model = django_filters.ModelChoiceFilter(
+        queryset=TechniqueModel.objects.all(),
+        method='filter_technique_model',
+        empty_label="Все модели техники"
+    )
+    
+    # Месяцы отказа: дата внутри месяца означает весь месяц
+    month_from = django_filters.DateFilter(
+        method='filter_month_from',
+        label='Месяц отказа от'
+    )
+    
+    month_to = django_filters.DateFilter(
+        field_name='month',
+        lookup_expr='lte',
+        label='Месяц отказа до'
+    )
+    
+    class Meta:
+        model = FailureRollup
+        fields = [
+            'failure_node',
+            'recovery_method',
+            'technique_model',
+            'month_from',
+            'month_to'
+        ]
+    
+    def filter_technique_model(self, queryset, name, value):
+        return queryset.filter(technique_model=value.pk)
+    
+    def filter_month_from(self, queryset, name, value):
+        return queryset.filter(month__gte=value.replace(day=1))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from complaints.rollup import rebuild_failure_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Полный пересчет куба рекламаций (FailureRollup) для /api/analytics/failures/. '
+        'Нужен после загрузки рекламаций в обход сигналов'
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transaction.atomic():
+            count = rebuild_failure_rollup()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Куб рекламаций пересчитан: {count} ячеек за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0003_complaint_created_by'),
+        ('directories', '0002_directory'),
+        ('machines', '0004_alter_machine_client_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['-failure_date', '-id'], name='complaint_failure_id_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0004_complaint_complaint_failure_id_idx'),
+        ('directories', '0002_directory'),
+        ('machines', '0005_machine_machine_shipment_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='complaint',
+            name='failure_node',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='directories.failurenode', verbose_name='Узел отказа'),
+        ),
+        migrations.AlterField(
+            model_name='complaint',
+            name='machine',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='machines.machine', verbose_name='Машина'),
+        ),
+        migrations.AlterField(
+            model_name='complaint',
+            name='recovery_method',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='directories.recoverymethod', verbose_name='Способ восстановления'),
+        ),
+        migrations.AlterField(
+            model_name='complaint',
+            name='service_company',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='complaint_records', to='directories.servicecompany', verbose_name='Сервисная компания'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['machine', '-failure_date'], name='complaint_machine_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['service_company', '-failure_date'], name='complaint_company_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['failure_node', '-failure_date'], name='complaint_node_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['recovery_method', '-failure_date'], name='complaint_recovery_date_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from silant_project.search import create_fulltext_index, drop_fulltext_index
+
+TABLE = 'complaints_complaint'
+FIELDS = ['failure_description', 'spare_parts']
+CONFIG = 'russian'
+
+
+def create_index(apps, schema_editor):
+    create_fulltext_index(schema_editor, TABLE, FIELDS, CONFIG)
+
+
+def drop_index(apps, schema_editor):
+    drop_fulltext_index(schema_editor, TABLE, FIELDS, CONFIG)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0005_alter_complaint_failure_node_alter_complaint_machine_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
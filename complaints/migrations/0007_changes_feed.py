@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+from silant_project.search import create_fulltext_index, drop_fulltext_index
+
+TABLE = 'complaints_complaint'
+FIELDS = ['failure_description', 'spare_parts']
+CONFIG = 'russian'
+
+
+def create_index(apps, schema_editor):
+    create_fulltext_index(schema_editor, TABLE, FIELDS, CONFIG)
+
+
+def drop_index(apps, schema_editor):
+    drop_fulltext_index(schema_editor, TABLE, FIELDS, CONFIG)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0006_complaint_fulltext_index'),
+    ]
+
+    operations = [
+        # SQLite пересоздает таблицу при добавлении полей и теряет триггеры
+        # полнотекстового индекса: индекс удаляется и строится заново
+        migrations.RunPython(drop_index, create_index),
+        migrations.AddField(
+            model_name='complaint',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Создано'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='complaint',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменено'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['updated_at', 'id'], name='complaint_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['created_at'], name='complaint_created_idx'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
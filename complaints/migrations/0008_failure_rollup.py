@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+
+def fill_rollup(apps, schema_editor):
+    """Куб по существующим рекламациям"""
+    Complaint = apps.get_model('complaints', 'Complaint')
+    FailureRollup = apps.get_model('complaints', 'FailureRollup')
+    cells = Complaint.objects.order_by().annotate(
+        technique_model=F('machine__technique_model'), month=TruncMonth('failure_date')
+    ).values('failure_node', 'recovery_method', 'technique_model', 'month').annotate(
+        failures=Count('pk'), downtime=Sum('downtime')
+    )
+    FailureRollup.objects.bulk_create([
+        FailureRollup(
+            failure_node_id=cell['failure_node'], recovery_method_id=cell['recovery_method'],
+            technique_model_id=cell['technique_model'], month=cell['month'],
+            failures=cell['failures'], downtime=cell['downtime'] or 0,
+        )
+        for cell in cells.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0007_changes_feed'),
+        ('directories', '0003_maintenance_intervals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailureRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц (первое число)')),
+                ('failures', models.PositiveIntegerField(default=0, verbose_name='Количество отказов')),
+                ('downtime', models.PositiveIntegerField(default=0, verbose_name='Суммарный простой (дни)')),
+                ('failure_node', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='directories.failurenode', verbose_name='Узел отказа')),
+                ('recovery_method', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='directories.recoverymethod', verbose_name='Способ восстановления')),
+                ('technique_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='directories.techniquemodel', verbose_name='Модель техники')),
+            ],
+            options={
+                'verbose_name': 'Ячейка куба рекламаций',
+                'verbose_name_plural': 'Куб рекламаций',
+                'indexes': [models.Index(fields=['month'], name='failure_rollup_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('failure_node', 'recovery_method', 'technique_model', 'month'), name='failure_rollup_cell_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
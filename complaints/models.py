@@ -1,7 +1,13 @@
 from django.db import models
 from django.conf import settings
 from machines.models import Machine
-from directories.models import FailureNode, RecoveryMethod, ServiceCompany
+from directories.models import FailureNode, RecoveryMethod, ServiceCompany, TechniqueModel
+from silant_project.scoping import RoleScopedQuerySet
+
+
+class ComplaintQuerySet(RoleScopedQuerySet):
+    """Рекламации видны в пределах машин пользователя"""
+
 
 class Complaint(models.Model):
     """Модель рекламации"""
@@ -13,13 +19,23 @@ class Complaint(models.Model):
     operating_hours = models.PositiveIntegerField(verbose_name='Наработка, м/час')
     
     # 3. Узел отказа (справочник)
-    failure_node = models.ForeignKey(FailureNode, on_delete=models.CASCADE, verbose_name='Узел отказа')
+    failure_node = models.ForeignKey(
+        FailureNode,
+        on_delete=models.CASCADE,
+        db_index=False,  # индекс complaint_node_date_idx
+        verbose_name='Узел отказа'
+    )
     
     # 4. Описание отказа
     failure_description = models.TextField(verbose_name='Описание отказа')
     
     # 5. Способ восстановления (справочник)
-    recovery_method = models.ForeignKey(RecoveryMethod, on_delete=models.CASCADE, verbose_name='Способ восстановления')
+    recovery_method = models.ForeignKey(
+        RecoveryMethod,
+        on_delete=models.CASCADE,
+        db_index=False,  # индекс complaint_recovery_date_idx
+        verbose_name='Способ восстановления'
+    )
     
     # 6. Используемые запасные части
     spare_parts = models.TextField(blank=True, verbose_name='Используемые запасные части')
@@ -31,13 +47,19 @@ class Complaint(models.Model):
     downtime = models.PositiveIntegerField(verbose_name='Время простоя техники (дни)')
     
     # 9. Машина (база данных машин)
-    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, verbose_name='Машина')
+    machine = models.ForeignKey(
+        Machine,
+        on_delete=models.CASCADE,
+        db_index=False,  # индекс complaint_machine_date_idx
+        verbose_name='Машина'
+    )
     
     # 10. Сервисная компания (справочник)
     service_company = models.ForeignKey(
         ServiceCompany, 
         on_delete=models.CASCADE, 
         related_name='complaint_records',
+        db_index=False,  # индекс complaint_company_date_idx
         verbose_name='Сервисная компания'
     )
     
@@ -50,16 +72,76 @@ class Complaint(models.Model):
         blank=True
     )
     
+    # Время создания и последнего изменения (лента изменений /api/changes/)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Изменено')
+    
+    objects = ComplaintQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Рекламация'
         verbose_name_plural = 'Рекламации'
         ordering = ['-failure_date']
+        indexes = [
+            # Ключ курсорной пагинации: сортировка по умолчанию + id
+            models.Index(fields=['-failure_date', '-id'], name='complaint_failure_id_idx'),
+            # Область видимости (через машину или сервисную компанию) + сортировка по умолчанию
+            models.Index(fields=['machine', '-failure_date'], name='complaint_machine_date_idx'),
+            models.Index(fields=['service_company', '-failure_date'], name='complaint_company_date_idx'),
+            # Фильтры-справочники + диапазон дат отказа
+            models.Index(fields=['failure_node', '-failure_date'], name='complaint_node_date_idx'),
+            models.Index(fields=['recovery_method', '-failure_date'], name='complaint_recovery_date_idx'),
+            # Лента изменений: ключ курсора (updated_at, id), выборка новых записей
+            models.Index(fields=['updated_at', 'id'], name='complaint_updated_id_idx'),
+            models.Index(fields=['created_at'], name='complaint_created_idx'),
+        ]
+    
+    @staticmethod
+    def calculate_downtime(failure_date, recovery_date):
+        """Время простоя, дни: [п.7] - [п.1]"""
+        return (recovery_date - failure_date).days
     
     def save(self, *args, **kwargs):
         # Автоматический расчет времени простоя
         if self.failure_date and self.recovery_date:
-            self.downtime = (self.recovery_date - self.failure_date).days
+            self.downtime = self.calculate_downtime(self.failure_date, self.recovery_date)
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"Рекламация {self.failure_node} - {self.machine.serial_number}"
+
+
+class FailureRollup(models.Model):
+    """
+    Предагрегат рекламаций (см. complaints.rollup): количество отказов и
+    суммарный простой по узлу отказа, способу восстановления, модели техники и месяцу
+    """
+    failure_node = models.ForeignKey(
+        FailureNode,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,  # первое поле уникального ключа ячейки
+        verbose_name='Узел отказа'
+    )
+    recovery_method = models.ForeignKey(
+        RecoveryMethod, on_delete=models.CASCADE, related_name='+', verbose_name='Способ восстановления'
+    )
+    technique_model = models.ForeignKey(
+        TechniqueModel, on_delete=models.CASCADE, related_name='+', verbose_name='Модель техники'
+    )
+    month = models.DateField(verbose_name='Месяц (первое число)')
+    failures = models.PositiveIntegerField(default=0, verbose_name='Количество отказов')
+    downtime = models.PositiveIntegerField(default=0, verbose_name='Суммарный простой (дни)')
+
+    class Meta:
+        verbose_name = 'Ячейка куба рекламаций'
+        verbose_name_plural = 'Куб рекламаций'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['failure_node', 'recovery_method', 'technique_model', 'month'],
+                name='failure_rollup_cell_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='failure_rollup_month_idx'),
+        ]
@@ -1,24 +1,17 @@
 from rest_framework import permissions
 
+from silant_project.scoping import has_role
+
+
 class ComplaintPermission(permissions.BasePermission):
-    """Разрешения для рекламаций в зависимости от роли пользователя"""
+    """
+    Разрешения для рекламаций в зависимости от роли пользователя.
+    Рекламации чужих машин отсекаются в SQL (Complaint.objects.for_user)
+    """
     
     def has_permission(self, request, view):
         # Только авторизованные пользователи имеют доступ к рекламациям
         return request.user.is_authenticated
     
     def has_object_permission(self, request, view, obj):
-        if request.user.is_superuser:
-            return True
-        
-        if hasattr(request.user, 'role'):
-            if request.user.role == 'manager':
-                return True
-            elif request.user.role == 'client':
-                # Клиент имеет доступ только к рекламациям своих машин
-                return obj.machine.client == request.user
-            elif request.user.role == 'service':
-                # Сервисная компания имеет доступ к рекламациям машин, которые она обслуживает
-                return obj.service_company == request.user
-        
-        return False
\ No newline at end of file
+        return has_role(request.user)
@@ -0,0 +1,173 @@
+"""
+Куб рекламаций (FailureRollup) для /api/analytics/failures/.
+
+Ячейка куба - узел отказа x способ восстановления x модель техники x месяц
+отказа: количество отказов и суммарный простой. Любой срез (Парето узлов
+отказа, тренд по месяцам, детализация узла по моделям) - GROUP BY по
+нескольким сотням строк куба вместо чтения таблицы рекламаций.
+
+Ячейки обновляются сигналами (см. complaints.signals): изменение, перенос
+или удаление рекламации пересчитывает ее прежнюю и новую ячейки запросом
+по индексу (узел отказа, дата отказа), смена модели техники у машины -
+ячейки ее рекламаций. Пакетное создание пересчитывает ячейки пакета.
+Полный пересчет - команда rebuild_failure_rollup.
+
+Куб строится по всем рекламациям и подходит менеджерам. Клиенты и
+сервисные организации видят только свои машины: для них тот же срез
+считается по рекламациям их области видимости (таких рекламаций немного).
+"""
+from datetime import date
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from directories.models import FailureNode, RecoveryMethod, TechniqueModel
+from .models import Complaint, FailureRollup
+
+ROLLUP_BATCH_SIZE = 500
+
+# Измерение куба: справочник (None - месяц)
+CUBE_DIMENSIONS = {
+    'failure_node': FailureNode,
+    'recovery_method': RecoveryMethod,
+    'technique_model': TechniqueModel,
+    'month': None,
+}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def cube_complaints(queryset):
+    """Рекламации с полями измерений куба: technique_model и month"""
+    return queryset.annotate(
+        technique_model=F('machine__technique_model'),
+        month=TruncMonth('failure_date'),
+    )
+
+
+def cube_cells(queryset):
+    """Значения ячеек по рекламациям queryset: словари полей измерений, failures и downtime"""
+    return cube_complaints(queryset.order_by()).values(*CUBE_DIMENSIONS).annotate(
+        failures=Count('pk'), downtime=Sum('downtime'),
+    )
+
+
+def rollup_row(values):
+    """Строка куба по значениям ячейки из cube_cells"""
+    return FailureRollup(
+        failure_node_id=values['failure_node'],
+        recovery_method_id=values['recovery_method'],
+        technique_model_id=values['technique_model'],
+        month=values['month'],
+        failures=values['failures'],
+        downtime=values['downtime'] or 0,
+    )
+
+
+def cell_key(values):
+    return tuple(values[name] for name in CUBE_DIMENSIONS)
+
+
+def cell_filter(cell):
+    return Q(**dict(zip(CUBE_DIMENSIONS, cell)))
+
+
+def complaint_cell(complaint, technique_model_id):
+    return (
+        complaint.failure_node_id, complaint.recovery_method_id,
+        technique_model_id, month_start(complaint.failure_date),
+    )
+
+
+def refresh_cells(cells):
+    """
+    Пересчет ячеек (узел, способ, модель, месяц): значения считаются одним
+    запросом по рекламациям их узлов и месяцев, опустевшие ячейки удаляются
+    """
+    cells = {cell for cell in cells if None not in cell}
+    if not cells:
+        return
+    months = [cell[3] for cell in cells]
+    complaints = Complaint.objects.filter(
+        failure_node__in={cell[0] for cell in cells},
+        failure_date__gte=min(months),
+        failure_date__lt=next_month(max(months)),
+    )
+    totals = {cell_key(row): row for row in cube_cells(complaints)}
+
+    empty = [cell for cell in cells if cell not in totals]
+    if empty:
+        FailureRollup.objects.filter(reduce(or_, map(cell_filter, empty))).delete()
+    FailureRollup.objects.bulk_create(
+        [rollup_row(totals[cell]) for cell in cells if cell in totals],
+        batch_size=ROLLUP_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['failure_node', 'recovery_method', 'technique_model', 'month'],
+        update_fields=['failures', 'downtime'],
+    )
+
+
+def rebuild_failure_rollup():
+    """Полный пересчет куба"""
+    FailureRollup.objects.all().delete()
+    rows = FailureRollup.objects.bulk_create(
+        [rollup_row(row) for row in cube_cells(Complaint.objects.all()).iterator()],
+        batch_size=ROLLUP_BATCH_SIZE,
+    )
+    return len(rows)
+
+
+def slice_cube(queryset, group_by):
+    """
+    Срез куба (FailureRollup) или рекламаций с полями измерений (cube_complaints)
+    по измерениям group_by: сводка и строки с долей отказов. Без группировки
+    по месяцу строки идут по убыванию отказов с накопленной долей (Парето)
+    """
+    if queryset.model is FailureRollup:
+        measures = {'failures': Sum('failures'), 'downtime': Sum('downtime')}
+    else:
+        measures = {'failures': Count('pk'), 'downtime': Sum('downtime')}
+    rows = list(queryset.order_by().values(*group_by).annotate(**measures))
+    total = sum(row['failures'] for row in rows)
+
+    # Названия справочников - одним запросом на измерение
+    names = {
+        dimension: CUBE_DIMENSIONS[dimension].objects.in_bulk({row[dimension] for row in rows})
+        for dimension in group_by if CUBE_DIMENSIONS[dimension] is not None
+    }
+    if 'month' in group_by:
+        rows.sort(key=lambda row: (row['month'], -row['failures']))
+    else:
+        rows.sort(key=lambda row: (-row['failures'], -(row['downtime'] or 0)))
+
+    result = []
+    cumulative = 0
+    for row in rows:
+        item = {}
+        for dimension in group_by:
+            if dimension == 'month':
+                item['month'] = row['month'].strftime('%Y-%m')
+            else:
+                record = names[dimension].get(row[dimension])
+                item[dimension] = {'id': row[dimension], 'name': record.name if record else None}
+        cumulative += row['failures']
+        item['failures'] = row['failures']
+        item['downtime'] = row['downtime'] or 0
+        item['share'] = round(row['failures'] / total, 4) if total else 0
+        if 'month' not in group_by:
+            item['cumulative_share'] = round(cumulative / total, 4) if total else 0
+        result.append(item)
+
+    return {
+        'group_by': group_by,
+        'summary': {'failures': total, 'downtime': sum(row['downtime'] or 0 for row in rows)},
+        'rows': result,
+    }
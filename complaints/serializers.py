@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from silant_project.fieldsets import SparseFieldsetSerializerMixin
 from .models import Complaint
 
-class ComplaintSerializer(serializers.ModelSerializer):
+class ComplaintSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     machine_serial = serializers.CharField(source='machine.serial_number', read_only=True)
     machine_model = serializers.CharField(source='machine.technique_model.name', read_only=True)
     service_company_name = serializers.CharField(source='service_company.name', read_only=True)
@@ -47,3 +48,36 @@ class ComplaintSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError("Вы можете создавать рекламации только для обслуживаемых машин")
         
         return super().create(validated_data)
+
+
+class ComplaintBulkItemSerializer(serializers.ModelSerializer):
+    """
+    Элемент пакетного создания рекламаций. Связи передаются id и загружаются
+    для всего пакета сразу, время простоя рассчитывается при вставке
+    (см. silant_project.bulk)
+    """
+    machine = serializers.IntegerField()
+    failure_node = serializers.IntegerField()
+    recovery_method = serializers.IntegerField()
+    service_company = serializers.IntegerField()
+    
+    class Meta:
+        model = Complaint
+        fields = [
+            'machine',
+            'failure_date',
+            'operating_hours',
+            'failure_node',
+            'failure_description',
+            'recovery_method',
+            'spare_parts',
+            'recovery_date',
+            'service_company',
+        ]
+    
+    def validate(self, attrs):
+        if attrs['recovery_date'] < attrs['failure_date']:
+            raise serializers.ValidationError({
+                'recovery_date': 'Дата восстановления не может быть раньше даты отказа'
+            })
+        return attrs
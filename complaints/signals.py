@@ -0,0 +1,74 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+
+from machines.models import Machine
+from . import analytics, rollup
+from .models import Complaint
+
+
+def invalidate_analytics(sender, **kwargs):
+    """Рекламации и машины (модель, клиент, сервис) входят в отчеты аналитики"""
+    analytics.invalidate()
+
+
+for model in (Complaint, Machine):
+    post_save.connect(invalidate_analytics, sender=model, dispatch_uid=f'complaints_analytics_save_{model.__name__}')
+    post_delete.connect(invalidate_analytics, sender=model, dispatch_uid=f'complaints_analytics_delete_{model.__name__}')
+
+
+def machine_technique_model(machine_id):
+    return Machine.objects.filter(pk=machine_id).values_list('technique_model', flat=True).first()
+
+
+def remember_rollup_cell(sender, instance, raw=False, **kwargs):
+    """Ячейка куба, в которой рекламация учтена сейчас (до изменения или удаления)"""
+    instance._rollup_previous_cell = None
+    if instance.pk is None or raw:
+        return
+    row = Complaint.objects.filter(pk=instance.pk).values_list(
+        'failure_node', 'recovery_method', F('machine__technique_model'), 'failure_date'
+    ).first()
+    if row is not None:
+        node, method, technique_model, failure_date = row
+        instance._rollup_previous_cell = (node, method, technique_model, rollup.month_start(failure_date))
+
+
+def refresh_rollup_cells(sender, instance, raw=False, **kwargs):
+    """Пересчет прежней и новой ячеек куба рекламаций"""
+    if raw:
+        return
+    cells = [getattr(instance, '_rollup_previous_cell', None)]
+    if kwargs['signal'] is post_save:
+        cells.append(rollup.complaint_cell(instance, machine_technique_model(instance.machine_id)))
+    rollup.refresh_cells(cell for cell in cells if cell is not None)
+
+
+pre_save.connect(remember_rollup_cell, sender=Complaint, dispatch_uid='complaints_rollup_previous_save')
+pre_delete.connect(remember_rollup_cell, sender=Complaint, dispatch_uid='complaints_rollup_previous_delete')
+post_save.connect(refresh_rollup_cells, sender=Complaint, dispatch_uid='complaints_rollup_save')
+post_delete.connect(refresh_rollup_cells, sender=Complaint, dispatch_uid='complaints_rollup_delete')
+
+
+def remember_machine_model(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous_model = None
+    if instance.pk is not None and not raw:
+        instance._rollup_previous_model = machine_technique_model(instance.pk)
+
+
+def move_machine_cells(sender, instance, created, raw=False, **kwargs):
+    """Смена модели техники переносит рекламации машины в ячейки новой модели"""
+    previous = getattr(instance, '_rollup_previous_model', None)
+    if created or raw or previous is None or previous == instance.technique_model_id:
+        return
+    slices = rollup.cube_complaints(Complaint.objects.filter(machine=instance).order_by()).values_list(
+        'failure_node', 'recovery_method', 'month'
+    ).distinct()
+    rollup.refresh_cells(
+        (node, method, technique_model, month)
+        for node, method, month in slices
+        for technique_model in (previous, instance.technique_model_id)
+    )
+
+
+pre_save.connect(remember_machine_model, sender=Machine, dispatch_uid='complaints_rollup_machine_previous')
+post_save.connect(move_machine_cells, sender=Machine, dispatch_uid='complaints_rollup_machine_save')
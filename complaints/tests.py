@@ -1,3 +1,323 @@
+from datetime import date
+
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from directories.models import FailureNode, RecoveryMethod, ServiceCompany, TechniqueModel
+from machines.models import MachineStats
+from machines.tests import create_complaint, create_machines
+from .models import Complaint, FailureRollup
+from .rollup import cube_complaints, rebuild_failure_rollup, slice_cube
+
+
+class ComplaintSearchTests(TestCase):
+    """Поиск рекламаций (?search=) по полнотекстовому индексу и icontains"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        client = User.objects.create_user('client', password='test', role='client')
+        service = User.objects.create_user('service', password='test', role='service')
+        cls.machine, = create_machines(1, client, service)
+
+        def add(day, failure_description, spare_parts=''):
+            complaint = create_complaint(cls.machine, day)
+            # Изменение обновляет индекс триггером
+            Complaint.objects.filter(pk=complaint.pk).update(
+                failure_description=failure_description, spare_parts=spare_parts,
+            )
+            return complaint
+
+        cls.long = add(date(2023, 3, 1), 'Течь масла из-под крышки клапанов, долив и замена прокладки')
+        cls.short = add(date(2023, 4, 1), 'Течь масла')
+        cls.parts = add(date(2023, 5, 1), 'Не запускается', 'Фильтр масляный')
+        cls.other = add(date(2023, 6, 1), 'Обрыв ремня генератора', 'Ремень')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def search(self, **params):
+        response = self.api.get('/api/complaints/', {'fields': 'id', **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_rank(self):
+        # Короткое совпадение релевантнее длинного, без ?ordering= - по релевантности
+        self.assertEqual(self.search(search='течь масла'), [self.short.pk, self.long.pk])
+        self.assertEqual(
+            self.search(search='течь масла', ordering='failure_date'), [self.long.pk, self.short.pk],
+        )
+
+    def test_prefix_and_fields(self):
+        # Префикс слова, описание и запчасти; регистр не важен
+        self.assertCountEqual(self.search(search='МАСЛ'), [self.short.pk, self.long.pk, self.parts.pk])
+        self.assertEqual(self.search(search='ремень'), [self.other.pk])
+        self.assertEqual(self.search(search='гидроцилиндр'), [])
+        # Совпадения только по icontains (заводской номер) не отбрасываются
+        self.assertEqual(len(self.search(search=self.machine.serial_number)), 4)
+
+
+class ComplaintBulkCreateTests(TestCase):
+    """Пакетный POST списка рекламаций (silant_project.bulk)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        cls.service_user = User.objects.create_user('service', password='test', role='service')
+        other_service = User.objects.create_user('other', password='test', role='service')
+        cls.serviced, = create_machines(1, cls.client_user, cls.service_user)
+        cls.foreign, = create_machines(1, cls.client_user, other_service, start=1)
+        cls.engine = FailureNode.objects.create(name='Двигатель')
+        cls.repair = RecoveryMethod.objects.create(name='Ремонт')
+        cls.service_company = ServiceCompany.objects.create(name='ООО Сервис')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+
+    def item(self, machine, failure_date='2023-04-01', recovery_date='2023-04-06'):
+        return {
+            'machine': machine.pk,
+            'failure_date': failure_date,
+            'operating_hours': 350,
+            'failure_node': self.engine.pk,
+            'failure_description': 'Отказ',
+            'recovery_method': self.repair.pk,
+            'recovery_date': recovery_date,
+            'service_company': self.service_company.pk,
+        }
+
+    def post(self, user, items):
+        self.api.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.api.post('/api/complaints/', items, format='json')
+
+    def test_create(self):
+        response = self.post(self.service_user, [
+            self.item(self.serviced),
+            self.item(self.serviced, failure_date='2023-05-02', recovery_date='2023-05-04'),
+        ])
+        self.assertEqual(response.status_code, 201)
+        # Простой считается при вставке, сводка машины и куб пересчитаны без сигналов
+        self.assertEqual([row['downtime'] for row in response.data], [5, 2])
+        stats = MachineStats.objects.get(machine=self.serviced)
+        self.assertEqual((stats.complaint_count, stats.total_downtime), (2, 7))
+        self.assertEqual(
+            sorted(FailureRollup.objects.values_list('month', 'failures', 'downtime')),
+            [(date(2023, 4, 1), 1, 5), (date(2023, 5, 1), 1, 2)],
+        )
+
+    def test_scope(self):
+        # Клиенты рекламации не вносят, организация - только по обслуживаемым машинам
+        self.assertEqual(self.post(self.client_user, [self.item(self.serviced)]).status_code, 403)
+        response = self.post(self.service_user, [self.item(self.serviced), self.item(self.foreign)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data[0], list(response.data[1])), ({}, ['machine']))
+        self.assertFalse(Complaint.objects.exists())
+
+    def test_item_errors(self):
+        response = self.post(self.service_user, [
+            self.item(self.serviced, recovery_date='2023-03-01'), self.item(self.serviced),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((list(response.data[0]), response.data[1]), (['recovery_date'], {}))
+        self.assertFalse(Complaint.objects.exists())
+
+
+class FailureAnalyticsTests(TestCase):
+    """Срезы рекламаций /api/analytics/failures/ по кубу FailureRollup"""
+
+    CELL_FIELDS = ['failure_node', 'recovery_method', 'technique_model', 'month', 'failures', 'downtime']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        cls.service_user = User.objects.create_user('service', password='test', role='service')
+        other = User.objects.create_user('other', password='test', role='client')
+        # У каждой машины своя модель техники
+        cls.machines = create_machines(2, cls.client_user, cls.service_user)
+        cls.machines += create_machines(1, other, User.objects.create_user('other_service', role='service'), start=2)
+
+        cls.engine = FailureNode.objects.create(name='Двигатель')
+        cls.hydraulics = FailureNode.objects.create(name='Гидросистема')
+        cls.repair = RecoveryMethod.objects.create(name='Ремонт')
+        cls.replacement = RecoveryMethod.objects.create(name='Замена')
+
+        def add(machine, node, day, downtime, method=None):
+            return create_complaint(
+                machine, day, failure_node=node, recovery_method=method or cls.repair, recovery_days=downtime,
+            )
+
+        add(cls.machines[0], cls.engine, date(2024, 1, 10), 3)
+        add(cls.machines[1], cls.engine, date(2024, 2, 5), 2)
+        add(cls.machines[2], cls.hydraulics, date(2024, 2, 20), 4, cls.replacement)
+        add(cls.machines[0], cls.hydraulics, date(2024, 3, 3), 1)
+        add(cls.machines[2], cls.engine, date(2024, 3, 15), 6, cls.replacement)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def get(self, **params):
+        response = self.api.get('/api/analytics/failures/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def cells(self):
+        return list(FailureRollup.objects.order_by(*self.CELL_FIELDS[:4]).values_list(*self.CELL_FIELDS))
+
+    def test_pareto(self):
+        # Срез менеджера - по кубу: группировка и названия узлов
+        with self.assertNumQueries(2):
+            data = self.get()
+        self.assertEqual(data['summary'], {'failures': 5, 'downtime': 16})
+        self.assertEqual(data['rows'], [
+            {'failure_node': {'id': self.engine.pk, 'name': 'Двигатель'},
+             'failures': 3, 'downtime': 11, 'share': 0.6, 'cumulative_share': 0.6},
+            {'failure_node': {'id': self.hydraulics.pk, 'name': 'Гидросистема'},
+             'failures': 2, 'downtime': 5, 'share': 0.4, 'cumulative_share': 1.0},
+        ])
+
+    def test_trend_and_filters(self):
+        data = self.get(group_by='month')
+        self.assertEqual(
+            [(row['month'], row['failures'], row['downtime']) for row in data['rows']],
+            [('2024-01', 1, 3), ('2024-02', 2, 6), ('2024-03', 2, 7)],
+        )
+        self.assertNotIn('cumulative_share', data['rows'][0])
+
+        # Дата внутри месяца означает весь месяц
+        data = self.get(group_by='month', failure_node=self.engine.pk, month_from='2024-02-15')
+        self.assertEqual([(row['month'], row['failures']) for row in data['rows']], [('2024-02', 1), ('2024-03', 1)])
+        data = self.get(group_by='failure_node,recovery_method', month_to='2024-02-01')
+        self.assertEqual(
+            [(row['failure_node']['name'], row['recovery_method']['name'], row['failures']) for row in data['rows']],
+            [('Двигатель', 'Ремонт', 2), ('Гидросистема', 'Замена', 1)],
+        )
+        data = self.get(group_by='technique_model', technique_model=self.machines[2].technique_model_id)
+        self.assertEqual(data['summary'], {'failures': 2, 'downtime': 10})
+        self.assertEqual(self.get(recovery_method=self.replacement.pk)['summary']['failures'], 2)
+
+    def test_invalid_group_by(self):
+        for group_by in ('serial_number', 'month,month'):
+            response = self.api.get('/api/analytics/failures/', {'group_by': group_by})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('group_by', response.data)
+
+    def test_scope(self):
+        # Клиент и сервисная организация - по рекламациям своих машин
+        for user in (self.client_user, self.service_user):
+            self.api.force_authenticate(user)
+            data = self.get()
+            self.assertEqual(data['summary'], {'failures': 3, 'downtime': 6})
+            self.assertEqual([row['failures'] for row in data['rows']], [2, 1])
+
+    def test_cube_matches_complaints(self):
+        # Любой срез куба совпадает со срезом самих рекламаций
+        complaints = cube_complaints(Complaint.objects.all())
+        for group_by in (['failure_node'], ['month'], ['technique_model', 'recovery_method'],
+                         ['failure_node', 'month']):
+            with self.subTest(group_by=group_by):
+                self.assertEqual(
+                    slice_cube(FailureRollup.objects.all(), group_by), slice_cube(complaints, group_by)
+                )
+
+    def test_signals_keep_cube(self):
+        # Изменение, перенос и удаление рекламаций, смена модели техники и удаление
+        # машины дают тот же куб, что и полный пересчет
+        moved = Complaint.objects.get(failure_date=date(2024, 2, 20))
+        moved.failure_node = self.engine
+        moved.failure_date = date(2024, 1, 20)
+        moved.recovery_date = date(2024, 1, 24)
+        moved.save()
+        Complaint.objects.get(failure_date=date(2024, 3, 3)).delete()
+        machine = self.machines[1]
+        machine.technique_model = TechniqueModel.objects.create(name='ПД-новая')
+        machine.save()
+        self.machines[0].delete()
+
+        cells = self.cells()
+        rebuild_failure_rollup()
+        self.assertEqual(cells, self.cells())
+        self.assertEqual(self.get()['summary'], {'failures': 3, 'downtime': 12})
+
+
+class ReliabilityAnalyticsTests(TestCase):
+    """Показатели надежности /api/analytics/reliability/ (complaints.analytics)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        other = User.objects.create_user('other', password='test', role='client')
+        service = User.objects.create_user('service', password='test', role='service')
+        cls.worn, = create_machines(1, other, service)
+        cls.new, = create_machines(1, cls.client_user, service, start=1)
+        cls.engine = FailureNode.objects.create(name='Двигатель')
+        cls.hydraulics = FailureNode.objects.create(name='Гидросистема')
+
+        # Наработка на отказ - приращения между отказами одной машины по наработке
+        create_complaint(cls.worn, date(2024, 1, 10), 100, failure_node=cls.engine, recovery_days=3)
+        create_complaint(cls.worn, date(2024, 2, 1), 250, failure_node=cls.hydraulics, recovery_days=2)
+        create_complaint(cls.worn, date(2024, 3, 1), 300, failure_node=cls.engine, recovery_days=1)
+        create_complaint(cls.new, date(2024, 1, 5), 50, failure_node=cls.engine, recovery_days=4)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def get(self, **params):
+        response = self.api.get('/api/analytics/reliability/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    @staticmethod
+    def metrics(row):
+        return row['failures'], row['total_downtime'], row['mean_downtime'], row['mtbf'], row['intervals']
+
+    def test_report(self):
+        data = self.get()
+        self.assertEqual(self.metrics(data['summary']), (4, 10, 2.5, 100.0, 2))
+        # Для узла отказа - между отказами этого узла
+        self.assertEqual(
+            [(row['name'], *self.metrics(row)) for row in data['failure_node']],
+            [('Двигатель', 3, 8, 2.67, 200.0, 1), ('Гидросистема', 1, 2, 2.0, None, 0)],
+        )
+        self.assertEqual(
+            [(row['id'], row['failures'], row['mtbf']) for row in data['technique_model']],
+            [(self.worn.technique_model_id, 3, 100.0), (self.new.technique_model_id, 1, None)],
+        )
+        self.assertEqual([row['failures'] for row in data['engine_model']], [3, 1])
+        self.assertEqual([row['name'] for row in data['service_company']], ['ООО Сервис'])
+
+    def test_filters(self):
+        data = self.get(failure_node=self.engine.pk)
+        self.assertEqual(self.metrics(data['summary']), (3, 8, 2.67, 200.0, 1))
+        data = self.get(failure_date_from='2024-02-01', machine_serial=self.worn.serial_number)
+        self.assertEqual(self.metrics(data['summary']), (2, 3, 1.5, 50.0, 1))
+        response = self.api.get('/api/analytics/reliability/', {'failure_date_from': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_scope(self):
+        self.api.force_authenticate(self.client_user)
+        data = self.get()
+        self.assertEqual(self.metrics(data['summary']), (1, 4, 4.0, None, 0))
+        self.assertEqual([row['id'] for row in data['technique_model']], [self.new.technique_model_id])
+        self.api.force_authenticate(None)
+        self.assertEqual(self.api.get('/api/analytics/reliability/').status_code, 403)
 
-# Create your tests here.
+    def test_cache(self):
+        self.get()
+        with self.assertNumQueries(0):
+            self.get()
+        # Новая рекламация меняет версию кэша
+        create_complaint(self.new, date(2024, 4, 1), 150, failure_node=self.engine, recovery_days=1)
+        data = self.get()
+        self.assertEqual(self.metrics(data['summary']), (5, 11, 2.2, 100.0, 3))
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ComplaintViewSet
+from .views import ComplaintViewSet, FailureAnalyticsView, ReliabilityAnalyticsView
 
 app_name = 'complaints'
 
@@ -8,5 +8,7 @@ router = DefaultRouter()
 router.register(r'complaints', ComplaintViewSet)
 
 urlpatterns = [
+    path('analytics/reliability/', ReliabilityAnalyticsView.as_view(), name='analytics-reliability'),
+    path('analytics/failures/', FailureAnalyticsView.as_view(), name='analytics-failures'),
     path('', include(router.urls)),
 ]
@@ -1,43 +1,168 @@
-from rest_framework import viewsets
+from django.db import transaction
+from rest_framework import generics, viewsets
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import OrderingFilter, SearchFilter
-from .models import Complaint
-from .serializers import ComplaintSerializer
-from .filters import ComplaintFilter
+from rest_framework.filters import OrderingFilter
+from directories.models import FailureNode, RecoveryMethod, ServiceCompany
+from machines.conditional import ConditionalGetMixin
+from machines.models import Machine
+from machines.query_plan import plan_queryset
+from machines import forecast
+from machines.stats import refresh_machine_stats
+from .models import Complaint, FailureRollup
+from .serializers import ComplaintSerializer, ComplaintBulkItemSerializer
+from .filters import ComplaintFilter, FailureCubeFilter
 from .permissions import ComplaintPermission
+from . import analytics, rollup
+from silant_project.bulk import BulkCreateMixin
+from silant_project.export import ExportMixin
+from silant_project.fieldsets import SparseFieldsetMixin
+from silant_project.pagination import SilantPagination
+from silant_project.scoping import has_full_access
+from silant_project.search import FullTextSearchFilter
 
-class ComplaintViewSet(viewsets.ModelViewSet):
+class ComplaintViewSet(ConditionalGetMixin, SparseFieldsetMixin, BulkCreateMixin, ExportMixin,
+                       viewsets.ModelViewSet):
     """ViewSet для рекламаций с учетом ролей пользователей"""
     queryset = Complaint.objects.all()
     serializer_class = ComplaintSerializer
     permission_classes = [ComplaintPermission]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_class = ComplaintFilter
     ordering_fields = ['failure_date', 'machine__serial_number']
     ordering = ['-failure_date']  # Сортировка по умолчанию по дате отказа
-    search_fields = ['machine__serial_number', 'failure_description']
+    search_fields = ['machine__serial_number', 'failure_description', 'spare_parts']
+    # Описание и запчасти ищутся по полнотекстовому индексу (миграция 0006)
+    fulltext_fields = ['failure_description', 'spare_parts']
+    fulltext_config = 'russian'
+    # Постраничная пагинация или курсорная (?pagination=cursor) для больших таблиц
+    pagination_class = SilantPagination
+    # ETag/Last-Modified учитывают и изменения машины (серийный номер, модель)
+    conditional_related = ['machine']
+    # Колонки выгрузки /api/complaints/export/?format=csv|xlsx
+    export_fields = [
+        ('machine__serial_number', 'Заводской номер машины'),
+        ('machine__technique_model__name', 'Модель техники'),
+        'failure_date',
+        'operating_hours',
+        'failure_node__name',
+        'failure_description',
+        'recovery_method__name',
+        'spare_parts',
+        'recovery_date',
+        'downtime',
+        'service_company__name',
+    ]
+    export_filename = 'complaints'
+    # Пакетный POST списком записей
+    bulk_serializer_class = ComplaintBulkItemSerializer
     
     def get_queryset(self):
-        """Фильтрация рекламаций в зависимости от роли пользователя"""
-        user = self.request.user
-        queryset = Complaint.objects.all()
-        
-        if not user.is_authenticated:
-            return queryset.none()
-        
-        if hasattr(user, 'role'):
-            if user.role == 'client':
-                # Клиент видит рекламации только своих машин
-                queryset = queryset.filter(machine__client=user)
-            elif user.role == 'service':
-                # Сервисная компания видит рекламации машин, которые она обслуживает
-                queryset = queryset.filter(service_company=user)
-            elif user.role == 'manager':
-                # Менеджер видит все рекламации
-                pass
-        
+        """При чтении выбираются только связи и колонки полей ответа (?fields=, ?omit=)"""
+        queryset = self.get_role_queryset()
+        if self.request.method in SAFE_METHODS:
+            return plan_queryset(queryset, self.get_serializer())
         return queryset
     
+    def get_role_queryset(self):
+        """
+        Рекламации машин, доступных пользователю (см. silant_project.scoping).
+        Сервисная организация видит рекламации обслуживаемых машин
+        """
+        return Complaint.objects.for_user(self.request.user)
+    
+    def get_bulk_relations(self):
+        if getattr(self.request.user, 'role', None) == 'client':
+            raise PermissionDenied('Клиенты не могут создавать рекламации')
+        return {
+            # Машины ищутся в области видимости пользователя:
+            # этот же запрос проверяет принадлежность машин
+            'machine': Machine.objects.editable_by(self.request.user).select_related('technique_model'),
+            'failure_node': FailureNode.objects.all(),
+            'recovery_method': RecoveryMethod.objects.all(),
+            'service_company': ServiceCompany.objects.all(),
+        }
+    
+    def prepare_bulk_objects(self, objects):
+        # bulk_create не вызывает Complaint.save(): простой считается здесь
+        for complaint in objects:
+            complaint.downtime = Complaint.calculate_downtime(complaint.failure_date, complaint.recovery_date)
+    
+    def bulk_created(self, objects):
+        # Сигналы post_save при bulk_create не отправляются
+        machine_ids = {complaint.machine_id for complaint in objects}
+        refresh_machine_stats(machine_ids)
+        forecast.schedule_refresh(machine_ids)
+        # Машины загружены в get_bulk_relations вместе с моделью техники
+        rollup.refresh_cells(
+            rollup.complaint_cell(complaint, complaint.machine.technique_model_id) for complaint in objects
+        )
+        transaction.on_commit(analytics.invalidate)
+    
     def perform_create(self, serializer):
         """Автоматически устанавливаем создателя при создании рекламации"""
-        serializer.save(created_by=self.request.user)
\ No newline at end of file
+        serializer.save(created_by=self.request.user)
+
+
+class ReliabilityAnalyticsView(generics.GenericAPIView):
+    """
+    Показатели надежности (наработка на отказ, простой, число отказов)
+    по моделям техники, узлам отказа, моделям двигателей и сервисным компаниям.
+    Учитывает роль пользователя и фильтры списка рекламаций
+    """
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ComplaintFilter
+
+    def get_queryset(self):
+        # Та же область видимости, что и у списка рекламаций (см. silant_project.scoping)
+        return Complaint.objects.for_user(self.request.user)
+
+    def get(self, request):
+        backend = DjangoFilterBackend()
+        filterset = backend.get_filterset(request, self.get_queryset(), self)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        params = {
+            name: request.query_params[name]
+            for name in filterset.filters
+            if request.query_params.get(name)
+        }
+        report = analytics.get_reliability(filterset.qs, request.user, params)
+        return Response(report)
+
+
+class FailureAnalyticsView(generics.GenericAPIView):
+    """
+    Срезы рекламаций по узлу отказа, способу восстановления, модели техники
+    и месяцу (см. complaints.rollup): Парето узлов отказа, тренды, детализация.
+    Доступно по URL: /api/analytics/failures/?group_by=failure_node,month&technique_model=1
+    """
+    permission_classes = [IsAuthenticated]
+    default_group_by = ['failure_node']
+
+    def get_queryset(self):
+        # Куб учитывает все рекламации - по нему отвечаем тем, кто видит все
+        if has_full_access(self.request.user):
+            return FailureRollup.objects.all()
+        return rollup.cube_complaints(Complaint.objects.for_user(self.request.user))
+
+    def get(self, request):
+        group_by = [
+            name.strip() for name in request.query_params.get('group_by', '').split(',') if name.strip()
+        ] or self.default_group_by
+        unknown = [name for name in group_by if name not in rollup.CUBE_DIMENSIONS]
+        if unknown or len(set(group_by)) != len(group_by):
+            raise ValidationError({'group_by': [
+                f'Допустимые измерения без повторов: {", ".join(rollup.CUBE_DIMENSIONS)}'
+            ]})
+
+        # FilterSet создается напрямую: DjangoFilterBackend требует совпадения модели
+        # queryset с моделью FilterSet, а рекламации фильтруются по тем же полям
+        filterset = FailureCubeFilter(request.query_params, queryset=self.get_queryset(), request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return Response(rollup.slice_cube(filterset.qs, group_by))
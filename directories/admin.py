@@ -74,7 +74,7 @@ class SteerAxleModelAdmin(admin.ModelAdmin):
 
 @admin.register(MaintenanceType)
 class MaintenanceTypeAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description', 'maintenance_count']
+    list_display = ['name', 'interval_hours', 'interval_days', 'is_recurring', 'maintenance_count']
     search_fields = ['name', 'description']
     list_per_page = 50
     ordering = ['name']
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DirectoriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'directories'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,75 @@
+"""
+Кэш справочников для /api/directories/bundle/.
+
+Все справочники собираются в один ответ, который хранится в кэше Django
+(по умолчанию - в памяти процесса) под ключом с номером версии. Версия
+меняется только после фиксации сохранения или удаления записи справочника
+(см. directories.signals), поэтому в установившемся режиме ответ отдается
+без обращений к базе данных.
+"""
+import uuid
+
+from django.core.cache import cache
+
+from .models import (
+    TechniqueModel, EngineModel, TransmissionModel,
+    DriveAxleModel, SteerAxleModel, MaintenanceType,
+    FailureNode, RecoveryMethod, ServiceCompany
+)
+from .serializers import (
+    TechniqueModelSerializer, EngineModelSerializer, TransmissionModelSerializer,
+    DriveAxleModelSerializer, SteerAxleModelSerializer, MaintenanceTypeSerializer,
+    FailureNodeSerializer, RecoveryMethodSerializer, ServiceCompanySerializer
+)
+
+VERSION_KEY = 'directories:bundle:version'
+BUNDLE_KEY = 'directories:bundle:{version}'
+
+# Ключ в ответе, модель, сериализатор
+BUNDLE_DIRECTORIES = [
+    ('technique_models', TechniqueModel, TechniqueModelSerializer),
+    ('engine_models', EngineModel, EngineModelSerializer),
+    ('transmission_models', TransmissionModel, TransmissionModelSerializer),
+    ('drive_axle_models', DriveAxleModel, DriveAxleModelSerializer),
+    ('steer_axle_models', SteerAxleModel, SteerAxleModelSerializer),
+    ('maintenance_types', MaintenanceType, MaintenanceTypeSerializer),
+    ('failure_nodes', FailureNode, FailureNodeSerializer),
+    ('recovery_methods', RecoveryMethod, RecoveryMethodSerializer),
+    ('service_companies', ServiceCompany, ServiceCompanySerializer),
+]
+
+BUNDLE_MODELS = [model for _, model, _ in BUNDLE_DIRECTORIES]
+
+
+def get_version():
+    """Текущая версия справочников (создается при первом обращении)"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def invalidate():
+    """Новая версия справочников - старый ответ больше не используется"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def build_bundle():
+    """Все справочники одним словарем"""
+    return {
+        key: serializer(model.objects.order_by('name'), many=True).data
+        for key, model, serializer in BUNDLE_DIRECTORIES
+    }
+
+
+def get_bundle():
+    """(версия, справочники) - из кэша, при промахе собираются из базы"""
+    version = get_version()
+    key = BUNDLE_KEY.format(version=version)
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = build_bundle()
+        cache.set(key, bundle, timeout=None)
+    return version, bundle
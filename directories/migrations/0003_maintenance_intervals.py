@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:20
+
+import re
+
+from django.db import migrations, models
+
+HOURS_IN_NAME = re.compile(r'(\d+)\s*м/час')
+
+
+def fill_intervals(apps, schema_editor):
+    """Периодичность из названия вида ТО: 'ТО-1 (200 м/час)'. ТО-0 - однократная обкатка"""
+    MaintenanceType = apps.get_model('directories', 'MaintenanceType')
+    for maintenance_type in MaintenanceType.objects.all():
+        match = HOURS_IN_NAME.search(maintenance_type.name)
+        if match is None:
+            continue
+        maintenance_type.interval_hours = int(match.group(1))
+        maintenance_type.is_recurring = not maintenance_type.name.startswith('ТО-0')
+        maintenance_type.save(update_fields=['interval_hours', 'is_recurring'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directories', '0002_directory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maintenancetype',
+            name='interval_days',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Периодичность, дней'),
+        ),
+        migrations.AddField(
+            model_name='maintenancetype',
+            name='interval_hours',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Периодичность, м/час'),
+        ),
+        migrations.AddField(
+            model_name='maintenancetype',
+            name='is_recurring',
+            field=models.BooleanField(default=True, help_text='Неповторяющееся ТО (обкатка) проводится один раз', verbose_name='Повторяется'),
+        ),
+        migrations.RunPython(fill_intervals, migrations.RunPython.noop),
+    ]
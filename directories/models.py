@@ -80,6 +80,13 @@ class MaintenanceType(models.Model):
     """Вид ТО"""
     name = models.CharField(max_length=100, unique=True, verbose_name='Название')
     description = models.TextField(blank=True, verbose_name='Описание')
+    # Периодичность для прогноза следующего ТО (см. machines.forecast)
+    interval_hours = models.PositiveIntegerField(null=True, blank=True, verbose_name='Периодичность, м/час')
+    interval_days = models.PositiveIntegerField(null=True, blank=True, verbose_name='Периодичность, дней')
+    is_recurring = models.BooleanField(
+        default=True, verbose_name='Повторяется',
+        help_text='Неповторяющееся ТО (обкатка) проводится один раз'
+    )
     
     class Meta:
         verbose_name = 'Вид ТО'
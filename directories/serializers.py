@@ -33,7 +33,7 @@ class SteerAxleModelSerializer(serializers.ModelSerializer):
 class MaintenanceTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = MaintenanceType
-        fields = ['id', 'name', 'description']
+        fields = ['id', 'name', 'description', 'interval_hours', 'interval_days', 'is_recurring']
 
 class FailureNodeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from . import cache
+from .cache import BUNDLE_MODELS
+
+
+def invalidate_bundle(sender, **kwargs):
+    """
+    Любое изменение справочника меняет версию /api/directories/bundle/ после
+    фиксации транзакции: иначе параллельный запрос сохранил бы прежние записи
+    под новой версией (ответ хранится без срока)
+    """
+    transaction.on_commit(cache.invalidate)
+
+
+for model in BUNDLE_MODELS:
+    post_save.connect(invalidate_bundle, sender=model, dispatch_uid=f'directories_bundle_save_{model.__name__}')
+    post_delete.connect(invalidate_bundle, sender=model, dispatch_uid=f'directories_bundle_delete_{model.__name__}')
@@ -1,3 +1,68 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .cache import BUNDLE_DIRECTORIES
+from .models import FailureNode, TechniqueModel
+
+
+class DirectoryBundleTests(TestCase):
+    """Все справочники одним ответом /api/directories/bundle/ с ETag по версии"""
+
+    URL = '/api/directories/bundle/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.late = TechniqueModel.objects.create(name='ПД-3,0')
+        cls.early = TechniqueModel.objects.create(name='ПД-1,5')
+        FailureNode.objects.create(name='Двигатель')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+
+    def test_bundle(self):
+        # Справочники публичны; записи по названию
+        response = self.api.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'version'} | {key for key, _, _ in BUNDLE_DIRECTORIES})
+        self.assertEqual(
+            [row['id'] for row in response.data['technique_models']], [self.early.pk, self.late.pk]
+        )
+        self.assertEqual([row['name'] for row in response.data['failure_nodes']], ['Двигатель'])
+        self.assertEqual(response['ETag'], f'"{response.data["version"]}"')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        # Повторный ответ - из кэша
+        with self.assertNumQueries(0):
+            self.assertEqual(self.api.get(self.URL).data, response.data)
+
+    def test_not_modified(self):
+        etag = self.api.get(self.URL)['ETag']
+        for if_none_match in (etag, f'"другая", {etag}', '*'):
+            with self.subTest(if_none_match=if_none_match), self.assertNumQueries(0):
+                response = self.api.get(self.URL, HTTP_IF_NONE_MATCH=if_none_match)
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse(response.content)
+            self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.api.get(self.URL, HTTP_IF_NONE_MATCH='"другая"').status_code, 200)
+
+    def test_invalidation(self):
+        # Любое изменение справочника - новая версия, прежний ETag дает полный ответ
+        etag = self.api.get(self.URL)['ETag']
+        for change in (
+            lambda: TechniqueModel.objects.create(name='ПД-5,0'),
+            lambda: FailureNode.objects.filter(name='Двигатель').get().save(),
+            lambda: self.late.delete(),
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+                # До фиксации - прежняя версия
+                self.assertEqual(self.api.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            response = self.api.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+        self.assertEqual(
+            [row['name'] for row in response.data['technique_models']], ['ПД-1,5', 'ПД-5,0']
+        )
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     TechniqueModelViewSet, EngineModelViewSet, TransmissionModelViewSet,
     DriveAxleModelViewSet, SteerAxleModelViewSet, MaintenanceTypeViewSet,
-    FailureNodeViewSet, RecoveryMethodViewSet
+    FailureNodeViewSet, RecoveryMethodViewSet, DirectoryBundleView
 )
 
 app_name = 'directories'
@@ -19,5 +19,6 @@ router.register(r'failure-nodes', FailureNodeViewSet)
 router.register(r'recovery-methods', RecoveryMethodViewSet)
 
 urlpatterns = [
+    path('directories/bundle/', DirectoryBundleView.as_view(), name='directory-bundle'),
     path('', include(router.urls)),
 ]
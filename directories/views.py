@@ -1,5 +1,8 @@
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from django.utils.http import parse_etags
+from rest_framework import viewsets, status
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import (
     TechniqueModel, EngineModel, TransmissionModel,
     DriveAxleModel, SteerAxleModel, MaintenanceType,
@@ -10,6 +13,7 @@ from .serializers import (
     DriveAxleModelSerializer, SteerAxleModelSerializer, MaintenanceTypeSerializer,
     FailureNodeSerializer, RecoveryMethodSerializer
 )
+from . import cache
 
 class TechniqueModelViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = TechniqueModel.objects.all()
@@ -50,3 +54,30 @@ class RecoveryMethodViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = RecoveryMethod.objects.all()
     serializer_class = RecoveryMethodSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+
+
+class DirectoryBundleView(APIView):
+    """
+    Все справочники одним ответом: /api/directories/bundle/
+    
+    Ответ берется из кэша и снабжается ETag с версией справочников.
+    При совпадении If-None-Match возвращается 304 без тела.
+    Справочники публичны, поэтому аутентификация (и запросы к сессии) не нужна
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        version, bundle = cache.get_bundle()
+        etag = f'"{version}"'
+        
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'version': version, **bundle})
+        
+        response['ETag'] = etag
+        # Браузер хранит ответ, но перед использованием сверяет версию
+        response['Cache-Control'] = 'no-cache'
+        return response
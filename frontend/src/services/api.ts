@@ -161,6 +161,19 @@ export interface RecoveryMethod {
   description?: string
 }
 
+export interface MachineHistoryEvent {
+  type: "maintenance" | "complaint"
+  date: string
+  record: Maintenance | Complaint
+}
+
+export interface MachineHistory {
+  machine: Machine
+  maintenance_count: number
+  complaints_count: number
+  timeline: MachineHistoryEvent[]
+}
+
 export interface ApiResponse<T> {
   data: T
 }
@@ -176,6 +189,9 @@ export const machineService = {
   getById: (id: number): Promise<ApiResponse<Machine>> =>
     api.get(`/machines/${id}/`).then((response) => ({ data: response.data })),
 
+  getHistory: (id: number): Promise<ApiResponse<MachineHistory>> =>
+    api.get(`/machines/${id}/history/`).then((response) => ({ data: response.data })),
+
   searchBySerial: (serialNumber: string): Promise<ApiResponse<Machine>> =>
     api.get(`/machines/search/?serial_number=${serialNumber}`).then((response) => ({ data: response.data })),
 
@@ -345,41 +361,23 @@ export const directoriesService = {
   serviceCompanies: serviceCompanyService,
   recoveryMethods: recoveryMethodService,
 
+  // Все справочники одним запросом; ответ кэшируется сервером и браузером (ETag)
   getAllDirectories: async () => {
     try {
-      const [
-        techniqueModels,
-        engineModels,
-        transmissionModels,
-        driveAxleModels,
-        steerAxleModels,
-        maintenanceTypes,
-        failureNodes,
-        serviceCompanies,
-        recoveryMethods,
-      ] = await Promise.all([
-        techniqueModelService.getAll().catch(() => ({ data: [] })),
-        engineModelService.getAll().catch(() => ({ data: [] })),
-        transmissionModelService.getAll().catch(() => ({ data: [] })),
-        driveAxleModelService.getAll().catch(() => ({ data: [] })),
-        steerAxleModelService.getAll().catch(() => ({ data: [] })),
-        maintenanceTypeService.getAll().catch(() => ({ data: [] })),
-        failureNodeService.getAll().catch(() => ({ data: [] })),
-        serviceCompanyService.getAll().catch(() => {return { data: [] }}),
-        recoveryMethodService.getAll().catch(() => ({ data: [] })),
-      ])
+      const response = await api.get("/directories/bundle/")
+      const bundle = response.data
 
       return {
         data: {
-          techniqueModels: techniqueModels.data,
-          engineModels: engineModels.data,
-          transmissionModels: transmissionModels.data,
-          driveAxleModels: driveAxleModels.data,
-          steerAxleModels: steerAxleModels.data,
-          maintenanceTypes: maintenanceTypes.data,
-          failureNodes: failureNodes.data,
-          serviceCompanies: serviceCompanies.data,
-          recoveryMethods: recoveryMethods.data,
+          techniqueModels: bundle.technique_models,
+          engineModels: bundle.engine_models,
+          transmissionModels: bundle.transmission_models,
+          driveAxleModels: bundle.drive_axle_models,
+          steerAxleModels: bundle.steer_axle_models,
+          maintenanceTypes: bundle.maintenance_types,
+          failureNodes: bundle.failure_nodes,
+          serviceCompanies: bundle.service_companies,
+          recoveryMethods: bundle.recovery_methods,
         },
       }
     } catch (error) {
@@ -86,14 +86,5 @@ class MachineAdmin(admin.ModelAdmin):
     service_organization_display.admin_order_field = 'service_organization__service_profile__organization_name'
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        # Менеджер видит все машины
-        if hasattr(request.user, 'role') and request.user.role == 'manager':
-            return qs
-        # Клиент видит только свои машины
-        elif hasattr(request.user, 'role') and request.user.role == 'client':
-            return qs.filter(client=request.user)
-        # Сервисная организация видит обслуживаемые машины
-        elif hasattr(request.user, 'role') and request.user.role == 'service':
-            return qs.filter(service_organization=request.user)
-        return qs
+        # Та же область видимости, что и в API (silant_project.scoping)
+        return super().get_queryset(request).for_user(request.user)
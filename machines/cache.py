@@ -0,0 +1,87 @@
+"""
+Кэш публичных карточек машин для поиска по заводскому номеру.
+
+Карточка (MachinePublicSerializer) хранится в кэше Django под ключом из
+заводского номера и версии справочников - переименование модели в
+справочнике автоматически делает старые карточки недействительными.
+
+Неизвестные номера отсекаются по множеству всех заводских номеров,
+которое хранится в памяти процесса и перестраивается только при смене
+версии (создание, удаление машины, смена заводского номера). Поэтому
+перебор несуществующих номеров не доходит до базы данных. Прочие изменения
+машины сбрасывают только ее карточку.
+
+Сброс выполняется после фиксации транзакции (см. machines.signals): иначе
+параллельный запрос успел бы сохранить в кэше прежнее состояние под новой
+версией.
+"""
+import uuid
+
+from django.core.cache import cache
+
+from directories import cache as directories_cache
+from .models import Machine
+from .query_plan import plan_queryset
+from .serializers import MachinePublicSerializer
+
+CARD_KEY = 'machines:public-card:{version}:{serial}'
+CARD_TIMEOUT = 60 * 60 * 24
+SERIALS_VERSION_KEY = 'machines:serials:version'
+
+# Множество заводских номеров текущего процесса и его версия
+_known_serials = {'version': None, 'serials': frozenset()}
+
+
+def get_serials_version():
+    version = cache.get(SERIALS_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(SERIALS_VERSION_KEY, version, timeout=None):
+            version = cache.get(SERIALS_VERSION_KEY, version)
+    return version
+
+
+def known_serials():
+    """Все заводские номера (перечитываются из базы только при смене версии)"""
+    version = get_serials_version()
+    if _known_serials['version'] != version:
+        _known_serials['serials'] = frozenset(
+            Machine.objects.order_by().values_list('serial_number', flat=True).iterator()
+        )
+        _known_serials['version'] = version
+    return _known_serials['serials']
+
+
+def card_key(serial_number):
+    return CARD_KEY.format(version=directories_cache.get_version(), serial=serial_number)
+
+
+def get_public_card(serial_number):
+    """Публичная карточка машины или None, если машины с таким номером нет"""
+    if serial_number not in known_serials():
+        return None
+
+    key = card_key(serial_number)
+    card = cache.get(key)
+    if card is None:
+        serializer = MachinePublicSerializer()
+        try:
+            machine = plan_queryset(Machine.objects.all(), serializer).get(
+                serial_number=serial_number
+            )
+        except Machine.DoesNotExist:
+            return None
+        card = dict(MachinePublicSerializer(machine).data)
+        cache.set(key, card, CARD_TIMEOUT)
+    return card
+
+
+def invalidate(*serial_numbers, serials_changed=True):
+    """
+    Сброс карточек указанных машин; serials_changed - состав номеров
+    изменился, множество известных номеров перестраивается
+    """
+    if serial_numbers:
+        cache.delete_many([card_key(serial) for serial in serial_numbers])
+    if serials_changed:
+        cache.set(SERIALS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
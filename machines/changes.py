@@ -0,0 +1,133 @@
+"""
+Лента изменений для синхронизации (ERP, фронтенд): /api/changes/?since=<курсор>.
+
+Ответ содержит машины, ТО и рекламации, созданные или измененные после
+курсора (поле updated_at), и отметки об удалении (DeletedRecord) - в области
+видимости пользователя (for_user). Без since лента начинается с начала,
+поэтому первая полная синхронизация идет тем же способом.
+
+Записи упорядочены по (время изменения, вид записи, id), курсор хранит
+позицию последней выданной записи. Страница ограничена ?limit=; пока
+has_more, следующую страницу нужно запросить сразу.
+
+Время изменения назначается до фиксации транзакции, и запись может стать
+видимой позже записей с большим временем. Поэтому дочитанная лента
+возвращает курсор на settings.CHANGES_SETTLE_SECONDS (по умолчанию 5 с)
+назад от текущего момента: последние изменения придут повторно, но не
+потеряются. Клиент применяет изменения по id, повтор безопасен.
+
+Ограничение: транзакция, зафиксированная позже, чем через окно после
+назначения updated_at (долгая загрузка, блокировки), может оказаться за
+курсором клиента и в ленту не попадет. Для таких сценариев окно увеличивают
+или после загрузки выполняют полную синхронизацию (без since).
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from complaints.models import Complaint
+from complaints.serializers import ComplaintSerializer
+from maintenance.models import Maintenance
+from maintenance.serializers import MaintenanceSerializer
+from .models import DeletedRecord, Machine
+from .query_plan import plan_queryset
+from .serializers import MachineDetailSerializer
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 2000
+SETTLE_SECONDS = 5
+INVALID_CURSOR_MESSAGE = 'Некорректный курсор'
+
+# (ключ ответа, модель, поле времени, сериализатор); номер потока входит в курсор
+STREAMS = [
+    ('machines', Machine, 'updated_at', MachineDetailSerializer),
+    ('maintenance', Maintenance, 'updated_at', MaintenanceSerializer),
+    ('complaints', Complaint, 'updated_at', ComplaintSerializer),
+    ('deleted', DeletedRecord, 'deleted_at', None),
+]
+
+
+def encode_cursor(position):
+    moment, stream, pk = position
+    payload = json.dumps({'p': [moment.isoformat(), stream, pk]})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    try:
+        moment, stream, pk = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))['p']
+        moment = datetime.fromisoformat(moment)
+        stream, pk = int(stream), int(pk)
+    except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+        raise ValidationError({'since': [INVALID_CURSOR_MESSAGE]})
+    if timezone.is_naive(moment):
+        raise ValidationError({'since': [INVALID_CURSOR_MESSAGE]})
+    return moment, stream, pk
+
+
+def after(time_field, stream, position):
+    """Условие "запись потока идет после позиции курсора" для ключа (время, поток, id)"""
+    moment, cursor_stream, pk = position
+    if stream < cursor_stream:
+        return Q(**{f'{time_field}__gt': moment})
+    if stream == cursor_stream:
+        return Q(**{f'{time_field}__gt': moment}) | Q(**{time_field: moment, 'id__gt': pk})
+    return Q(**{f'{time_field}__gte': moment})
+
+
+def get_changes(request, since=None, limit=CHANGES_PAGE_SIZE):
+    """
+    Страница ленты: по одному запросу ключей на поток (индекс (время, id)),
+    затем выборка и сериализация только попавших на страницу записей
+    """
+    now = timezone.now()
+    user = request.user
+
+    keys = []
+    for stream, (_, model, time_field, _) in enumerate(STREAMS):
+        queryset = model.objects.for_user(user)
+        if since is not None:
+            queryset = queryset.filter(after(time_field, stream, since))
+        rows = queryset.order_by(time_field, 'id').values_list(time_field, 'id')[:limit + 1]
+        keys.extend((moment, stream, pk) for moment, pk in rows)
+    keys.sort()
+    has_more = len(keys) > limit
+    keys = keys[:limit]
+
+    moment_field = serializers.DateTimeField()
+    result = {}
+    for stream, (name, model, time_field, serializer_class) in enumerate(STREAMS):
+        result[name] = []
+        ids = [pk for _, key_stream, pk in keys if key_stream == stream]
+        if not ids:
+            continue
+        queryset = model.objects.filter(pk__in=ids).order_by(time_field, 'id')
+        if serializer_class is None:
+            result[name] = [
+                {
+                    'model': row['model'],
+                    'id': row['object_id'],
+                    time_field: moment_field.to_representation(row[time_field]),
+                }
+                for row in queryset.values('model', 'object_id', time_field)
+            ]
+            continue
+        context = {'request': request}
+        queryset = plan_queryset(queryset, serializer_class(context=context)).annotate(changed_at=F(time_field))
+        objects = list(queryset)
+        for instance, row in zip(objects, serializer_class(objects, many=True, context=context).data):
+            row[time_field] = moment_field.to_representation(instance.changed_at)
+            result[name].append(row)
+
+    if has_more:
+        position = keys[-1]
+    else:
+        settle = getattr(settings, 'CHANGES_SETTLE_SECONDS', SETTLE_SECONDS)
+        position = (now - timedelta(seconds=settle), 0, 0)
+    return {**result, 'next': encode_cursor(position), 'has_more': has_more}
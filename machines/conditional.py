@@ -0,0 +1,111 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) для списков и карточек машин,
+ТО и рекламаций.
+
+Валидаторы считаются одним агрегатным запросом по тому же queryset, что и
+ответ (область видимости роли, фильтры, поиск): наибольшее updated_at и
+количество строк, для ТО и рекламаций - еще наибольшее updated_at машин.
+Удаления учитываются по последней отметке DeletedRecord. Если клиент
+прислал совпадающий If-None-Match (или If-Modified-Since не раньше
+Last-Modified), ответ 304 отдается без выборки страницы и без сериализатора.
+
+Курсорные страницы списков (?pagination=cursor) отдаются без валидаторов:
+агрегат по всему queryset стоит столько же, сколько COUNT(*), от которого
+курсорный режим избавляет, а страница по ключу выбирается по индексу.
+
+В ETag также входят адрес запроса (страница, фильтры, сортировка), область
+видимости пользователя, формат ответа и версия кэша справочников
+(названия из справочников выводятся в ответах). Версия справочников хранится
+в кэше Django: при нескольких процессах сервера нужен общий бэкенд кэша.
+"""
+import hashlib
+
+from django.db.models import Count, Max, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.permissions import SAFE_METHODS
+
+from directories import cache as directories_cache
+from silant_project.scoping import scope_key
+from .models import DeletedRecord
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для list и retrieve ViewSet.
+    conditional_related - связи, чье updated_at влияет на ответ (например, 'machine')
+    """
+    conditional_related = []
+
+    def list(self, request, *args, **kwargs):
+        if self.is_cursor_page(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        not_modified = self.conditional_response(request, queryset, deletions=True)
+        return not_modified or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_queryset().filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        not_modified = self.conditional_response(request, queryset)
+        return not_modified or super().retrieve(request, *args, **kwargs)
+
+    def is_cursor_page(self, request):
+        paginator = self.paginator
+        return hasattr(paginator, 'is_cursor_mode') and paginator.is_cursor_mode(request)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'conditional_validators', None)
+        if validators is not None and response.status_code == 200:
+            etag, last_modified = validators
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
+
+    def get_validators(self, request, queryset, deletions=False):
+        """(ETag, Last-Modified как timestamp) или None, если строк нет"""
+        aggregates = {'rows': Count('pk'), 'updated': Max('updated_at')}
+        for relation in self.conditional_related:
+            aggregates[relation] = Max(f'{relation}__updated_at')
+        if deletions:
+            # Последнее удаление записи этого типа - в том же запросе (без области
+            # видимости: лишний ответ 200 безопаснее устаревшего 304)
+            aggregates['deleted'] = Max(Subquery(
+                DeletedRecord.objects.filter(model=queryset.model._meta.model_name)
+                .order_by('-deleted_at').values('deleted_at')[:1]
+            ))
+        values = queryset.order_by().aggregate(**aggregates)
+        if not values['rows']:
+            return None
+
+        moments = [values[name] for name in aggregates if name != 'rows']
+        last_modified = max(moment for moment in moments if moment is not None)
+
+        payload = '|'.join(str(part) for part in [
+            request.get_full_path(),
+            scope_key(request.user),
+            request.accepted_renderer.format,
+            directories_cache.get_version(),
+            values['rows'],
+            *moments,
+        ])
+        etag = quote_etag(hashlib.md5(payload.encode('utf-8')).hexdigest())
+        return etag, int(last_modified.timestamp())
+
+    def conditional_response(self, request, queryset, deletions=False):
+        """Ответ 304, если данные клиента не устарели, иначе None"""
+        self.conditional_validators = None
+        if request.method not in SAFE_METHODS:
+            return None
+        validators = self.get_validators(request, queryset, deletions)
+        if validators is None:
+            return None
+
+        self.conditional_validators = validators
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            response.headers['ETag'] = etag
+            response.headers['Last-Modified'] = http_date(last_modified)
+        return response
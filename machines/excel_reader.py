@@ -0,0 +1,144 @@
+"""
+Потоковое чтение Excel-выгрузки Силант.
+
+Книга открывается один раз в режиме openpyxl read-only, листы читаются
+построчно и отдаются типизированными записями - весь лист в память
+не загружается, поэтому расход памяти не зависит от количества строк.
+"""
+from collections import namedtuple
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+
+
+def to_str(value):
+    """Текстовое значение ячейки (пустая ячейка -> '')"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def to_date(value):
+    """Дата из ячейки (None для пустых и некорректных значений)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return None
+
+
+def to_int(value):
+    """Целое число из ячейки (None для пустых и некорректных значений)"""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Описание листов: имя листа и столбцы (поле записи, номер столбца, преобразование)
+MACHINES_SHEET = 'машины'
+MACHINE_COLUMNS = [
+    ('technique_model', 1, to_str),      # Модель техники
+    ('serial_number', 2, to_str),        # Зав. № машины
+    ('engine_model', 3, to_str),         # Модель двигателя
+    ('engine_serial', 4, to_str),        # Зав. № двигателя
+    ('transmission_model', 5, to_str),   # Модель трансмиссии
+    ('transmission_serial', 6, to_str),  # Зав. № трансмиссии
+    ('drive_axle_model', 7, to_str),     # Модель ведущего моста
+    ('drive_axle_serial', 8, to_str),    # Зав. № ведущего моста
+    ('steer_axle_model', 9, to_str),     # Модель управляемого моста
+    ('steer_axle_serial', 10, to_str),   # Зав. № управляемого моста
+    ('shipment_date', 11, to_date),      # Дата отгрузки с завода
+    ('buyer', 12, to_str),               # Покупатель
+    ('consignee', 13, to_str),           # Грузополучатель
+    ('delivery_address', 14, to_str),    # Адрес поставки
+    ('equipment', 15, to_str),           # Комплектация
+    ('service_company', 16, to_str),     # Сервисная компания
+]
+
+MAINTENANCE_SHEET = 'ТО output'
+MAINTENANCE_COLUMNS = [
+    ('serial_number', 0, to_str),        # Зав. № машины
+    ('maintenance_type', 1, to_str),     # Вид ТО
+    ('maintenance_date', 2, to_date),    # Дата проведения ТО
+    ('operating_hours', 3, to_int),      # Наработка, м/час
+    ('work_order_number', 4, to_str),    # № заказ-наряда
+    ('work_order_date', 5, to_date),     # Дата заказ-наряда
+    ('maintenance_company', 6, to_str),  # Организация, проводившая ТО
+]
+
+COMPLAINTS_SHEET = 'рекламация output'
+COMPLAINT_COLUMNS = [
+    ('serial_number', 0, to_str),        # Зав. № машины
+    ('failure_date', 1, to_date),        # Дата отказа
+    ('operating_hours', 2, to_int),      # Наработка, м/час
+    ('failure_node', 3, to_str),         # Узел отказа
+    ('failure_description', 4, to_str),  # Описание отказа
+    ('recovery_method', 5, to_str),      # Способ восстановления
+    ('spare_parts', 6, to_str),          # Используемые запасные части
+    ('recovery_date', 7, to_date),       # Дата восстановления
+    ('downtime', 8, to_int),             # Время простоя техники
+]
+
+MachineRow = namedtuple('MachineRow', [name for name, _, _ in MACHINE_COLUMNS])
+MaintenanceRow = namedtuple('MaintenanceRow', [name for name, _, _ in MAINTENANCE_COLUMNS])
+ComplaintRow = namedtuple('ComplaintRow', [name for name, _, _ in COMPLAINT_COLUMNS])
+
+
+class SilantWorkbook:
+    """
+    Книга Excel с данными о машинах, ТО и рекламациях.
+
+    Использование:
+        with SilantWorkbook(filename) as workbook:
+            for line, row in workbook.machines():
+                ...
+    """
+
+    def __init__(self, filename):
+        self.workbook = load_workbook(filename, read_only=True, data_only=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.workbook.close()
+
+    def columns(self, sheet_name):
+        """Заголовки столбцов листа"""
+        worksheet = self.workbook[sheet_name]
+        for header in worksheet.iter_rows(min_row=1, max_row=1, values_only=True):
+            return [to_str(value) for value in header]
+        return []
+
+    def rows(self, sheet_name, columns, record):
+        """
+        Строки листа (без заголовка) в виде пар (номер строки, запись).
+        Полностью пустые строки пропускаются.
+        """
+        worksheet = self.workbook[sheet_name]
+        width = max(index for _, index, _ in columns) + 1
+
+        for line, values in enumerate(
+            worksheet.iter_rows(min_row=2, max_col=width, values_only=True), start=1
+        ):
+            if all(value is None for value in values):
+                continue
+            values = values + (None,) * (width - len(values))
+            yield line, record(*(convert(values[index]) for _, index, convert in columns))
+
+    def machines(self):
+        return self.rows(MACHINES_SHEET, MACHINE_COLUMNS, MachineRow)
+
+    def maintenance(self):
+        return self.rows(MAINTENANCE_SHEET, MAINTENANCE_COLUMNS, MaintenanceRow)
+
+    def complaints(self):
+        return self.rows(COMPLAINTS_SHEET, COMPLAINT_COLUMNS, ComplaintRow)
@@ -2,7 +2,7 @@ import django_filters
 from .models import Machine
 from directories.models import (
     TechniqueModel, EngineModel, TransmissionModel,
-    DriveAxleModel, SteerAxleModel
+    DriveAxleModel, SteerAxleModel, MaintenanceType
 )
 
 class MachineFilter(django_filters.FilterSet):
@@ -59,6 +59,49 @@ class MachineFilter(django_filters.FilterSet):
         label='Дата отгрузки до'
     )
     
+    # Фильтрация по сводке (MachineStats): без агрегации истории ТО и рекламаций
+    operating_hours_min = django_filters.NumberFilter(
+        field_name='stats__operating_hours',
+        lookup_expr='gte',
+        label='Наработка от, м/час'
+    )
+    
+    operating_hours_max = django_filters.NumberFilter(
+        field_name='stats__operating_hours',
+        lookup_expr='lte',
+        label='Наработка до, м/час'
+    )
+    
+    complaint_count_min = django_filters.NumberFilter(
+        field_name='stats__complaint_count',
+        lookup_expr='gte',
+        label='Рекламаций не меньше'
+    )
+    
+    total_downtime_min = django_filters.NumberFilter(
+        field_name='stats__total_downtime',
+        lookup_expr='gte',
+        label='Суммарный простой от, дней'
+    )
+    
+    last_maintenance_from = django_filters.DateFilter(
+        field_name='stats__last_maintenance_date',
+        lookup_expr='gte',
+        label='Последнее ТО от'
+    )
+    
+    last_maintenance_to = django_filters.DateFilter(
+        field_name='stats__last_maintenance_date',
+        lookup_expr='lte',
+        label='Последнее ТО до'
+    )
+    
+    last_maintenance_type = django_filters.ModelChoiceFilter(
+        queryset=MaintenanceType.objects.all(),
+        field_name='stats__last_maintenance_type',
+        empty_label="Все виды ТО"
+    )
+    
     class Meta:
         model = Machine
         fields = [
@@ -69,5 +112,12 @@ class MachineFilter(django_filters.FilterSet):
             'steer_axle_model',
             'serial_number',
             'shipment_date_from',
-            'shipment_date_to'
+            'shipment_date_to',
+            'operating_hours_min',
+            'operating_hours_max',
+            'complaint_count_min',
+            'total_downtime_min',
+            'last_maintenance_from',
+            'last_maintenance_to',
+            'last_maintenance_type',
         ]
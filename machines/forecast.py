@@ -0,0 +1,303 @@
+"""
+Прогноз следующего ТО по наработке для /api/machines/due-maintenance/.
+
+Темп наработки машины (м/час в день) - наклон прямой, проведенной методом
+наименьших квадратов через точки (дата, наработка) ее ТО и рекламаций и
+точку отгрузки с нулевой наработкой. Машины, у которых темп оценить нельзя
+(наработка не растет), получают медианный темп парка.
+
+Периодичность задается видом ТО (MaintenanceType.interval_hours и
+interval_days). По наработке ТО проводится на отметках, кратных
+периодичности: срок вида ТО - следующая отметка после наработки последнего
+визита на ТО (визит закрывает пройденные отметки), дата срока - когда до нее
+дойдет прогноз наработки. По календарю срок - через interval_days дней после
+последнего ТО этого вида (или отгрузки). Берется более ранний срок.
+Неповторяющееся ТО (обкатка) проводится один раз на своей отметке.
+Следующее ТО машины - вид с самым ранним сроком, на совпадающей отметке -
+вид с большей периодичностью (он включает работы меньших).
+
+Весь парк считается одним проходом NumPy: суммы для регрессии копятся
+np.bincount по номеру машины, сроки считаются матрицей машины x виды ТО.
+
+Результат хранится в кэше под версией справочников (периодичность -
+справочник): строка прогноза каждой машины - отдельным ключом, читаются
+get_many только нужные машины. Общая запись парка содержит медианный темп и
+поколение, входящее в ключи строк. Новые и измененные ТО и рекламации
+перезаписывают строки только своих машин (см. machines.signals), поэтому
+параллельные пересчеты разных машин не затирают друг друга; машины, которых
+в кэше нет, досчитываются при чтении. Хранятся даты сроков, поэтому остаток
+дней и просрочка вычисляются при ответе. Медианный темп парка обновляется
+полным пересчетом с новым поколением (смена справочников, invalidate() или
+истечение DUE_TIMEOUT).
+"""
+import uuid
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+
+from complaints.models import Complaint
+from directories import cache as directories_cache
+from directories.models import MaintenanceType
+from maintenance.models import Maintenance
+from .models import Machine
+
+DUE_KEY = 'machines:due-maintenance:{directories}'
+DUE_ROW_KEY = 'machines:due-maintenance:{generation}:{machine}'
+DUE_TIMEOUT = 24 * 60 * 60
+
+EPOCH = date(1970, 1, 1)
+# Сроки за пределами date (при почти нулевом темпе) обрезаются
+MIN_DAY = (date.min - EPOCH).days
+MAX_DAY = (date.max - EPOCH).days
+
+
+def to_days(dates):
+    """Даты -> дни от 1970-01-01"""
+    return np.array(dates, dtype='datetime64[D]').astype(np.int64).astype(np.float64)
+
+
+def from_days(days):
+    return EPOCH + timedelta(days=int(np.floor(days)))
+
+
+def columns(queryset, *fields):
+    """Значения полей queryset столбцами"""
+    return list(zip(*queryset.values_list(*fields))) or [()] * len(fields)
+
+
+def column(values, dtype=np.float64):
+    """Столбец значений, None -> NaN"""
+    return np.array([np.nan if value is None else value for value in values], dtype=dtype)
+
+
+def fit_rates(index, days, hours, size):
+    """Темп наработки каждой машины - наклон МНК по ее точкам; NaN, если он не положителен"""
+    count = np.bincount(index, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_days = np.bincount(index, weights=days, minlength=size) / count
+        mean_hours = np.bincount(index, weights=hours, minlength=size) / count
+        dx = days - mean_days[index]
+        dy = hours - mean_hours[index]
+        rates = (
+            np.bincount(index, weights=dx * dy, minlength=size)
+            / np.bincount(index, weights=dx * dx, minlength=size)
+        )
+    rates[~(rates > 0)] = np.nan
+    return rates
+
+
+def latest(codes, days, hours, size):
+    """Дата и наработка последней записи каждого кода (по дате, затем наработке); NaN - записей нет"""
+    last_days = np.full(size, np.nan)
+    last_hours = np.full(size, np.nan)
+    if len(codes):
+        order = np.lexsort((hours, days, codes))
+        sorted_codes = codes[order]
+        last = order[np.append(sorted_codes[1:] != sorted_codes[:-1], True)]
+        last_days[codes[last]] = days[last]
+        last_hours[codes[last]] = hours[last]
+    return last_days, last_hours
+
+
+def forecast(machine_ids=None, fleet_rate=None):
+    """
+    ({id машины: строка прогноза}, медианный темп парка) для указанных машин
+    (None - весь парк). При досчете отдельных машин передается fleet_rate
+    из полного расчета
+    """
+    machines = Machine.objects.order_by('pk')
+    maintenance = Maintenance.objects.order_by()
+    complaints = Complaint.objects.order_by()
+    if machine_ids is not None:
+        machines = machines.filter(pk__in=machine_ids)
+        maintenance = maintenance.filter(machine__in=machine_ids)
+        complaints = complaints.filter(machine__in=machine_ids)
+
+    machine_pks, shipment_dates = columns(machines, 'pk', 'shipment_date')
+    m_machines, m_types, m_dates, m_hours = columns(
+        maintenance, 'machine_id', 'maintenance_type_id', 'maintenance_date', 'operating_hours'
+    )
+    c_machines, c_dates, c_hours = columns(complaints, 'machine_id', 'failure_date', 'operating_hours')
+    # Большая периодичность первой: на совпадающем сроке выбирается она
+    types = list(
+        MaintenanceType.objects.filter(Q(interval_hours__isnull=False) | Q(interval_days__isnull=False))
+        .order_by(F('interval_hours').desc(nulls_last=True), 'pk')
+        .values_list('pk', 'name', 'interval_hours', 'interval_days', 'is_recurring')
+    )
+
+    machine_pks = np.array(machine_pks, dtype=np.int64)
+    size = len(machine_pks)
+    shipment_days = to_days(shipment_dates)
+    m_index = np.searchsorted(machine_pks, np.array(m_machines, dtype=np.int64))
+    c_index = np.searchsorted(machine_pks, np.array(c_machines, dtype=np.int64))
+    m_days = to_days(m_dates)
+    m_hours = column(m_hours)
+
+    # Точки наработки: отгрузка (0 м/час), ТО, рекламации
+    index = np.concatenate([np.arange(size), m_index, c_index])
+    days = np.concatenate([shipment_days, m_days, to_days(c_dates)])
+    hours = np.concatenate([np.zeros(size), m_hours, column(c_hours)])
+
+    rates = fit_rates(index, days, hours, size)
+    if fleet_rate is None and np.isfinite(rates).any():
+        fleet_rate = float(np.nanmedian(rates))
+    if fleet_rate is not None:
+        rates[np.isnan(rates)] = fleet_rate
+    anchor_days, anchor_hours = latest(index, days, hours, size)
+    _, visit_hours = latest(m_index, m_days, m_hours, size)
+    visit_hours = np.nan_to_num(visit_hours)
+
+    type_count = len(types)
+    due_days = np.full((size, type_count), np.nan)
+    due_hours = np.full((size, type_count), np.nan)
+    if type_count:
+        type_pks, _, interval_hours, interval_days, recurring = zip(*types)
+        type_pks = np.array(type_pks, dtype=np.int64)
+        interval_hours = column(interval_hours)
+        interval_days = column(interval_days)
+        recurring = np.array(recurring, dtype=bool)
+
+        # Последнее ТО каждого вида: код (машина, вид ТО)
+        m_types = np.array(m_types, dtype=np.int64)
+        sorted_pks = np.argsort(type_pks)
+        position = np.minimum(np.searchsorted(type_pks[sorted_pks], m_types), type_count - 1)
+        type_index = sorted_pks[position]
+        has_rule = type_pks[type_index] == m_types
+        codes = m_index[has_rule] * type_count + type_index[has_rule]
+        last_days, _ = latest(codes, m_days[has_rule], m_hours[has_rule], size * type_count)
+        last_days = last_days.reshape(size, type_count)
+
+        done = ~np.isnan(last_days)
+        finished = done & ~recurring
+
+        # Следующая кратная отметка после последнего визита; обкатка - своя отметка
+        due_hours = np.where(
+            recurring, (np.floor(visit_hours[:, None] / interval_hours) + 1) * interval_hours, interval_hours
+        )
+        due_hours[finished] = np.nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            by_hours = anchor_days[:, None] + (due_hours - anchor_hours[:, None]) / rates[:, None]
+        by_days = np.where(done, last_days, shipment_days[:, None]) + interval_days
+        by_days[finished] = np.nan
+        due_days = np.clip(np.fmin(by_hours, by_days), MIN_DAY, MAX_DAY)
+
+    planned = ~np.isnan(due_days).all(axis=1) if type_count else np.zeros(size, dtype=bool)
+    nearest = np.argmin(np.where(np.isnan(due_days), np.inf, due_days), axis=1) if type_count else None
+
+    rows = {}
+    for position, pk in enumerate(machine_pks.tolist()):
+        row = {
+            'maintenance_type': None,
+            'maintenance_type_name': None,
+            'due_date': None,
+            'due_hours': None,
+            'hours_per_day': None if np.isnan(rates[position]) else round(float(rates[position]), 2),
+            'last_date': from_days(anchor_days[position]),
+            'last_hours': int(anchor_hours[position]),
+        }
+        if planned[position]:
+            kind = nearest[position]
+            row['maintenance_type'], row['maintenance_type_name'] = types[kind][:2]
+            row['due_date'] = from_days(due_days[position, kind])
+            if not np.isnan(due_hours[position, kind]):
+                row['due_hours'] = int(due_hours[position, kind])
+        rows[pk] = row
+    return rows, fleet_rate
+
+
+def cache_key():
+    """Ключ записи парка: {'generation': поколение строк, 'fleet_rate': медианный темп}"""
+    return DUE_KEY.format(directories=directories_cache.get_version())
+
+
+def row_key(generation, pk):
+    return DUE_ROW_KEY.format(generation=generation, machine=pk)
+
+
+def store_rows(generation, rows):
+    cache.set_many({row_key(generation, pk): row for pk, row in rows.items()}, DUE_TIMEOUT)
+
+
+def get_forecast(machine_ids):
+    """Строки прогноза указанных машин: из кэша, весь парк считается при первом обращении"""
+    key = cache_key()
+    fleet = cache.get(key)
+    if fleet is None:
+        rows, fleet_rate = forecast()
+        fleet = {'generation': uuid.uuid4().hex, 'fleet_rate': fleet_rate}
+        store_rows(fleet['generation'], rows)
+        # Параллельный полный пересчет мог успеть раньше: строки этого уже верны
+        cache.add(key, fleet, DUE_TIMEOUT)
+        return {pk: rows[pk] for pk in machine_ids if pk in rows}
+
+    keys = {row_key(fleet['generation'], pk): pk for pk in machine_ids}
+    cached = {keys[name]: row for name, row in cache.get_many(keys).items()}
+    missing = [pk for pk in machine_ids if pk not in cached]
+    if missing:
+        rows, _ = forecast(missing, fleet['fleet_rate'])
+        store_rows(fleet['generation'], rows)
+        cached.update(rows)
+    return {pk: cached[pk] for pk in machine_ids if pk in cached}
+
+
+def invalidate():
+    """Сброс прогноза парка (после пакетной загрузки): следующее чтение считает его заново"""
+    cache.delete(cache_key())
+
+
+def refresh(machine_ids):
+    """Пересчет строк прогноза машин в кэше (удаленные машины убираются)"""
+    fleet = cache.get(cache_key())
+    if fleet is None:
+        return
+    rows, _ = forecast(machine_ids, fleet['fleet_rate'])
+    store_rows(fleet['generation'], rows)
+    cache.delete_many([row_key(fleet['generation'], pk) for pk in machine_ids if pk not in rows])
+
+
+def schedule_refresh(machine_ids):
+    """Пересчет после фиксации транзакции: в кэш не попадают незафиксированные записи"""
+    machine_ids = {pk for pk in machine_ids if pk is not None}
+    if machine_ids:
+        transaction.on_commit(lambda: refresh(machine_ids))
+
+
+def due_entries(machines, within_days=None, today=None):
+    """
+    Прогноз для пар (id, заводской номер), ближайшие сроки первыми.
+    within_days - только ТО в ближайшие N дней, включая просроченные
+    """
+    today = today or date.today()
+    machines = list(machines)
+    rows = get_forecast([pk for pk, _ in machines])
+
+    entries = []
+    for pk, serial_number in machines:
+        row = rows.get(pk)
+        if row is None:
+            continue
+        days_left = (row['due_date'] - today).days if row['due_date'] else None
+        if within_days is not None and (days_left is None or days_left > within_days):
+            continue
+        estimated_hours = row['last_hours']
+        if row['hours_per_day'] is not None and today > row['last_date']:
+            estimated_hours += round(row['hours_per_day'] * (today - row['last_date']).days)
+        entries.append({
+            'machine': pk,
+            'serial_number': serial_number,
+            'maintenance_type': row['maintenance_type'],
+            'maintenance_type_name': row['maintenance_type_name'],
+            'due_date': row['due_date'],
+            'due_hours': row['due_hours'],
+            'days_left': days_left,
+            'overdue': days_left is not None and days_left < 0,
+            'estimated_hours': estimated_hours,
+            'hours_per_day': row['hours_per_day'],
+            'last_date': row['last_date'],
+            'last_hours': row['last_hours'],
+        })
+    entries.sort(key=lambda entry: (entry['due_date'] is None, entry['due_date'] or today, entry['serial_number']))
+    return entries
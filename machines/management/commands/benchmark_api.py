@@ -0,0 +1,309 @@
+import json
+import logging
+import math
+import time
+import warnings
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment
+)
+from django.urls import NoReverseMatch, get_resolver, reverse
+
+from accounts.models import User
+from machines.models import Machine
+
+# Эталон для каждой СУБД свой: benchmark_baseline_sqlite.json, benchmark_baseline_postgresql.json
+BASELINE_TEMPLATE = 'benchmark_baseline_{vendor}.json'
+ROLES = ['anonymous', 'client', 'service', 'manager']
+
+# Дополнительные параметры запроса для отдельных маршрутов
+ENDPOINT_PARAMS = {
+    'machine-export': {'format': 'csv'},
+    'maintenance-export': {'format': 'csv'},
+    'complaint-export': {'format': 'csv'},
+}
+
+
+def percentile(values, percent):
+    """Процентиль методом ближайшего ранга"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def api_endpoints(patterns=None, namespace=None, prefix=''):
+    """
+    GET-маршруты API из корневого URLconf: (имя маршрута, представление, detail).
+    Дубли с суффиксом формата (.json) и корневые страницы роутеров пропускаются
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    endpoints = []
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if hasattr(pattern, 'url_patterns'):
+            endpoints.extend(api_endpoints(pattern.url_patterns, pattern.namespace or namespace, route))
+            continue
+        view = getattr(pattern.callback, 'cls', None)
+        if (
+            view is None or not route.startswith('api/') or pattern.name == 'api-root'
+            or 'format' in pattern.pattern.regex.groupindex
+        ):
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        if actions is not None and 'get' not in actions:
+            continue
+        if actions is None and not hasattr(view, 'get'):
+            continue
+        name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+        detail = 'pk' in pattern.pattern.regex.groupindex
+        endpoints.append((name, view, detail))
+    return endpoints
+
+
+def database_setup():
+    """Настройки соединения, от которых зависят замеры (см. DATABASES в settings)"""
+    setup = {
+        'vendor': connection.vendor,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'pool': bool(connection.settings_dict['OPTIONS'].get('pool')),
+    }
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for pragma in ('journal_mode', 'synchronous', 'mmap_size'):
+                cursor.execute(f'PRAGMA {pragma}')
+                row = cursor.fetchone()
+                # База в памяти не отвечает на mmap_size
+                setup[pragma] = row[0] if row else None
+    return setup
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест API в процессе (тестовый клиент Django): задержка p50/p95, '
+        'количество SQL-запросов и размер ответа для каждого GET-маршрута и каждой роли. '
+        'Сравнение с сохраненным эталоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--machines', type=int, default=1000,
+                            help='Размер синтетического парка в тестовой базе (см. generate_fleet)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Количество замеров для каждого маршрута и роли')
+        parser.add_argument('--baseline', type=Path,
+                            help='Файл эталонных результатов (JSON), по умолчанию - '
+                                 f'{BASELINE_TEMPLATE} в корне проекта')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Записать результаты как новый эталон')
+        parser.add_argument('--threshold', type=float, default=0.5,
+                            help='Допустимое ухудшение задержки и размера ответа (доля, 0.5 = 50%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                            help='Ухудшение задержки меньше этого значения не считается регрессией')
+        parser.add_argument('--query-threshold', type=int, default=0,
+                            help='Допустимый рост количества SQL-запросов')
+        parser.add_argument('--endpoint', action='append', default=[],
+                            help='Проверять только маршруты, содержащие строку (можно повторять)')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Использовать настроенную базу данных как есть, '
+                                 'без создания тестовой базы и генерации данных')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Сохранить тестовую базу между запусками')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = None
+        try:
+            if not options['current_db']:
+                old_config = setup_databases(
+                    verbosity=0, interactive=False, keepdb=options['keepdb']
+                )
+                if not Machine.objects.exists():
+                    call_command(
+                        'generate_fleet', machines=options['machines'], seed=options['seed'],
+                        stdout=self.stdout
+                    )
+            results = self.run_benchmarks(options)
+            database = database_setup()
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        meta = {
+            **database,
+            'machines': Machine.objects.count() if options['current_db'] else options['machines'],
+            'seed': options['seed'],
+            'iterations': options['iterations'],
+        }
+        if options['baseline'] is None:
+            options['baseline'] = Path(settings.BASE_DIR) / BASELINE_TEMPLATE.format(vendor=connection.vendor)
+        if options['save_baseline']:
+            options['baseline'].write_text(
+                json.dumps({'meta': meta, 'results': results}, ensure_ascii=False, indent=2, sort_keys=True)
+            )
+            self.stdout.write(self.style.SUCCESS(f'\n💾 Эталон сохранен: {options["baseline"]}'))
+        elif options['baseline'].exists():
+            self.compare(json.loads(options['baseline'].read_text()), meta, results, options)
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'\nЭталон {options["baseline"]} не найден - запустите с --save-baseline'
+            ))
+
+    # Пользователи и объекты
+
+    def role_users(self):
+        """Пользователь для каждой роли (клиент и сервис - с наибольшим парком)"""
+        users = {'anonymous': None}
+        for role, field in [('client', 'client'), ('service', 'service_organization')]:
+            owner_id = (
+                Machine.objects.filter(**{f'{field}__isnull': False})
+                .values(field).order_by().annotate(total=Count('id')).order_by('-total')
+                .values_list(field, flat=True).first()
+            )
+            users[role] = User.objects.filter(pk=owner_id).first() or User.objects.filter(role=role).first()
+        manager = User.objects.filter(role='manager').first()
+        if manager is None:
+            manager = User.objects.create_user('benchmark_manager', role='manager')
+        users['manager'] = manager
+        return users
+
+    def detail_pk(self, client, view, list_url):
+        """pk первого объекта, видимого роли (по ответу списка), иначе любого"""
+        if list_url:
+            response = client.get(list_url)
+            if response.status_code == 200 and not response.streaming:
+                data = response.json()
+                rows = data.get('results', []) if isinstance(data, dict) else data
+                if rows and 'id' in rows[0]:
+                    return rows[0]['id']
+        queryset = getattr(view, 'queryset', None)
+        if queryset is not None:
+            return queryset.model.objects.order_by('pk').values_list('pk', flat=True).first()
+        return None
+
+    # Замеры
+
+    def measure(self, client, url, params, iterations):
+        cache.clear()
+        # Первый запрос прогревает кэши и ленивые инициализации
+        client.get(url, params)
+
+        timings = []
+        queries = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url, params)
+                if response.streaming:
+                    size = sum(len(chunk) for chunk in response.streaming_content)
+                else:
+                    size = len(response.content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, len(captured))
+        return {
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'queries': queries,
+            'bytes': size,
+        }
+
+    def run_benchmarks(self, options):
+        endpoints = api_endpoints()
+        if options['endpoint']:
+            endpoints = [
+                endpoint for endpoint in endpoints
+                if any(text in endpoint[0] for text in options['endpoint'])
+            ]
+        users = self.role_users()
+        serial = Machine.objects.order_by('pk').values_list('serial_number', flat=True).first()
+        endpoint_params = {**ENDPOINT_PARAMS, 'machine-search-by-serial': {'serial_number': serial}}
+
+        setup = ', '.join(f'{name}={value}' for name, value in database_setup().items())
+        self.stdout.write(f'\n⏱  Замеры ({setup}, {options["iterations"]} повторов):')
+        # Ответы 4xx/5xx - тоже результат замера, без записи в журнал и исключений
+        request_logger = logging.getLogger('django.request')
+        log_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                return self.measure_endpoints(endpoints, users, endpoint_params, options)
+        finally:
+            request_logger.setLevel(log_level)
+
+    def measure_endpoints(self, endpoints, users, endpoint_params, options):
+        results = {}
+        for role in ROLES:
+            client = Client(raise_request_exception=False)
+            if users[role] is not None:
+                client.force_login(users[role])
+            for name, view, detail in endpoints:
+                url_name = name.split(':')[-1]
+                kwargs = {}
+                if detail:
+                    list_name = name.rsplit('-', 1)[0] + '-list'
+                    try:
+                        list_url = reverse(list_name)
+                    except NoReverseMatch:
+                        list_url = None
+                    kwargs['pk'] = self.detail_pk(client, view, list_url)
+                    if kwargs['pk'] is None:
+                        continue
+                url = reverse(name, kwargs=kwargs)
+                params = endpoint_params.get(url_name, {})
+
+                result = self.measure(client, url, params, options['iterations'])
+                key = f'{url_name} [{role}]'
+                results[key] = result
+                self.stdout.write(
+                    f'  {key:<45} {result["status"]}  p50 {result["p50_ms"]:>8.2f} мс  '
+                    f'p95 {result["p95_ms"]:>8.2f} мс  SQL {result["queries"]:>3}  '
+                    f'{result["bytes"] / 1024:>9.1f} КБ'
+                )
+        return results
+
+    # Сравнение с эталоном
+
+    def compare(self, baseline, meta, results, options):
+        if baseline.get('meta') != meta:
+            self.stdout.write(self.style.WARNING(
+                f'\n⚠️  Условия эталона отличаются: {baseline.get("meta")} != {meta}'
+            ))
+
+        threshold = options['threshold']
+        regressions = []
+        for key, result in results.items():
+            expected = baseline['results'].get(key)
+            if expected is None:
+                continue
+            if result['status'] != expected['status']:
+                regressions.append(f'{key}: статус {expected["status"]} -> {result["status"]}')
+            if result['queries'] > expected['queries'] + options['query_threshold']:
+                regressions.append(f'{key}: SQL-запросов {expected["queries"]} -> {result["queries"]}')
+            for metric in ('p50_ms', 'p95_ms'):
+                limit = max(expected[metric] * (1 + threshold), expected[metric] + options['min_delta_ms'])
+                if result[metric] > limit:
+                    regressions.append(f'{key}: {metric} {expected[metric]} -> {result[metric]}')
+            if result['bytes'] > expected['bytes'] * (1 + threshold):
+                regressions.append(f'{key}: размер ответа {expected["bytes"]} -> {result["bytes"]}')
+
+        missing = sorted(set(baseline['results']) - set(results))
+        if missing and not options['endpoint']:
+            self.stdout.write(self.style.WARNING(f'\nНет замеров для: {", ".join(missing)}'))
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(f'  ✗ {line}'))
+            raise CommandError(f'Регрессий относительно эталона: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('\n✅ Регрессий относительно эталона нет'))
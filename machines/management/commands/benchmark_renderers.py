@@ -0,0 +1,108 @@
+import io
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from complaints.models import Complaint
+from complaints.serializers import ComplaintSerializer
+from machines.models import Machine
+from machines.query_plan import plan_queryset
+from machines.serializers import MachineDetailSerializer
+from maintenance.models import Maintenance
+from maintenance.serializers import MaintenanceSerializer
+from silant_project import renderers
+from .benchmark_api import percentile
+
+# Список, queryset, сериализатор
+PAGES = [
+    ('machines', Machine.objects.order_by('-shipment_date', '-id'), MachineDetailSerializer),
+    ('maintenance', Maintenance.objects.order_by('-maintenance_date', '-id'), MaintenanceSerializer),
+    ('complaints', Complaint.objects.order_by('-failure_date', '-id'), ComplaintSerializer),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение JSON-рендереров на странице списка: JSONRenderer DRF и ORJSONRenderer '
+        '(время рендеринга и разбора, размер ответа)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Размер страницы')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--machines', type=int, default=1000,
+                            help='Размер синтетического парка в тестовой базе (см. generate_fleet)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--current-db', action='store_true',
+                            help='Использовать настроенную базу данных как есть')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Сохранить тестовую базу между запусками')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError('orjson не установлен: pip install orjson')
+
+        setup_test_environment()
+        old_config = None
+        try:
+            if not options['current_db']:
+                old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+                if not Machine.objects.exists():
+                    call_command(
+                        'generate_fleet', machines=options['machines'], seed=options['seed'],
+                        stdout=io.StringIO()
+                    )
+            pages = [(name, self.page(queryset, serializer_class, options['rows']))
+                     for name, queryset, serializer_class in PAGES]
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.stdout.write(f'\n⏱  Рендеринг страницы ({options["iterations"]} повторов):')
+        for name, data in pages:
+            self.compare(name, data, options['iterations'])
+
+    def page(self, queryset, serializer_class, rows):
+        """Данные страницы списка в том виде, в котором они попадают в рендерер"""
+        queryset = plan_queryset(queryset, serializer_class())
+        results = serializer_class(queryset[:rows], many=True).data
+        return {'count': len(results), 'next': None, 'previous': None, 'results': results}
+
+    def timings(self, function, iterations):
+        values = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            function()
+            values.append((time.perf_counter() - started) * 1000)
+        return percentile(values, 50), percentile(values, 95)
+
+    def compare(self, name, data, iterations):
+        results = {}
+        contents = {}
+        for label, renderer, parser in [
+            ('json', JSONRenderer(), JSONParser()),
+            ('orjson', renderers.ORJSONRenderer(), renderers.ORJSONParser()),
+        ]:
+            content = contents[label] = renderer.render(data, renderer.media_type, {})
+            render = self.timings(lambda: renderer.render(data, renderer.media_type, {}), iterations)
+            parse = self.timings(lambda: parser.parse(io.BytesIO(content)), iterations)
+            results[label] = (render, parse, len(content))
+
+        if renderers.orjson.loads(contents['json']) != renderers.orjson.loads(contents['orjson']):
+            raise CommandError(f'{name}: ответы рендереров отличаются по содержанию')
+
+        self.stdout.write(f'\n  {name} ({data["count"]} строк)')
+        for label, ((render_p50, render_p95), (parse_p50, parse_p95), size) in results.items():
+            self.stdout.write(
+                f'    {label:<7} рендеринг p50 {render_p50:>7.2f} мс  p95 {render_p95:>7.2f} мс   '
+                f'разбор p50 {parse_p50:>7.2f} мс  p95 {parse_p95:>7.2f} мс   {size / 1024:>8.1f} КБ'
+            )
+        speedup = results['json'][0][0] / results['orjson'][0][0] if results['orjson'][0][0] else 0
+        self.stdout.write(self.style.SUCCESS(f'    orjson быстрее в {speedup:.1f} раза'))
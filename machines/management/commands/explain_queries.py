@@ -0,0 +1,132 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from machines.models import Machine
+from maintenance.models import Maintenance
+from complaints.models import Complaint
+
+
+class Command(BaseCommand):
+    help = 'Проверка планов запросов (EXPLAIN) для типовых фильтров и областей видимости ролей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plan',
+            action='store_true',
+            help='Выводить план запроса полностью'
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершиться с ошибкой, если хотя бы один запрос не использует ожидаемый индекс'
+        )
+
+    def get_cases(self):
+        """
+        Типовые запросы списков: (описание, queryset, ожидаемый индекс).
+        Значения параметров не важны - план зависит только от формы запроса
+        """
+        user_id = 1
+        directory_id = 1
+        date_from, date_to = date(2022, 1, 1), date(2022, 12, 31)
+
+        return [
+            # Машины
+            ('Машины: сортировка по умолчанию',
+             Machine.objects.order_by('-shipment_date', '-id'),
+             'machine_shipment_id_idx'),
+            ('Машины: диапазон дат отгрузки',
+             Machine.objects.filter(shipment_date__gte=date_from, shipment_date__lte=date_to),
+             'machine_shipment_id_idx'),
+            ('Машины клиента',
+             Machine.objects.filter(client_id=user_id),
+             'machine_client_ship_idx'),
+            ('Машины сервисной организации',
+             Machine.objects.filter(service_organization_id=user_id),
+             'machine_service_ship_idx'),
+            ('Машины: модель техники + даты отгрузки',
+             Machine.objects.filter(
+                 technique_model_id=directory_id,
+                 shipment_date__gte=date_from, shipment_date__lte=date_to
+             ),
+             'machine_model_ship_idx'),
+
+            # ТО
+            ('ТО: сортировка по умолчанию',
+             Maintenance.objects.order_by('-maintenance_date', '-id'),
+             'maint_date_id_idx'),
+            ('ТО: диапазон дат',
+             Maintenance.objects.filter(maintenance_date__gte=date_from, maintenance_date__lte=date_to),
+             'maint_date_id_idx'),
+            ('ТО машин клиента',
+             Maintenance.objects.filter(machine__client_id=user_id),
+             'maint_machine_date_idx'),
+            ('ТО машин сервисной организации',
+             Maintenance.objects.filter(machine__service_organization_id=user_id),
+             'maint_machine_date_idx'),
+            ('ТО: вид ТО + даты',
+             Maintenance.objects.filter(
+                 maintenance_type_id=directory_id,
+                 maintenance_date__gte=date_from, maintenance_date__lte=date_to
+             ),
+             'maint_type_date_idx'),
+            ('ТО: сервисная компания + даты',
+             Maintenance.objects.filter(
+                 service_company_id=directory_id,
+                 maintenance_date__gte=date_from, maintenance_date__lte=date_to
+             ),
+             'maint_company_date_idx'),
+
+            # Рекламации
+            ('Рекламации: сортировка по умолчанию',
+             Complaint.objects.order_by('-failure_date', '-id'),
+             'complaint_failure_id_idx'),
+            ('Рекламации: диапазон дат',
+             Complaint.objects.filter(failure_date__gte=date_from, failure_date__lte=date_to),
+             'complaint_failure_id_idx'),
+            ('Рекламации машин клиента',
+             Complaint.objects.filter(machine__client_id=user_id),
+             'complaint_machine_date_idx'),
+            ('Рекламации машин сервисной организации',
+             Complaint.objects.filter(machine__service_organization_id=user_id),
+             'complaint_machine_date_idx'),
+            ('Рекламации сервисной компании',
+             Complaint.objects.filter(service_company_id=directory_id),
+             'complaint_company_date_idx'),
+            ('Рекламации: узел отказа + даты',
+             Complaint.objects.filter(
+                 failure_node_id=directory_id,
+                 failure_date__gte=date_from, failure_date__lte=date_to
+             ),
+             'complaint_node_date_idx'),
+            ('Рекламации: способ восстановления + даты',
+             Complaint.objects.filter(
+                 recovery_method_id=directory_id,
+                 failure_date__gte=date_from, failure_date__lte=date_to
+             ),
+             'complaint_recovery_date_idx'),
+        ]
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'🔎 Планы запросов ({connection.vendor}):\n')
+
+        missed = []
+        for label, queryset, index_name in self.get_cases():
+            plan = queryset.explain()
+            if index_name in plan:
+                self.stdout.write(self.style.SUCCESS(f'✅ {label}: {index_name}'))
+            else:
+                missed.append(label)
+                self.stdout.write(self.style.WARNING(f'⚠️  {label}: индекс {index_name} не используется'))
+            if options['verbose_plan'] or index_name not in plan:
+                for line in plan.splitlines():
+                    self.stdout.write(f'     {line}')
+
+        if missed:
+            message = f'Запросов без ожидаемого индекса: {len(missed)}'
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(f'\n{message}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nВсе запросы используют индексы'))
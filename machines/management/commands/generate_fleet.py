@@ -0,0 +1,450 @@
+import bisect
+import math
+import random
+import re
+import time
+from collections import Counter
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+
+from accounts.models import User, ClientProfile, ServiceOrganizationProfile
+from complaints import analytics as complaints_analytics
+from complaints.models import Complaint
+from complaints.rollup import rebuild_failure_rollup
+from directories import cache as directories_cache
+from directories.models import (
+    TechniqueModel, EngineModel, TransmissionModel,
+    DriveAxleModel, SteerAxleModel, MaintenanceType,
+    FailureNode, RecoveryMethod, ServiceCompany
+)
+from machines import cache as machines_cache
+from machines import forecast
+from machines.models import Machine, MachineStats
+from machines.stats import rebuild_machine_stats
+from maintenance.models import Maintenance
+
+# Значения справочников и их относительная частота
+TECHNIQUE_MODELS = {'ПД1,5': 30, 'ПД2,0': 20, 'ПД2,5': 15, 'ПД3,0': 20, 'ПД5,0': 10, 'ПГ1,5': 5}
+ENGINE_MODELS = {'Kubota V3300': 30, 'Kubota D1803': 20, 'ММЗ Д-243': 25, 'MMZ-4D': 15, 'Nissan K21': 10}
+TRANSMISSION_MODELS = {'10VA-00105': 40, '10VB-00106': 25, 'HF30-VP010': 20, 'HF50-VP020': 15}
+DRIVE_AXLE_MODELS = {'20VA-00101': 40, '20VB-00102': 25, 'HA30-02020': 20, 'HA50-VP010': 15}
+STEER_AXLE_MODELS = {'VS20-00001': 45, 'VS30-00001': 35, 'B350655A': 20}
+MAINTENANCE_TYPES = ['ТО-0 (50 м/час)', 'ТО-1 (200 м/час)', 'ТО-2 (400 м/час)', 'ТО-4 (1000м/час)', 'ТО-5 (2000м/час)']
+# Периодичность вида ТО в названии; ТО-0 - однократная обкатка
+HOURS_IN_NAME = re.compile(r'(\d+)\s*м/час')
+RECOVERY_METHODS = {'Ремонт узла': 70, 'Замена узла': 30}
+
+# Узел отказа: частота, описания отказов, запасные части
+FAILURE_NODES = {
+    'Двигатель': (30, ['повышенный шум', 'перегрев', 'не запускается', 'течь масла', 'падение мощности'],
+                  ['прокладки, прочие материалы', 'фильтр топливный', 'форсунка', 'ремень ГРМ', '']),
+    'Гидросистема': (25, ['течь гидравлики', 'падение давления', 'разрыв РВД'],
+                     ['РВД', 'уплотнения', 'гидронасос', '']),
+    'Трансмиссия': (15, ['проскальзывание', 'не включается передача', 'повышенный шум'],
+                    ['диск сцепления', 'шестерня ведущая', 'подшипник', '']),
+    'Ведущий мост': (12, ['разрушение подшипника', 'течь масла', 'стук при движении'],
+                     ['подшипник', 'сальник', 'полуось', '']),
+    'Управляемый мост': (10, ['блокировка колес', 'люфт рулевого управления'],
+                         ['колесо', 'шкворень', 'рулевая тяга', '']),
+    'Подъёмное устройство': (8, ['рывки при подъеме', 'самопроизвольное опускание', 'обрыв цепи'],
+                             ['цепь', 'ролик', 'гидроцилиндр', '']),
+}
+
+COMPANY_FORMS = ['ООО', 'ООО', 'ООО', 'АО', 'ИП']
+COMPANY_WORDS = [
+    'Альфа', 'Вектор', 'Гранит', 'Дельта', 'Звезда', 'Импульс', 'Кедр', 'Лидер', 'Магистраль',
+    'Нева', 'Орион', 'Прогресс', 'Ресурс', 'Сибирь', 'Техноком', 'Урал', 'Феникс', 'Эталон',
+]
+CITIES = [
+    'г. Москва', 'г. Санкт-Петербург', 'г. Новосибирск', 'г. Екатеринбург', 'г. Казань',
+    'г. Нижний Новгород', 'г. Челябинск', 'г. Самара', 'г. Омск', 'г. Ростов-на-Дону',
+    'г. Уфа', 'г. Красноярск', 'г. Пермь', 'г. Воронеж', 'г. Череповец',
+]
+EQUIPMENT = ['Стандарт', 'Стандарт', 'Стандарт', '1. Кабина с отопителем',
+             '1. Гидролинии с БРС', '1. Кабина с отопителем\n2. Дополнительная гидролиния']
+
+GROUPS = ['Клиенты', 'Сервисные организации', 'Менеджеры']
+
+
+def weighted(values):
+    """{значение: вес} -> (значения, накопленные веса) для Command.choice"""
+    return list(values), list(accumulate(values.values()))
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация синтетического парка машин с ТО и рекламациями для нагрузочного '
+        'тестирования. Результат воспроизводим при одинаковом --seed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--machines', type=int, default=1000, help='Количество машин')
+        parser.add_argument('--maintenance', type=int, default=None,
+                            help='Количество записей ТО (по умолчанию 20 на машину)')
+        parser.add_argument('--complaints', type=int, default=None,
+                            help='Количество рекламаций (по умолчанию 3 на машину)')
+        parser.add_argument('--clients', type=int, default=None,
+                            help='Количество клиентов (по умолчанию 1 на 50 машин)')
+        parser.add_argument('--services', type=int, default=10, help='Количество сервисных организаций')
+        parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора')
+        parser.add_argument('--until', type=date.fromisoformat, default=date(2025, 12, 31),
+                            help='Последняя дата в данных (ГГГГ-ММ-ДД)')
+        parser.add_argument('--prefix', default='SYN',
+                            help='Префикс заводских номеров и имен пользователей синтетических данных')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Количество записей в одной транзакции bulk_create')
+        parser.add_argument('--clear', action='store_true',
+                            help='Удалить ранее сгенерированные данные с тем же префиксом')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.until = options['until']
+
+        machines = options['machines']
+        maintenance = options['maintenance'] if options['maintenance'] is not None else machines * 20
+        complaints = options['complaints'] if options['complaints'] is not None else machines * 3
+        clients = options['clients'] or max(1, machines // 50)
+        services = max(1, options['services'])
+
+        if options['clear']:
+            self.clear()
+        if (
+            Machine.objects.filter(serial_number__startswith=self.prefix).exists()
+            or User.objects.filter(username__startswith=f'{self.prefix.lower()}_').exists()
+        ):
+            raise CommandError(
+                f'Синтетические данные с префиксом {self.prefix} уже есть - используйте --clear '
+                'или другой --prefix'
+            )
+
+        self.stdout.write(
+            f'🏭 Генерация: машин {machines}, ТО {maintenance}, рекламаций {complaints}, '
+            f'клиентов {clients}, сервисных организаций {services} (seed={options["seed"]})'
+        )
+        started = time.monotonic()
+
+        self.directories = self.create_directories()
+        client_ids = self.create_users('client', clients)
+        service_ids = self.create_users('service', services)
+        fleet = self.create_machines(machines, client_ids, service_ids)
+        self.create_maintenance(fleet, maintenance)
+        self.create_complaints(fleet, complaints)
+
+        # bulk_create не отправляет сигналы - сбрасываем кэши и считаем сводку явно
+        rebuild_machine_stats()
+        rebuild_failure_rollup()
+        directories_cache.invalidate()
+        machines_cache.invalidate()
+        forecast.invalidate()
+        complaints_analytics.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Готово за {time.monotonic() - started:.1f} с'
+        ))
+
+    # Служебные методы
+
+    def bulk_insert(self, model, objects):
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return len(objects)
+
+    def report(self, label, count, started):
+        elapsed = time.monotonic() - started
+        rate = count / elapsed if elapsed else count
+        self.stdout.write(f'  ✓ {label}: {count} ({elapsed:.1f} с, {rate:,.0f} строк/с)')
+
+    def choice(self, values):
+        items, cum_weights = values
+        return items[bisect.bisect(cum_weights, self.rng.random() * cum_weights[-1])]
+
+    def company_name(self, number):
+        form = self.rng.choice(COMPANY_FORMS)
+        word = self.rng.choice(COMPANY_WORDS)
+        return f'{form} "{word}-{number}"'
+
+    def serial(self, length=8):
+        return ''.join(self.rng.choice('0123456789ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(length))
+
+    def allocate(self, total, weights):
+        """Распределение total записей по машинам пропорционально весам"""
+        cum_weights = list(accumulate(weights))
+        counts = Counter(
+            bisect.bisect(cum_weights, value * cum_weights[-1])
+            for value in (self.rng.random() for _ in range(total))
+        )
+        return counts
+
+    # Этапы генерации
+
+    def clear(self):
+        """
+        Удаление прежнего парка SQL-запросом DELETE без загрузки строк и сигналов
+        удаления (отметки ленты изменений, пересчет ячеек куба на каждую
+        рекламацию): сводки и кэши пересчитываются после генерации. Зависимые
+        таблицы очищаются раньше машин - каскада у _raw_delete нет
+        """
+        started = time.monotonic()
+        machines = Machine.objects.filter(serial_number__startswith=self.prefix)
+        deleted = 0
+        with transaction.atomic():
+            for queryset in (
+                MachineStats.objects.filter(machine__in=machines),
+                Complaint.objects.filter(machine__in=machines),
+                Maintenance.objects.filter(machine__in=machines),
+                machines,
+            ):
+                deleted += queryset._raw_delete(router.db_for_write(queryset.model))
+        User.objects.filter(username__startswith=f'{self.prefix.lower()}_').delete()
+        self.report('Удалено ранее сгенерированных записей', deleted, started)
+
+    def create_directories(self):
+        """Справочники: название -> pk (существующие записи используются повторно)"""
+        started = time.monotonic()
+        directories = {}
+        for model, names in [
+            (TechniqueModel, TECHNIQUE_MODELS),
+            (EngineModel, ENGINE_MODELS),
+            (TransmissionModel, TRANSMISSION_MODELS),
+            (DriveAxleModel, DRIVE_AXLE_MODELS),
+            (SteerAxleModel, STEER_AXLE_MODELS),
+            (MaintenanceType, MAINTENANCE_TYPES),
+            (FailureNode, FAILURE_NODES),
+            (RecoveryMethod, RECOVERY_METHODS),
+        ]:
+            directories[model] = {
+                name: model.objects.get_or_create(name=name, defaults=self.directory_defaults(model, name))[0].pk
+                for name in names
+            }
+        self.report('Справочники', sum(map(len, directories.values())), started)
+        return directories
+
+    def directory_defaults(self, model, name):
+        """Поля новой записи справочника: у вида ТО - периодичность для прогноза ТО"""
+        defaults = {'description': ''}
+        if model is MaintenanceType:
+            defaults['interval_hours'] = int(HOURS_IN_NAME.search(name).group(1))
+            defaults['is_recurring'] = not name.startswith('ТО-0')
+        return defaults
+
+    def create_users(self, role, count):
+        """
+        Пользователи роли с профилями и группой.
+        Возвращает список (pk пользователя, название организации)
+        """
+        started = time.monotonic()
+        password = make_password(None)
+        users = [
+            User(
+                username=f'{self.prefix.lower()}_{role}_{number}',
+                first_name=self.company_name(number)[:30],
+                role=role,
+                password=password,
+                is_active=True,
+            )
+            for number in range(count)
+        ]
+        self.bulk_insert(User, users)
+
+        names = [user.first_name for user in users]
+        if role == 'client':
+            group_name = GROUPS[0]
+            profiles = [ClientProfile(user_id=user.pk, company_name=name) for user, name in zip(users, names)]
+        else:
+            group_name = GROUPS[1]
+            profiles = [ServiceOrganizationProfile(user_id=user.pk, organization_name=name)
+                        for user, name in zip(users, names)]
+            # Сервисная организация есть и в справочнике сервисных компаний
+            ServiceCompany.objects.bulk_create(
+                [ServiceCompany(name=name, description='') for name in names],
+                batch_size=self.batch_size, ignore_conflicts=True
+            )
+            companies = dict(ServiceCompany.objects.filter(name__in=names).values_list('name', 'pk'))
+            self.directories[ServiceCompany] = {**self.directories.get(ServiceCompany, {}), **companies}
+        self.bulk_insert(type(profiles[0]), profiles)
+
+        group, _ = Group.objects.get_or_create(name=group_name)
+        self.bulk_insert(User.groups.through, [
+            User.groups.through(user_id=user.pk, group_id=group.pk) for user in users
+        ])
+
+        self.report('Клиенты' if role == 'client' else 'Сервисные организации', count, started)
+        return [(user.pk, name) for user, name in zip(users, names)]
+
+    def create_machines(self, count, client_ids, service_ids):
+        """
+        Машины. Клиенты распределены неравномерно (крупные клиенты владеют
+        большой долей парка), интенсивность работы машины - логнормальная.
+        Возвращает список (pk, дата отгрузки, м/час в день, сервисная организация)
+        """
+        started = time.monotonic()
+        rng = self.rng
+        directories = self.directories
+        technique_models = weighted({
+            directories[TechniqueModel][name]: weight for name, weight in TECHNIQUE_MODELS.items()
+        })
+        engine_models = weighted({directories[EngineModel][name]: w for name, w in ENGINE_MODELS.items()})
+        transmission_models = weighted({
+            directories[TransmissionModel][name]: w for name, w in TRANSMISSION_MODELS.items()
+        })
+        drive_axle_models = weighted({directories[DriveAxleModel][name]: w for name, w in DRIVE_AXLE_MODELS.items()})
+        steer_axle_models = weighted({directories[SteerAxleModel][name]: w for name, w in STEER_AXLE_MODELS.items()})
+        # Распределение Ципфа по клиентам
+        clients = weighted({client: 1 / (rank + 1) ** 0.8 for rank, client in enumerate(client_ids)})
+
+        first_day = self.until - timedelta(days=365 * 7)
+        shipment_span = (self.until - first_day).days - 30
+
+        fleet = []
+        created = 0
+        for start in range(0, count, self.batch_size):
+            batch = []
+            meta = []
+            for number in range(start, min(start + self.batch_size, count)):
+                client_id, client_name = self.choice(clients)
+                service_index = number % len(service_ids)
+                service_id = service_ids[service_index][0]
+                shipment_date = first_day + timedelta(days=rng.randrange(shipment_span))
+                batch.append(Machine(
+                    serial_number=f'{self.prefix}{number:07d}',
+                    technique_model_id=self.choice(technique_models),
+                    engine_model_id=self.choice(engine_models),
+                    engine_serial=self.serial(),
+                    transmission_model_id=self.choice(transmission_models),
+                    transmission_serial=self.serial(),
+                    drive_axle_model_id=self.choice(drive_axle_models),
+                    drive_axle_serial=self.serial(),
+                    steer_axle_model_id=self.choice(steer_axle_models),
+                    steer_axle_serial=self.serial(),
+                    supply_contract=f'Договор №{rng.randrange(1, 9999)} от {shipment_date:%d.%m.%Y}',
+                    shipment_date=shipment_date,
+                    consignee=client_name,
+                    delivery_address=rng.choice(CITIES),
+                    equipment=rng.choice(EQUIPMENT),
+                    client_id=client_id,
+                    service_organization_id=service_id,
+                ))
+                # м/час в день: медиана около 6, от 0,5 до 20
+                hours_per_day = min(20.0, max(0.5, rng.lognormvariate(math.log(6), 0.5)))
+                meta.append((shipment_date, hours_per_day, service_index))
+
+            created += self.bulk_insert(Machine, batch)
+            fleet.extend(
+                (machine.pk, shipment_date, hours_per_day, service_index)
+                for machine, (shipment_date, hours_per_day, service_index) in zip(batch, meta)
+            )
+
+        self.service_ids = service_ids
+        self.report('Машины', created, started)
+        return fleet
+
+    def machine_weights(self, fleet):
+        """Число записей у машины пропорционально ее суммарной наработке"""
+        return [(self.until - shipment_date).days * hours_per_day for _, shipment_date, hours_per_day, _ in fleet]
+
+    def service_company_ids(self):
+        return [self.directories[ServiceCompany][name] for _, name in self.service_ids]
+
+    def life_points(self, shipment_date, hours_per_day, count):
+        """count отсортированных (дата, наработка) за срок службы машины"""
+        days = (self.until - shipment_date).days
+        offsets = sorted(self.rng.randrange(1, days + 1) for _ in range(count))
+        hours = 0
+        points = []
+        previous = 0
+        for offset in offsets:
+            # Наработка растет монотонно, суточная интенсивность колеблется
+            hours += max(0, round((offset - previous) * hours_per_day * self.rng.uniform(0.7, 1.3)))
+            previous = offset
+            points.append((shipment_date + timedelta(days=offset), hours))
+        return points
+
+    def create_maintenance(self, fleet, total):
+        """ТО: вид ТО соответствует наработке (чем больше интервал, тем реже)"""
+        started = time.monotonic()
+        rng = self.rng
+        types = []
+        for name, pk in self.directories[MaintenanceType].items():
+            interval = int(HOURS_IN_NAME.search(name).group(1))
+            types.append((interval, pk))
+        types.sort()
+        first_type = types[0][1]
+        later_types = weighted({pk: 1 / interval for interval, pk in types[1:]})
+        companies = self.service_company_ids()
+
+        counts = self.allocate(total, self.machine_weights(fleet))
+        created = 0
+        batch = []
+        for index, (machine_id, shipment_date, hours_per_day, service_index) in enumerate(fleet):
+            company_id = companies[service_index]
+            company_name = self.service_ids[service_index][1]
+            for number, (maintenance_date, hours) in enumerate(
+                self.life_points(shipment_date, hours_per_day, counts.get(index, 0))
+            ):
+                batch.append(Maintenance(
+                    maintenance_type_id=first_type if number == 0 else self.choice(later_types),
+                    maintenance_date=maintenance_date,
+                    operating_hours=hours,
+                    work_order_number=f'#{maintenance_date.year}-{rng.randrange(1, 99)}КЕ{number + 1}{self.prefix}',
+                    work_order_date=maintenance_date - timedelta(days=rng.randrange(4)),
+                    maintenance_company=company_name,
+                    machine_id=machine_id,
+                    service_company_id=company_id,
+                ))
+                if len(batch) >= self.batch_size:
+                    created += self.bulk_insert(Maintenance, batch)
+                    batch = []
+        if batch:
+            created += self.bulk_insert(Maintenance, batch)
+        self.report('ТО', created, started)
+
+    def create_complaints(self, fleet, total):
+        """Рекламации: простой - логнормальный (медиана около 5 дней)"""
+        started = time.monotonic()
+        rng = self.rng
+        nodes = weighted({
+            self.directories[FailureNode][name]: weight for name, (weight, _, _) in FAILURE_NODES.items()
+        })
+        details = {
+            self.directories[FailureNode][name]: (descriptions, parts)
+            for name, (_, descriptions, parts) in FAILURE_NODES.items()
+        }
+        recovery_methods = weighted({
+            self.directories[RecoveryMethod][name]: weight for name, weight in RECOVERY_METHODS.items()
+        })
+        companies = self.service_company_ids()
+
+        counts = self.allocate(total, self.machine_weights(fleet))
+        created = 0
+        batch = []
+        for index, (machine_id, shipment_date, hours_per_day, service_index) in enumerate(fleet):
+            for failure_date, hours in self.life_points(shipment_date, hours_per_day, counts.get(index, 0)):
+                node_id = self.choice(nodes)
+                descriptions, parts = details[node_id]
+                downtime = min(120, max(1, round(rng.lognormvariate(math.log(5), 0.8))))
+                batch.append(Complaint(
+                    failure_date=failure_date,
+                    operating_hours=hours,
+                    failure_node_id=node_id,
+                    failure_description=rng.choice(descriptions),
+                    recovery_method_id=self.choice(recovery_methods),
+                    spare_parts=rng.choice(parts),
+                    recovery_date=failure_date + timedelta(days=downtime),
+                    # bulk_create не вызывает Complaint.save() - простой задаем явно
+                    downtime=downtime,
+                    machine_id=machine_id,
+                    service_company_id=companies[service_index],
+                ))
+                if len(batch) >= self.batch_size:
+                    created += self.bulk_insert(Complaint, batch)
+                    batch = []
+        if batch:
+            created += self.bulk_insert(Complaint, batch)
+        self.report('Рекламации', created, started)
@@ -1,6 +1,7 @@
-import pandas as pd
+from itertools import islice
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import Group
+from django.db import transaction
 from datetime import datetime
 from directories.models import (
     TechniqueModel, EngineModel, TransmissionModel,
@@ -11,12 +12,50 @@ from machines.models import Machine
 from maintenance.models import Maintenance
 from complaints.models import Complaint
 from accounts.models import User, ClientProfile, ServiceOrganizationProfile
+from machines.excel_reader import SilantWorkbook, MACHINES_SHEET
+from directories import cache as directories_cache
+from machines import cache as machines_cache
+from complaints import analytics as complaints_analytics
+from complaints.rollup import rebuild_failure_rollup
+from machines import forecast
+from machines.stats import rebuild_machine_stats
+
+# Размер порции для запросов вида field__in=[...] (лимит параметров SQLite - 999)
+IN_QUERY_CHUNK = 900
+
+
+def chunked(values, size):
+    """Разбивает последовательность на порции заданного размера"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def batched(iterable, size):
+    """Разбивает поток строк на списки по size элементов, не читая поток целиком"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
 
 class Command(BaseCommand):
     help = 'Load data from Excel file (FINAL VERSION with correct models)'
 
     def add_arguments(self, parser):
         parser.add_argument('filename', type=str, help='Excel filename to load')
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Пакетная загрузка: справочники, пользователи и машины '
+                 'сопоставляются набором запросов, записи вставляются через bulk_create'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк листа, обрабатываемых и записываемых одной транзакцией '
+                 'в пакетном режиме'
+        )
 
     def handle(self, *args, **options):
         filename = options['filename']
@@ -26,14 +65,28 @@ class Command(BaseCommand):
             # Создаем группы пользователей
             self.create_user_groups()
             
-            # Загружаем данные из листа "машины"
-            self.load_machines_data(filename)
-            
-            # Загружаем данные из листа "ТО output"
-            self.load_maintenance_data(filename)
-            
-            # Загружаем данные из листа "рекламация output"
-            self.load_complaints_data(filename)
+            # Книга открывается один раз, листы читаются потоково
+            with SilantWorkbook(filename) as workbook:
+                if options['bulk']:
+                    batch_size = options['batch_size']
+                    self.directory_cache = {}
+                    try:
+                        self.load_machines_data_bulk(workbook, batch_size)
+                        self.load_maintenance_data_bulk(workbook, batch_size)
+                        self.load_complaints_data_bulk(workbook, batch_size)
+                    finally:
+                        # Пакеты фиксируются по отдельности - сводки пересчитываются
+                        # и после прерванной загрузки
+                        self.refresh_summaries()
+                else:
+                    # Загружаем данные из листа "машины"
+                    self.load_machines_data(workbook)
+                    
+                    # Загружаем данные из листа "ТО output"
+                    self.load_maintenance_data(workbook)
+                    
+                    # Загружаем данные из листа "рекламация output"
+                    self.load_complaints_data(workbook)
             
             self.stdout.write(self.style.SUCCESS('Данные успешно загружены!'))
             
@@ -50,29 +103,25 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(f'Создана группа: {group_name}')
 
-    def load_machines_data(self, filename):
+    def load_machines_data(self, workbook):
         """Загрузка данных о машинах"""
         self.stdout.write('Загружаем данные о машинах...')
         
-        # Читаем лист "машины"
-        df = pd.read_excel(filename, sheet_name='машины')
-        
-        # Выводим столбцы для проверки
+        # Выводим столбцы листа "машины" для проверки
         self.stdout.write('Доступные столбцы:')
-        for i, col in enumerate(df.columns):
+        for i, col in enumerate(workbook.columns(MACHINES_SHEET)):
             self.stdout.write(f'{i}: "{col}"')
         
-        for index, row in df.iterrows():
+        for index, row in workbook.machines():
             try:
-                # Используем доступ по индексу столбцов
-                technique_name = str(df.iloc[index, 1])  # Модель техники
-                engine_name = str(df.iloc[index, 3])     # Модель двигателя
-                transmission_name = str(df.iloc[index, 5])  # Модель трансмиссии
-                drive_axle_name = str(df.iloc[index, 7])    # Модель ведущего моста
-                steer_axle_name = str(df.iloc[index, 9])    # Модель управляемого моста
-                service_company_name = str(df.iloc[index, 16])  # Сервисная компания
-                serial_number = str(df.iloc[index, 2])      # Зав. № машины
-                buyer_name = str(df.iloc[index, 12])  # Покупатель
+                technique_name = row.technique_model
+                engine_name = row.engine_model
+                transmission_name = row.transmission_model
+                drive_axle_name = row.drive_axle_model
+                steer_axle_name = row.steer_axle_model
+                service_company_name = row.service_company
+                serial_number = row.serial_number
+                buyer_name = row.buyer
                 
                 self.stdout.write(f'Обрабатываем машину {serial_number}...')
                 
@@ -163,7 +212,9 @@ class Command(BaseCommand):
                     self.stdout.write(f'  Создана запись в справочнике: {service_company_name}')
                 
                 # Получаем дату отгрузки
-                shipment_date = df.iloc[index, 11].date()  # Дата отгрузки с завода
+                shipment_date = row.shipment_date
+                if shipment_date is None:
+                    raise ValueError('не указана дата отгрузки')
                 
                 # Создаем машину с правильными связями
                 machine, created = Machine.objects.get_or_create(
@@ -171,18 +222,18 @@ class Command(BaseCommand):
                     defaults={
                         'technique_model': technique_model,
                         'engine_model': engine_model,
-                        'engine_serial': str(df.iloc[index, 4]),   # Зав. № двигателя
+                        'engine_serial': row.engine_serial,
                         'transmission_model': transmission_model,
-                        'transmission_serial': str(df.iloc[index, 6]),  # Зав. № трансмиссии
+                        'transmission_serial': row.transmission_serial,
                         'drive_axle_model': drive_axle_model,
-                        'drive_axle_serial': str(df.iloc[index, 8]),    # Зав. № ведущего моста
+                        'drive_axle_serial': row.drive_axle_serial,
                         'steer_axle_model': steer_axle_model,
-                        'steer_axle_serial': str(df.iloc[index, 10]),   # Зав. № управляемого моста
+                        'steer_axle_serial': row.steer_axle_serial,
                         'supply_contract': f"Договор с {buyer_name}",
                         'shipment_date': shipment_date,
-                        'consignee': str(df.iloc[index, 13]),      # Грузополучатель
-                        'delivery_address': str(df.iloc[index, 14]), # Адрес поставки
-                        'equipment': str(df.iloc[index, 15]),      # Комплектация
+                        'consignee': row.consignee,
+                        'delivery_address': row.delivery_address,
+                        'equipment': row.equipment,
                         'client': client,  # Связываем с пользователем-клиентом
                         'service_organization': service_user,  # Связываем с пользователем-сервисом
                     }
@@ -194,24 +245,22 @@ class Command(BaseCommand):
                     self.stdout.write(f'- Машина {machine.serial_number} уже существует')
                     
             except Exception as e:
-                self.stdout.write(f'✗ Ошибка при создании машины в строке {index + 1}: {e}')
+                self.stdout.write(f'✗ Ошибка при создании машины в строке {index}: {e}')
                 import traceback
                 traceback.print_exc()
 
-    def load_maintenance_data(self, filename):
+    def load_maintenance_data(self, workbook):
         """Загрузка данных о ТО"""
         self.stdout.write('\nЗагружаем данные о ТО...')
         
-        df = pd.read_excel(filename, sheet_name='ТО output')
-        
-        for index, row in df.iterrows():
+        for index, row in workbook.maintenance():
             try:
-                # Находим машину - используем доступ по индексу
-                serial_number = str(df.iloc[index, 0])  # Зав. № машины
+                # Находим машину
+                serial_number = row.serial_number
                 machine = Machine.objects.get(serial_number=serial_number)
                 
                 # Создаем или получаем тип ТО
-                maintenance_type_name = str(df.iloc[index, 1])  # Вид ТО
+                maintenance_type_name = row.maintenance_type
                 maintenance_type, created = MaintenanceType.objects.get_or_create(
                     name=maintenance_type_name,
                     defaults={'description': ''}
@@ -220,8 +269,10 @@ class Command(BaseCommand):
                     self.stdout.write(f'  Создан тип ТО: {maintenance_type_name}')
                 
                 # Получаем даты
-                maintenance_date = df.iloc[index, 2].date()  # Дата проведения ТО
-                work_order_date = df.iloc[index, 5].date()   # дата заказ-наряда
+                maintenance_date = row.maintenance_date
+                work_order_date = row.work_order_date
+                if maintenance_date is None or work_order_date is None:
+                    raise ValueError('не указана дата')
                 
                 # Получаем ServiceCompany из справочника
                 service_company = None
@@ -236,12 +287,12 @@ class Command(BaseCommand):
                 maintenance, created = Maintenance.objects.get_or_create(
                     machine=machine,
                     maintenance_date=maintenance_date,
-                    work_order_number=str(df.iloc[index, 4]),  # № заказ-наряда
+                    work_order_number=row.work_order_number,
                     defaults={
                         'maintenance_type': maintenance_type,
-                        'operating_hours': int(df.iloc[index, 3]),  # Наработка, м/час
+                        'operating_hours': row.operating_hours,
                         'work_order_date': work_order_date,
-                        'maintenance_company': str(df.iloc[index, 6]),  # Организация, проводившая ТО
+                        'maintenance_company': row.maintenance_company,
                         'service_company': service_company,  # ServiceCompany из справочника
                         'created_by': machine.service_organization,  # Связываем с пользователем-сервисом
                     }
@@ -253,22 +304,20 @@ class Command(BaseCommand):
             except Machine.DoesNotExist:
                 self.stdout.write(f'✗ Машина {serial_number} не найдена')
             except Exception as e:
-                self.stdout.write(f'✗ Ошибка при создании ТО в строке {index + 1}: {e}')
+                self.stdout.write(f'✗ Ошибка при создании ТО в строке {index}: {e}')
 
-    def load_complaints_data(self, filename):
+    def load_complaints_data(self, workbook):
         """Загрузка данных о рекламациях"""
         self.stdout.write('\nЗагружаем данные о рекламациях...')
         
-        df = pd.read_excel(filename, sheet_name='рекламация output')
-        
-        for index, row in df.iterrows():
+        for index, row in workbook.complaints():
             try:
-                # Находим машину - используем доступ по индексу
-                serial_number = str(df.iloc[index, 0])  # Зав. № машины
+                # Находим машину
+                serial_number = row.serial_number
                 machine = Machine.objects.get(serial_number=serial_number)
                 
                 # Создаем или получаем узел отказа
-                failure_node_name = str(df.iloc[index, 3])  # Узел отказа
+                failure_node_name = row.failure_node
                 failure_node, created = FailureNode.objects.get_or_create(
                     name=failure_node_name,
                     defaults={'description': ''}
@@ -277,7 +326,7 @@ class Command(BaseCommand):
                     self.stdout.write(f'  Создан узел отказа: {failure_node_name}')
                 
                 # Создаем или получаем способ восстановления
-                recovery_method_name = str(df.iloc[index, 5])  # Способ восстановления
+                recovery_method_name = row.recovery_method
                 recovery_method, created = RecoveryMethod.objects.get_or_create(
                     name=recovery_method_name,
                     defaults={'description': ''}
@@ -286,15 +335,13 @@ class Command(BaseCommand):
                     self.stdout.write(f'  Создан способ восстановления: {recovery_method_name}')
                 
                 # Получаем даты
-                failure_date = df.iloc[index, 1].date()    # Дата отказа
-                recovery_date = df.iloc[index, 7].date()   # Дата восстановления
+                failure_date = row.failure_date
+                recovery_date = row.recovery_date
+                if failure_date is None or recovery_date is None:
+                    raise ValueError('не указана дата')
                 
-                # Обрабатываем запасные части (может быть пустым)
-                spare_parts = df.iloc[index, 6]  # Используемые запасные части
-                if pd.isna(spare_parts):
-                    spare_parts = ''
-                else:
-                    spare_parts = str(spare_parts)
+                # Запасные части могут быть не указаны (пустая строка)
+                spare_parts = row.spare_parts
                 
                 # Получаем ServiceCompany из справочника
                 service_company = None
@@ -311,12 +358,12 @@ class Command(BaseCommand):
                     failure_date=failure_date,
                     failure_node=failure_node,
                     defaults={
-                        'operating_hours': int(df.iloc[index, 2]),  # Наработка, м/час
-                        'failure_description': str(df.iloc[index, 4]),  # Описание отказа
+                        'operating_hours': row.operating_hours,
+                        'failure_description': row.failure_description,
                         'recovery_method': recovery_method,
                         'spare_parts': spare_parts,
                         'recovery_date': recovery_date,
-                        'downtime': int(df.iloc[index, 8]),  # Время простоя техники
+                        'downtime': row.downtime,
                         'service_company': service_company,  # ServiceCompany из справочника
                         'created_by': machine.service_organization,  # Связываем с пользователем-сервисом
                     }
@@ -328,4 +375,318 @@ class Command(BaseCommand):
             except Machine.DoesNotExist:
                 self.stdout.write(f'✗ Машина {serial_number} не найдена')
             except Exception as e:
-                self.stdout.write(f'✗ Ошибка при создании рекламации в строке {index + 1}: {e}')
+                self.stdout.write(f'✗ Ошибка при создании рекламации в строке {index}: {e}')
+
+    # ------------------------------------------------------------------
+    # Пакетная загрузка (--bulk)
+    # ------------------------------------------------------------------
+
+    def refresh_summaries(self):
+        """
+        bulk_create не отправляет сигналы - сводки машин, куб рекламаций
+        и прогноз ТО пересчитываются явно, как в generate_fleet
+        """
+        self.stdout.write('\nПересчитываем сводки...')
+        stats = rebuild_machine_stats()
+        cells = rebuild_failure_rollup()
+        forecast.invalidate()
+        complaints_analytics.invalidate()
+        self.stdout.write(f'✓ Сводок машин: {stats}, ячеек куба рекламаций: {cells}')
+
+    def bulk_get_or_create(self, model, field, keys, build):
+        """
+        Аналог get_or_create для набора ключей.
+        Возвращает ({ключ: pk}, множество созданных ключей)
+        """
+        keys = set(keys)
+        found = {}
+        for chunk in chunked(keys, IN_QUERY_CHUNK):
+            found.update(
+                model.objects.filter(**{f'{field}__in': chunk}).values_list(field, 'pk')
+            )
+        
+        missing = keys - found.keys()
+        if missing:
+            model.objects.bulk_create(
+                [build(key) for key in missing],
+                batch_size=IN_QUERY_CHUNK,
+                ignore_conflicts=True
+            )
+            for chunk in chunked(missing, IN_QUERY_CHUNK):
+                found.update(
+                    model.objects.filter(**{f'{field}__in': chunk}).values_list(field, 'pk')
+                )
+            self.stdout.write(f'  {model._meta.verbose_name_plural}: создано {len(missing)}')
+        
+        return found, missing
+
+    def resolve_directory(self, model, names):
+        """
+        Название справочника -> pk, недостающие записи создаются одним запросом.
+        Справочники небольшие, поэтому найденные значения кэшируются между порциями
+        """
+        cache = self.directory_cache.setdefault(model, {})
+        unknown = set(names) - cache.keys()
+        if unknown:
+            found, created = self.bulk_get_or_create(
+                model, 'name', unknown,
+                lambda name: model(name=name, description='')
+            )
+            cache.update(found)
+            if created:
+                # bulk_create не отправляет сигналы - сбрасываем кэш справочников явно
+                directories_cache.invalidate()
+        return cache
+
+    def resolve_users(self, users, role, group_name, profile_model, profile_field):
+        """
+        Пользователи с профилями и группой: {username: отображаемое имя} -> {username: pk}
+        Профили и членство в группе создаются только для новых пользователей
+        """
+        found, created = self.bulk_get_or_create(
+            User, 'username', users,
+            lambda username: User(
+                username=username,
+                first_name=users[username][:30],
+                is_active=True,
+                role=role
+            )
+        )
+        
+        if created:
+            group = Group.objects.get(name=group_name)
+            profile_model.objects.bulk_create(
+                [profile_model(user_id=found[username], **{profile_field: users[username]})
+                 for username in created],
+                batch_size=IN_QUERY_CHUNK,
+                ignore_conflicts=True
+            )
+            User.groups.through.objects.bulk_create(
+                [User.groups.through(user_id=found[username], group_id=group.pk)
+                 for username in created],
+                batch_size=IN_QUERY_CHUNK,
+                ignore_conflicts=True
+            )
+        
+        return found
+
+    def resolve_machines(self, serial_numbers):
+        """
+        Зав. № машины -> (pk машины, pk сервисной организации, название сервисной организации)
+        """
+        machines = {}
+        for chunk in chunked(set(serial_numbers), IN_QUERY_CHUNK):
+            for serial, pk, service_id, service_name in Machine.objects.filter(
+                serial_number__in=chunk
+            ).values_list(
+                'serial_number', 'pk', 'service_organization_id',
+                'service_organization__service_profile__organization_name'
+            ):
+                machines[serial] = (pk, service_id, service_name)
+        return machines
+
+    def bulk_insert(self, model, objects, batch_size):
+        """Вставка порции записей в одной транзакции"""
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=batch_size)
+        return len(objects)
+
+    def load_machines_data_bulk(self, workbook, batch_size):
+        """Пакетная загрузка данных о машинах"""
+        self.stdout.write('Загружаем данные о машинах (пакетный режим)...')
+        
+        created = existing = 0
+        for batch in batched(workbook.machines(), batch_size):
+            rows = []
+            for index, row in batch:
+                if row.shipment_date is None:
+                    self.stdout.write(f'✗ Пропущена строка {index}: не указана дата отгрузки')
+                    continue
+                rows.append(row)
+            
+            # Справочники - по одному запросу на таблицу и только для новых названий
+            technique_models = self.resolve_directory(TechniqueModel, {row.technique_model for row in rows})
+            engine_models = self.resolve_directory(EngineModel, {row.engine_model for row in rows})
+            transmission_models = self.resolve_directory(TransmissionModel, {row.transmission_model for row in rows})
+            drive_axle_models = self.resolve_directory(DriveAxleModel, {row.drive_axle_model for row in rows})
+            steer_axle_models = self.resolve_directory(SteerAxleModel, {row.steer_axle_model for row in rows})
+            self.resolve_directory(ServiceCompany, {row.service_company for row in rows})
+            
+            # Клиенты и сервисные организации
+            clients = {f'client_{row.serial_number}': row.buyer for row in rows}
+            services = {
+                f"service_{row.service_company.replace(' ', '_').lower()}": row.service_company
+                for row in rows
+            }
+            client_ids = self.resolve_users(
+                clients, 'client', 'Клиенты', ClientProfile, 'company_name'
+            )
+            service_ids = self.resolve_users(
+                services, 'service', 'Сервисные организации',
+                ServiceOrganizationProfile, 'organization_name'
+            )
+            
+            known = set(self.resolve_machines(row.serial_number for row in rows))
+            
+            machines = []
+            for row in rows:
+                if row.serial_number in known:
+                    existing += 1
+                    continue
+                known.add(row.serial_number)
+                
+                machines.append(Machine(
+                    serial_number=row.serial_number,
+                    technique_model_id=technique_models[row.technique_model],
+                    engine_model_id=engine_models[row.engine_model],
+                    engine_serial=row.engine_serial,
+                    transmission_model_id=transmission_models[row.transmission_model],
+                    transmission_serial=row.transmission_serial,
+                    drive_axle_model_id=drive_axle_models[row.drive_axle_model],
+                    drive_axle_serial=row.drive_axle_serial,
+                    steer_axle_model_id=steer_axle_models[row.steer_axle_model],
+                    steer_axle_serial=row.steer_axle_serial,
+                    supply_contract=f"Договор с {row.buyer}",
+                    shipment_date=row.shipment_date,
+                    consignee=row.consignee,
+                    delivery_address=row.delivery_address,
+                    equipment=row.equipment,
+                    client_id=client_ids[f'client_{row.serial_number}'],
+                    service_organization_id=service_ids[
+                        f"service_{row.service_company.replace(' ', '_').lower()}"
+                    ],
+                ))
+            
+            created += self.bulk_insert(Machine, machines, batch_size)
+            if machines:
+                # bulk_create не отправляет сигналы - обновляем кэш поиска по номеру явно
+                machines_cache.invalidate()
+                complaints_analytics.invalidate()
+        
+        self.stdout.write(f'✓ Создано машин: {created}, уже существовало: {existing}')
+
+    def load_maintenance_data_bulk(self, workbook, batch_size):
+        """Пакетная загрузка данных о ТО"""
+        self.stdout.write('\nЗагружаем данные о ТО (пакетный режим)...')
+        
+        created = 0
+        for batch in batched(workbook.maintenance(), batch_size):
+            machines = self.resolve_machines(row.serial_number for _, row in batch)
+            maintenance_types = self.resolve_directory(
+                MaintenanceType, {row.maintenance_type for _, row in batch}
+            )
+            service_companies = self.resolve_directory(
+                ServiceCompany, {name for _, _, name in machines.values() if name}
+            )
+            
+            # Уже загруженные ТО (ключ как у get_or_create в построчном режиме)
+            existing = set()
+            for chunk in chunked([pk for pk, _, _ in machines.values()], IN_QUERY_CHUNK):
+                existing.update(
+                    Maintenance.objects.filter(machine_id__in=chunk).values_list(
+                        'machine_id', 'maintenance_date', 'work_order_number'
+                    )
+                )
+            
+            records = []
+            for index, row in batch:
+                if row.serial_number not in machines:
+                    self.stdout.write(f'✗ Машина {row.serial_number} не найдена')
+                    continue
+                machine_id, service_id, service_name = machines[row.serial_number]
+                
+                try:
+                    if row.maintenance_date is None or row.work_order_date is None:
+                        raise ValueError('не указана дата')
+                    if row.operating_hours is None:
+                        raise ValueError('не указана наработка')
+                    if not service_name:
+                        raise ValueError('у машины нет сервисной организации')
+                    
+                    key = (machine_id, row.maintenance_date, row.work_order_number)
+                    if key in existing:
+                        continue
+                    existing.add(key)
+                    
+                    records.append(Maintenance(
+                        machine_id=machine_id,
+                        maintenance_type_id=maintenance_types[row.maintenance_type],
+                        maintenance_date=row.maintenance_date,
+                        operating_hours=row.operating_hours,
+                        work_order_number=row.work_order_number,
+                        work_order_date=row.work_order_date,
+                        maintenance_company=row.maintenance_company,
+                        service_company_id=service_companies[service_name],
+                        created_by_id=service_id,
+                    ))
+                except Exception as e:
+                    self.stdout.write(f'✗ Ошибка при создании ТО в строке {index}: {e}')
+            
+            created += self.bulk_insert(Maintenance, records, batch_size)
+        
+        self.stdout.write(f'✓ Создано ТО: {created}')
+
+    def load_complaints_data_bulk(self, workbook, batch_size):
+        """Пакетная загрузка данных о рекламациях"""
+        self.stdout.write('\nЗагружаем данные о рекламациях (пакетный режим)...')
+        
+        created = 0
+        for batch in batched(workbook.complaints(), batch_size):
+            machines = self.resolve_machines(row.serial_number for _, row in batch)
+            failure_nodes = self.resolve_directory(FailureNode, {row.failure_node for _, row in batch})
+            recovery_methods = self.resolve_directory(RecoveryMethod, {row.recovery_method for _, row in batch})
+            service_companies = self.resolve_directory(
+                ServiceCompany, {name for _, _, name in machines.values() if name}
+            )
+            
+            existing = set()
+            for chunk in chunked([pk for pk, _, _ in machines.values()], IN_QUERY_CHUNK):
+                existing.update(
+                    Complaint.objects.filter(machine_id__in=chunk).values_list(
+                        'machine_id', 'failure_date', 'failure_node_id'
+                    )
+                )
+            
+            records = []
+            for index, row in batch:
+                if row.serial_number not in machines:
+                    self.stdout.write(f'✗ Машина {row.serial_number} не найдена')
+                    continue
+                machine_id, service_id, service_name = machines[row.serial_number]
+                
+                try:
+                    if row.failure_date is None or row.recovery_date is None:
+                        raise ValueError('не указана дата')
+                    if row.operating_hours is None:
+                        raise ValueError('не указана наработка')
+                    if not service_name:
+                        raise ValueError('у машины нет сервисной организации')
+                    
+                    failure_node_id = failure_nodes[row.failure_node]
+                    key = (machine_id, row.failure_date, failure_node_id)
+                    if key in existing:
+                        continue
+                    existing.add(key)
+                    
+                    records.append(Complaint(
+                        machine_id=machine_id,
+                        failure_date=row.failure_date,
+                        operating_hours=row.operating_hours,
+                        failure_node_id=failure_node_id,
+                        failure_description=row.failure_description,
+                        recovery_method_id=recovery_methods[row.recovery_method],
+                        spare_parts=row.spare_parts,
+                        recovery_date=row.recovery_date,
+                        # bulk_create не вызывает Complaint.save(), поэтому время простоя считаем здесь
+                        downtime=(row.recovery_date - row.failure_date).days,
+                        service_company_id=service_companies[service_name],
+                        created_by_id=service_id,
+                    ))
+                except Exception as e:
+                    self.stdout.write(f'✗ Ошибка при создании рекламации в строке {index}: {e}')
+            
+            created += self.bulk_insert(Complaint, records, batch_size)
+            if records:
+                complaints_analytics.invalidate()
+        
+        self.stdout.write(f'✓ Создано рекламаций: {created}')
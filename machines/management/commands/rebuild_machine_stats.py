@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from machines.stats import rebuild_machine_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Полный пересчет сводки по машинам (MachineStats): последнее ТО, наработка, '
+        'количество рекламаций и простой. Нужен после загрузки данных в обход сигналов'
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transaction.atomic():
+            count = rebuild_machine_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Сводка пересчитана для {count} машин за {time.monotonic() - started:.1f} с'
+        ))
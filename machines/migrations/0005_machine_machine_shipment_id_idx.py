@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directories', '0002_directory'),
+        ('machines', '0004_alter_machine_client_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['-shipment_date', '-id'], name='machine_shipment_id_idx'),
+        ),
+    ]
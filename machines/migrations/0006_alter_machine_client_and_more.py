@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directories', '0002_directory'),
+        ('machines', '0005_machine_machine_shipment_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='machine',
+            name='client',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='owned_machines', to=settings.AUTH_USER_MODEL, verbose_name='Клиент'),
+        ),
+        migrations.AlterField(
+            model_name='machine',
+            name='service_organization',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='serviced_machines', to=settings.AUTH_USER_MODEL, verbose_name='Сервисная организация'),
+        ),
+        migrations.AlterField(
+            model_name='machine',
+            name='technique_model',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='directories.techniquemodel', verbose_name='Модель техники'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['client', '-shipment_date'], name='machine_client_ship_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['service_organization', '-shipment_date'], name='machine_service_ship_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['technique_model', '-shipment_date'], name='machine_model_ship_idx'),
+        ),
+    ]
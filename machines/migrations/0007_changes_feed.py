@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machines', '0006_alter_machine_client_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('machine', 'Машина'), ('maintenance', 'Техническое обслуживание'), ('complaint', 'Рекламация')], max_length=20, verbose_name='Тип записи')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID записи')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Удалено')),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('service_organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Сервисная организация')),
+            ],
+            options={
+                'verbose_name': 'Удаленная запись',
+                'verbose_name_plural': 'Удаленные записи',
+                'ordering': ['deleted_at', 'id'],
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='deleted_at_id_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='machine',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Создано'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='machine',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменено'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['updated_at', 'id'], name='machine_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['created_at'], name='machine_created_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from machines.stats import STATS_BATCH_SIZE, stats_values
+
+
+def fill_stats(apps, schema_editor):
+    """Сводка для существующих машин"""
+    Machine = apps.get_model('machines', 'Machine')
+    MachineStats = apps.get_model('machines', 'MachineStats')
+    Maintenance = apps.get_model('maintenance', 'Maintenance')
+    Complaint = apps.get_model('complaints', 'Complaint')
+    MachineStats.objects.bulk_create(
+        [MachineStats(machine_id=pk) for pk in Machine.objects.values_list('pk', flat=True).iterator()],
+        batch_size=STATS_BATCH_SIZE,
+    )
+    MachineStats.objects.update(**stats_values(Maintenance, Complaint))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directories', '0002_directory'),
+        ('machines', '0007_changes_feed'),
+        ('maintenance', '0007_changes_feed'),
+        ('complaints', '0007_changes_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineStats',
+            fields=[
+                ('machine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='machines.machine', verbose_name='Машина')),
+                ('last_maintenance_date', models.DateField(blank=True, null=True, verbose_name='Дата последнего ТО')),
+                ('operating_hours', models.PositiveIntegerField(default=0, verbose_name='Наработка, м/час')),
+                ('maintenance_count', models.PositiveIntegerField(default=0, verbose_name='Количество ТО')),
+                ('complaint_count', models.PositiveIntegerField(default=0, verbose_name='Количество рекламаций')),
+                ('total_downtime', models.PositiveIntegerField(default=0, verbose_name='Суммарный простой (дни)')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Пересчитано')),
+                ('last_maintenance_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='directories.maintenancetype', verbose_name='Вид последнего ТО')),
+            ],
+            options={
+                'verbose_name': 'Сводка по машине',
+                'verbose_name_plural': 'Сводки по машинам',
+                'indexes': [models.Index(fields=['operating_hours'], name='stats_hours_idx'), models.Index(fields=['complaint_count'], name='stats_complaints_idx'), models.Index(fields=['total_downtime'], name='stats_downtime_idx'), models.Index(fields=['last_maintenance_date'], name='stats_last_maint_idx')],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,18 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from directories.models import (
     TechniqueModel, EngineModel, TransmissionModel,
-    DriveAxleModel, SteerAxleModel, ServiceCompany
+    DriveAxleModel, SteerAxleModel, ServiceCompany, MaintenanceType
 )
+from silant_project.scoping import RoleScopedQuerySet
+
+
+class MachineQuerySet(RoleScopedQuerySet):
+    """Машины: список публичный, область видимости - по полям самой машины"""
+    machine_path = ''
+    public = True
+
 
 class Machine(models.Model):
     """Модель машины"""
@@ -12,7 +21,12 @@ class Machine(models.Model):
     serial_number = models.CharField(max_length=50, unique=True, verbose_name='Заводской номер машины')
     
     # 2. Модель техники (справочник)
-    technique_model = models.ForeignKey(TechniqueModel, on_delete=models.CASCADE, verbose_name='Модель техники')
+    technique_model = models.ForeignKey(
+        TechniqueModel,
+        on_delete=models.CASCADE,
+        db_index=False,  # индекс machine_model_ship_idx
+        verbose_name='Модель техники'
+    )
     
     # 3. Модель двигателя (справочник)
     engine_model = models.ForeignKey(EngineModel, on_delete=models.CASCADE, verbose_name='Модель двигателя')
@@ -58,6 +72,7 @@ class Machine(models.Model):
         settings.AUTH_USER_MODEL, 
         on_delete=models.SET_NULL,  # Изменено с CASCADE на SET_NULL
         related_name='owned_machines',
+        db_index=False,  # индекс machine_client_ship_idx
         null=True, 
         blank=True,
         verbose_name='Клиент'
@@ -68,15 +83,131 @@ class Machine(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,  # Изменено с CASCADE на SET_NULL
         related_name='serviced_machines',
+        db_index=False,  # индекс machine_service_ship_idx
         null=True,
         blank=True,
         verbose_name='Сервисная организация'
     )
     
+    # Время создания и последнего изменения (лента изменений /api/changes/)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Изменено')
+    
+    objects = MachineQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Машина'
         verbose_name_plural = 'Машины'
         ordering = ['-shipment_date']
+        indexes = [
+            # Ключ курсорной пагинации: сортировка по умолчанию + id
+            models.Index(fields=['-shipment_date', '-id'], name='machine_shipment_id_idx'),
+            # Область видимости клиента и сервисной организации + сортировка по умолчанию
+            models.Index(fields=['client', '-shipment_date'], name='machine_client_ship_idx'),
+            models.Index(fields=['service_organization', '-shipment_date'], name='machine_service_ship_idx'),
+            # Фильтр по модели техники + диапазон дат отгрузки
+            models.Index(fields=['technique_model', '-shipment_date'], name='machine_model_ship_idx'),
+            # Лента изменений: ключ курсора (updated_at, id), выборка новых записей
+            models.Index(fields=['updated_at', 'id'], name='machine_updated_id_idx'),
+            models.Index(fields=['created_at'], name='machine_created_idx'),
+        ]
     
     def __str__(self):
         return f"Машина №{self.serial_number}"
+
+
+class MachineStats(models.Model):
+    """
+    Сводка по машине для панелей менеджера: последнее ТО, текущая наработка,
+    число рекламаций и суммарный простой. Пересчитывается сигналами при
+    изменении ТО и рекламаций машины (см. machines.stats)
+    """
+    machine = models.OneToOneField(
+        Machine,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Машина'
+    )
+    last_maintenance_date = models.DateField(null=True, blank=True, verbose_name='Дата последнего ТО')
+    last_maintenance_type = models.ForeignKey(
+        MaintenanceType,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name='Вид последнего ТО'
+    )
+    # Наибольшая наработка по ТО и рекламациям
+    operating_hours = models.PositiveIntegerField(default=0, verbose_name='Наработка, м/час')
+    maintenance_count = models.PositiveIntegerField(default=0, verbose_name='Количество ТО')
+    complaint_count = models.PositiveIntegerField(default=0, verbose_name='Количество рекламаций')
+    total_downtime = models.PositiveIntegerField(default=0, verbose_name='Суммарный простой (дни)')
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name='Пересчитано')
+
+    class Meta:
+        verbose_name = 'Сводка по машине'
+        verbose_name_plural = 'Сводки по машинам'
+        indexes = [
+            # Сортировка и фильтры списка машин
+            models.Index(fields=['operating_hours'], name='stats_hours_idx'),
+            models.Index(fields=['complaint_count'], name='stats_complaints_idx'),
+            models.Index(fields=['total_downtime'], name='stats_downtime_idx'),
+            models.Index(fields=['last_maintenance_date'], name='stats_last_maint_idx'),
+        ]
+
+    def __str__(self):
+        return f"Сводка по машине #{self.machine_id}"
+
+
+class DeletedRecordQuerySet(RoleScopedQuerySet):
+    """Отметки об удалении видны владельцам машины на момент удаления"""
+    machine_path = ''
+
+
+class DeletedRecord(models.Model):
+    """
+    Отметка об удалении машины, ТО или рекламации (tombstone).
+    По ней лента изменений /api/changes/ сообщает клиентам синхронизации
+    об удаленных записях
+    """
+    MODEL_CHOICES = [
+        ('machine', 'Машина'),
+        ('maintenance', 'Техническое обслуживание'),
+        ('complaint', 'Рекламация'),
+    ]
+    
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name='Тип записи')
+    object_id = models.PositiveBigIntegerField(verbose_name='ID записи')
+    # Клиент и сервисная организация машины на момент удаления - область видимости отметки
+    client = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name='Клиент'
+    )
+    service_organization = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name='Сервисная организация'
+    )
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name='Удалено')
+    
+    objects = DeletedRecordQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Удаленная запись'
+        verbose_name_plural = 'Удаленные записи'
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            # Ключ курсора ленты изменений
+            models.Index(fields=['deleted_at', 'id'], name='deleted_at_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_model_display()} #{self.object_id} удалена {self.deleted_at:%d.%m.%Y %H:%M}"
@@ -1,8 +1,15 @@
 from rest_framework import permissions
 
+from silant_project.scoping import has_role
+
+
 class MachinePermission(permissions.BasePermission):
     """
-    Разрешения для машин в зависимости от роли пользователя
+    Разрешения для машин в зависимости от роли пользователя.
+    
+    Принадлежность машины клиенту или сервисной организации проверяется
+    в SQL: объект берется из Machine.objects.for_user(user), чужая машина
+    дает 404 без дополнительных запросов
     """
     
     def has_permission(self, request, view):
@@ -18,22 +25,6 @@ class MachinePermission(permissions.BasePermission):
         if not request.user.is_authenticated:
             return request.method in permissions.SAFE_METHODS
     
-        # Суперпользователь имеет полный доступ
-        if request.user.is_superuser:
-            return True
-    
-        # Проверяем, есть ли у пользователя атрибут role
-        if hasattr(request.user, 'role'):
-            # Менеджер имеет полный доступ
-            if request.user.role == 'manager':
-                return True
-        
-            # Клиент имеет доступ только к своим машинам
-            if request.user.role == 'client':
-                return obj.client == request.user
-        
-            # Сервисная организация имеет доступ к обслуживаемым машинам
-            if request.user.role == 'service':
-                return obj.service_organization == request.user
-    
-        return False
+        # Суперпользователь, менеджер, клиент и сервисная организация -
+        # в пределах своей области видимости
+        return has_role(request.user)
@@ -0,0 +1,83 @@
+"""
+Планирование запросов по полям сериализатора.
+
+По атрибутам модели, которые реально читает сериализатор, строится
+select_related (связи, по которым идут обращения) и only (колонки, которые
+нужно загрузить), чтобы страница списка выбиралась одним запросом без N+1.
+"""
+from django.core.exceptions import FieldDoesNotExist
+
+
+def serializer_sources(serializer):
+    """
+    Пути атрибутов модели ('technique_model.name', ...), которые читает сериализатор.
+    Для SerializerMethodField пути берутся из атрибута сериализатора field_sources.
+    None - если сериализатор читает объект целиком и план составить нельзя
+    """
+    extra_sources = getattr(serializer, 'field_sources', {})
+    sources = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in extra_sources:
+            sources.extend(extra_sources[name])
+        elif field.source == '*':
+            return None
+        else:
+            sources.append(field.source)
+    return sources
+
+
+def resolve_source(model, source):
+    """
+    Разбор пути атрибута по метаданным модели.
+    Возвращает (пути связей для select_related, путь колонки для only)
+    или None, если путь не является цепочкой полей модели
+    """
+    relations = []
+    path = []
+    attrs = source.split('.')
+    for position, attr in enumerate(attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if field.many_to_many or field.one_to_many:
+            return None
+
+        path.append(attr)
+        if position == len(attrs) - 1:
+            break
+        if not field.is_relation:
+            return None
+        relations.append('__'.join(path))
+        model = field.related_model
+
+    return relations, '__'.join(path)
+
+
+def plan_queryset(queryset, serializer):
+    """Добавляет к queryset select_related/only по полям сериализатора"""
+    sources = serializer_sources(serializer)
+    if sources is None:
+        return queryset
+
+    relations = set()
+    columns = set()
+    restrict_columns = True
+    for source in sources:
+        resolved = resolve_source(queryset.model, source)
+        if resolved is None:
+            # Свойство или метод модели - какие колонки нужны, неизвестно
+            restrict_columns = False
+            continue
+        source_relations, column = resolved
+        relations.update(source_relations)
+        columns.update(source_relations)
+        columns.add(column)
+
+    if relations:
+        queryset = queryset.select_related(*sorted(relations))
+    if restrict_columns:
+        queryset = queryset.only(*sorted(columns))
+    return queryset
@@ -2,9 +2,10 @@ from rest_framework import serializers
 from .models import Machine
 from accounts.models import User
 from maintenance.models import Maintenance
+from silant_project.fieldsets import SparseFieldsetSerializerMixin
 
 
-class MachinePublicSerializer(serializers.ModelSerializer):
+class MachinePublicSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Публичный сериализатор для неавторизованных пользователей"""
     technique_model_name = serializers.CharField(source='technique_model.name', read_only=True)
     engine_model_name = serializers.CharField(source='engine_model.name', read_only=True)
@@ -27,7 +28,7 @@ class MachinePublicSerializer(serializers.ModelSerializer):
             'steer_axle_serial',
         ]
 
-class MachineDetailSerializer(serializers.ModelSerializer):
+class MachineDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Детальный сериализатор для авторизованных пользователей"""
     technique_model_name = serializers.CharField(source='technique_model.name', read_only=True)
     technique_model_description = serializers.CharField(source='technique_model.description', read_only=True)
@@ -47,6 +48,36 @@ class MachineDetailSerializer(serializers.ModelSerializer):
     client_name = serializers.SerializerMethodField()
     service_organization_name = serializers.SerializerMethodField()
     
+    # Сводка по машине (см. machines.stats), выводится по ?include=
+    last_maintenance_date = serializers.DateField(source='stats.last_maintenance_date', read_only=True, allow_null=True)
+    last_maintenance_type_name = serializers.CharField(source='stats.last_maintenance_type.name', read_only=True, allow_null=True)
+    operating_hours = serializers.IntegerField(source='stats.operating_hours', read_only=True, allow_null=True)
+    maintenance_count = serializers.IntegerField(source='stats.maintenance_count', read_only=True, allow_null=True)
+    complaint_count = serializers.IntegerField(source='stats.complaint_count', read_only=True, allow_null=True)
+    total_downtime = serializers.IntegerField(source='stats.total_downtime', read_only=True, allow_null=True)
+    optional_fields = [
+        'last_maintenance_date',
+        'last_maintenance_type_name',
+        'operating_hours',
+        'maintenance_count',
+        'complaint_count',
+        'total_downtime',
+    ]
+    
+    # Атрибуты модели, которые читают SerializerMethodField (см. machines.query_plan)
+    field_sources = {
+        'client_name': [
+            'client.client_profile.company_name',
+            'client.first_name',
+            'client.last_name',
+        ],
+        'service_organization_name': [
+            'service_organization.service_profile.organization_name',
+            'service_organization.first_name',
+            'service_organization.last_name',
+        ],
+    }
+    
     class Meta:
         model = Machine
         # ИСПРАВЛЕНО: Указываем конкретные поля вместо '__all__'
@@ -74,6 +105,12 @@ class MachineDetailSerializer(serializers.ModelSerializer):
             'equipment',
             'client_name',  # Только имя клиента
             'service_organization_name',  # Только имя сервисной организации
+            'last_maintenance_date',
+            'last_maintenance_type_name',
+            'operating_hours',
+            'maintenance_count',
+            'complaint_count',
+            'total_downtime',
             # Исключаем: 'client', 'service_organization', 'technique_model', 'engine_model', etc.
         ]
     
@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+
+from complaints.models import Complaint
+from maintenance.models import Maintenance
+from . import cache, forecast, stats
+from .models import DeletedRecord, Machine, MachineStats
+
+
+def remember_serial_number(sender, instance, raw=False, **kwargs):
+    """Прежний заводской номер машины: при его смене сбрасывается и карточка под старым номером"""
+    instance._public_card_previous_serial = None
+    if instance.pk is not None and not raw:
+        instance._public_card_previous_serial = (
+            Machine.objects.filter(pk=instance.pk).values_list('serial_number', flat=True).first()
+        )
+
+
+def invalidate_public_card(sender, instance, created=False, **kwargs):
+    """
+    Изменение машины сбрасывает ее публичную карточку в кэше поиска после
+    фиксации транзакции. Множество известных номеров - только для новой
+    машины или смены номера
+    """
+    previous = getattr(instance, '_public_card_previous_serial', None)
+    serial_numbers = {instance.serial_number, previous} - {None}
+    serials_changed = created or previous != instance.serial_number
+    transaction.on_commit(lambda: cache.invalidate(*serial_numbers, serials_changed=serials_changed))
+
+
+def invalidate_deleted_public_card(sender, instance, **kwargs):
+    """Удаленная машина убирается из кэша поиска после фиксации транзакции"""
+    serial_number = instance.serial_number
+    transaction.on_commit(lambda: cache.invalidate(serial_number))
+
+
+pre_save.connect(remember_serial_number, sender=Machine, dispatch_uid='machines_public_card_previous')
+post_save.connect(invalidate_public_card, sender=Machine, dispatch_uid='machines_public_card_save')
+post_delete.connect(invalidate_deleted_public_card, sender=Machine, dispatch_uid='machines_public_card_delete')
+
+
+def record_deletion(sender, instance, **kwargs):
+    """
+    Отметка об удалении для ленты изменений. Владельцы берутся у машины:
+    при каскадном удалении ТО и рекламации удаляются раньше самой машины
+    """
+    if sender is Machine:
+        machine = instance
+    else:
+        try:
+            machine = instance.machine
+        except Machine.DoesNotExist:
+            machine = None
+    DeletedRecord.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        client_id=machine.client_id if machine else None,
+        service_organization_id=machine.service_organization_id if machine else None,
+    )
+
+
+for model in (Machine, Maintenance, Complaint):
+    post_delete.connect(record_deletion, sender=model, dispatch_uid=f'machines_deleted_record_{model.__name__}')
+
+
+def create_machine_stats(sender, instance, created, raw=False, **kwargs):
+    """Строка сводки создается вместе с машиной"""
+    if created and not raw:
+        MachineStats.objects.get_or_create(machine=instance)
+
+
+post_save.connect(create_machine_stats, sender=Machine, dispatch_uid='machines_stats_create')
+
+
+def remember_stats_machine(sender, instance, raw=False, **kwargs):
+    """Прежняя машина записи: при переносе ТО или рекламации пересчитываются обе машины"""
+    instance._stats_previous_machine_id = None
+    if instance.pk is not None and not raw:
+        instance._stats_previous_machine_id = (
+            sender.objects.filter(pk=instance.pk).values_list('machine_id', flat=True).first()
+        )
+
+
+def refresh_machine_stats(sender, instance, raw=False, **kwargs):
+    """Пересчет сводки машины после изменения или удаления ее ТО или рекламации"""
+    if raw:
+        return
+    stats.refresh_machine_stats([
+        instance.machine_id, getattr(instance, '_stats_previous_machine_id', None)
+    ])
+
+
+for model in (Maintenance, Complaint):
+    name = model.__name__
+    pre_save.connect(remember_stats_machine, sender=model, dispatch_uid=f'machines_stats_previous_{name}')
+    post_save.connect(refresh_machine_stats, sender=model, dispatch_uid=f'machines_stats_save_{name}')
+    post_delete.connect(refresh_machine_stats, sender=model, dispatch_uid=f'machines_stats_delete_{name}')
+
+
+def refresh_forecast(sender, instance, raw=False, **kwargs):
+    """Прогноз ТО машины пересчитывается в кэше после изменения машины, ее ТО или рекламаций"""
+    if raw:
+        return
+    if sender is Machine:
+        forecast.schedule_refresh([instance.pk])
+    else:
+        forecast.schedule_refresh([
+            instance.machine_id, getattr(instance, '_stats_previous_machine_id', None)
+        ])
+
+
+for model in (Machine, Maintenance, Complaint):
+    name = model.__name__
+    post_save.connect(refresh_forecast, sender=model, dispatch_uid=f'machines_forecast_save_{name}')
+    post_delete.connect(refresh_forecast, sender=model, dispatch_uid=f'machines_forecast_delete_{name}')
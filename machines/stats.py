@@ -0,0 +1,71 @@
+"""
+Сводка по машинам (MachineStats): последнее ТО, текущая наработка,
+количество ТО и рекламаций, суммарный простой.
+
+Сводка пересчитывается одним UPDATE с подзапросами по ТО и рекламациям
+машины (индексы по (machine, дата)): сигналы пересчитывают одну машину,
+пакетное создание - машины пакета, команда rebuild_machine_stats - весь
+парк. Список машин читает готовые значения через JOIN, не агрегируя историю.
+
+Строка сводки создается вместе с машиной (сигнал post_save). Для машин,
+созданных через bulk_create, строки создает rebuild_machine_stats().
+"""
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from complaints.models import Complaint
+from maintenance.models import Maintenance
+from .models import Machine, MachineStats
+
+STATS_BATCH_SIZE = 500
+
+
+def stats_values(maintenance_model, complaint_model):
+    """
+    Выражения для MachineStats.objects.update(): значения сводки по ТО и
+    рекламациям машины строки. Модели передаются параметрами для миграций
+    """
+    maintenance = maintenance_model.objects.filter(machine=OuterRef('machine')).order_by()
+    complaints = complaint_model.objects.filter(machine=OuterRef('machine')).order_by()
+    latest = maintenance.order_by('-maintenance_date', '-id')
+
+    def total(queryset, aggregate):
+        return Coalesce(Subquery(queryset.values('machine').annotate(value=aggregate).values('value')), 0)
+
+    return {
+        'last_maintenance_date': Subquery(latest.values('maintenance_date')[:1]),
+        'last_maintenance_type': Subquery(latest.values('maintenance_type')[:1]),
+        'operating_hours': Greatest(
+            total(maintenance, Max('operating_hours')),
+            total(complaints, Max('operating_hours')),
+        ),
+        'maintenance_count': total(maintenance, Count('pk')),
+        'complaint_count': total(complaints, Count('pk')),
+        'total_downtime': total(complaints, Sum('downtime')),
+        'updated_at': timezone.now(),
+    }
+
+
+def refresh_machine_stats(machine_ids):
+    """
+    Пересчет сводки указанных машин одним запросом. Строки не создаются:
+    при каскадном удалении машины ее сводка уже может быть удалена
+    """
+    machine_ids = [pk for pk in set(machine_ids) if pk is not None]
+    if not machine_ids:
+        return 0
+    return MachineStats.objects.filter(machine__in=machine_ids).update(
+        **stats_values(Maintenance, Complaint)
+    )
+
+
+def rebuild_machine_stats():
+    """Полный пересчет: недостающие строки сводки и новые значения для всего парка"""
+    missing = Machine.objects.filter(stats__isnull=True).values_list('pk', flat=True)
+    MachineStats.objects.bulk_create(
+        [MachineStats(machine_id=pk) for pk in missing.iterator()],
+        batch_size=STATS_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return MachineStats.objects.update(**stats_values(Maintenance, Complaint))
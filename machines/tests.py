@@ -1,3 +1,931 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from accounts.models import User, ClientProfile, ServiceOrganizationProfile
+from complaints.models import Complaint
+from directories.models import (
+    TechniqueModel, EngineModel, TransmissionModel,
+    DriveAxleModel, SteerAxleModel, MaintenanceType,
+    FailureNode, RecoveryMethod, ServiceCompany
+)
+from maintenance.models import Maintenance
+from silant_project.export import XLSXRenderer, xlsx_stream
+from silant_project.pagination import KeysetPagination
+from silant_project.replicas import PRIMARY_COOKIE, REPLICA_DATABASE
+from . import forecast
+from .models import Machine, MachineStats
+
+
+def create_machines(count, client, service, start=0):
+    """Машины с отдельными записями справочников для каждой машины"""
+    machines = []
+    for number in range(start, start + count):
+        machines.append(Machine.objects.create(
+            serial_number=f'{number:04d}',
+            technique_model=TechniqueModel.objects.create(name=f'ПД-{number}'),
+            engine_model=EngineModel.objects.create(name=f'Двигатель-{number}'),
+            engine_serial=f'E{number}',
+            transmission_model=TransmissionModel.objects.create(name=f'Трансмиссия-{number}'),
+            transmission_serial=f'T{number}',
+            drive_axle_model=DriveAxleModel.objects.create(name=f'Ведущий-{number}'),
+            drive_axle_serial=f'D{number}',
+            steer_axle_model=SteerAxleModel.objects.create(name=f'Управляемый-{number}'),
+            steer_axle_serial=f'S{number}',
+            shipment_date=date(2022, 1, 1) + timedelta(days=number),
+            client=client,
+            service_organization=service,
+        ))
+    return machines
+
+
+def create_maintenance(machine, day=date(2023, 3, 1), hours=300, maintenance_type=None, service_company=None):
+    """ТО машины; справочники создаются, если не переданы"""
+    return Maintenance.objects.create(
+        machine=machine,
+        maintenance_type=maintenance_type or MaintenanceType.objects.get_or_create(name='ТО-1')[0],
+        maintenance_date=day, operating_hours=hours, work_order_number='1', work_order_date=day,
+        maintenance_company='ООО Сервис',
+        service_company=service_company or ServiceCompany.objects.get_or_create(name='ООО Сервис')[0],
+    )
+
+
+def create_complaint(machine, day=date(2023, 4, 1), hours=350, failure_node=None, recovery_method=None,
+                     recovery_days=5, service_company=None):
+    """Рекламация машины; справочники создаются, если не переданы"""
+    return Complaint.objects.create(
+        machine=machine, failure_date=day, operating_hours=hours,
+        failure_node=failure_node or FailureNode.objects.get_or_create(name='Двигатель')[0],
+        failure_description='Отказ',
+        recovery_method=recovery_method or RecoveryMethod.objects.get_or_create(name='Ремонт')[0],
+        recovery_date=day + timedelta(days=recovery_days),
+        service_company=service_company or ServiceCompany.objects.get_or_create(name='ООО Сервис')[0],
+    )
+
+
+class MachineQueryBudgetTests(TestCase):
+    """
+    Бюджет SQL-запросов для эндпоинтов машин.
+    Количество запросов не должно зависеть от размера страницы
+    """
+
+    # Список: валидаторы ETag/Last-Modified + COUNT(*) для пагинации + выборка страницы
+    LIST_BUDGET = 3
+    # Карточка: валидаторы + выборка машины
+    DETAIL_BUDGET = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        ClientProfile.objects.create(user=cls.client_user, company_name='ООО Клиент')
+        cls.service_user = User.objects.create_user('service', password='test', role='service')
+        ServiceOrganizationProfile.objects.create(user=cls.service_user, organization_name='ООО Сервис')
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        # У второго клиента нет профиля - имя берется из пользователя
+        cls.other_client = User.objects.create_user('other', password='test', role='client')
+
+        cls.machines = create_machines(3, cls.client_user, cls.service_user)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+
+    def assert_flat_list(self, user, budget):
+        if user is not None:
+            self.api.force_authenticate(user)
+
+        with self.assertNumQueries(budget):
+            response = self.api.get('/api/machines/')
+        self.assertEqual(response.status_code, 200)
+        small_page = len(response.data['results'])
+
+        create_machines(17, self.client_user, self.service_user, start=100)
+        create_machines(5, self.other_client, None, start=200)
+
+        with self.assertNumQueries(budget):
+            response = self.api.get('/api/machines/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(response.data['results']), small_page)
+
+    def test_anonymous_list(self):
+        self.assert_flat_list(None, self.LIST_BUDGET)
+
+    def test_client_list(self):
+        self.assert_flat_list(self.client_user, self.LIST_BUDGET)
+
+    def test_service_list(self):
+        self.assert_flat_list(self.service_user, self.LIST_BUDGET)
+
+    def test_manager_list(self):
+        self.assert_flat_list(self.manager, self.LIST_BUDGET)
+
+    def test_detail(self):
+        self.api.force_authenticate(self.manager)
+        with self.assertNumQueries(self.DETAIL_BUDGET):
+            response = self.api.get(f'/api/machines/{self.machines[0].pk}/')
+        self.assertEqual(response.data['client_name'], 'ООО Клиент')
+        self.assertEqual(response.data['service_organization_name'], 'ООО Сервис')
+
+    def test_not_modified(self):
+        # Неизменившийся список: 304 после одного запроса валидаторов
+        self.api.force_authenticate(self.client_user)
+        etag = self.api.get('/api/machines/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.api.get('/api/machines/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        machine = self.machines[0]
+        machine.consignee = 'Новый грузополучатель'
+        machine.save()
+        response = self.api.get('/api/machines/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.machines[1].delete()
+        response = self.api.get('/api/machines/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_sparse_fieldset(self):
+        self.api.force_authenticate(self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get('/api/machines/', {'fields': 'id,serial_number,technique_model_name'})
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'serial_number', 'technique_model_name'}
+        )
+        # Выборка страницы присоединяет только нужный справочник и не читает описания
+        page_sql = queries.captured_queries[-1]['sql']
+        self.assertIn('directories_techniquemodel', page_sql)
+        self.assertNotIn('directories_enginemodel', page_sql)
+        self.assertNotIn('description', page_sql)
+
+        response = self.api.get(f'/api/machines/{self.machines[0].pk}/', {'omit': 'client_name,equipment'})
+        self.assertNotIn('client_name', response.data)
+        self.assertIn('service_organization_name', response.data)
+
+        response = self.api.get('/api/machines/', {'fields': 'serial_number,unknown'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+    def test_machine_stats(self):
+        machine = self.machines[0]
+        maintenance_type = MaintenanceType.objects.create(name='ТО-1')
+        service_company = ServiceCompany.objects.create(name='ООО Сервис')
+        Maintenance.objects.create(
+            machine=machine, maintenance_type=maintenance_type, maintenance_date=date(2023, 3, 1),
+            operating_hours=300, work_order_number='1', work_order_date=date(2023, 3, 1),
+            maintenance_company='ООО Сервис', service_company=service_company,
+        )
+        complaint = Complaint.objects.create(
+            machine=machine, failure_date=date(2023, 4, 1), operating_hours=350,
+            failure_node=FailureNode.objects.create(name='Двигатель'), failure_description='Отказ',
+            recovery_method=RecoveryMethod.objects.create(name='Ремонт'), recovery_date=date(2023, 4, 6),
+            service_company=service_company,
+        )
+
+        self.api.force_authenticate(self.manager)
+        response = self.api.get('/api/machines/')
+        self.assertNotIn('operating_hours', response.data['results'][0])
+
+        # Сводка присоединяется к выборке страницы, бюджет запросов тот же
+        with self.assertNumQueries(self.LIST_BUDGET):
+            response = self.api.get('/api/machines/', {
+                'include': 'operating_hours,complaint_count,last_maintenance_type_name',
+                'ordering': '-stats__operating_hours',
+            })
+        first = response.data['results'][0]
+        self.assertEqual(first['id'], machine.pk)
+        self.assertEqual(
+            (first['operating_hours'], first['complaint_count'], first['last_maintenance_type_name']),
+            (350, 1, 'ТО-1'),
+        )
+
+        response = self.api.get('/api/machines/', {'fields': 'id', 'total_downtime_min': complaint.downtime})
+        self.assertEqual([row['id'] for row in response.data['results']], [machine.pk])
+
+        # Рекламация передана другой машине - сводка пересчитана у обеих
+        complaint.machine = self.machines[1]
+        complaint.save()
+        complaint.delete()
+        response = self.api.get('/api/machines/', {'fields': 'id,complaint_count', 'complaint_count_min': 1})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_search_by_serial(self):
+        # Холодный кэш: множество известных номеров + карточка машины
+        with self.assertNumQueries(2):
+            response = self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001'})
+        self.assertEqual(response.data['data']['technique_model_name'], 'ПД-1')
+
+        # Повторный поиск и неизвестные номера отвечаются из кэша
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001'})
+            self.assertEqual(response.status_code, 200)
+            response = self.api.get('/api/machines/search-by-serial/', {'serial_number': '9999'})
+            self.assertEqual(response.status_code, 404)
+
+    def test_search_by_serial_invalidation(self):
+        self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001'})
+        self.api.get('/api/machines/search-by-serial/', {'serial_number': '0500'})
+
+        # Кэш сбрасывается только после фиксации транзакции
+        machine = self.machines[1]
+        machine.engine_serial = 'E-NEW'
+        with self.captureOnCommitCallbacks(execute=True):
+            machine.save()
+            response = self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001'})
+            self.assertEqual(response.data['data']['engine_serial'], 'E1')
+        # Обычное изменение - только карточка, множество номеров не перечитывается
+        with self.assertNumQueries(1):
+            response = self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001'})
+        self.assertEqual(response.data['data']['engine_serial'], 'E-NEW')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_machines(1, None, None, start=500)
+        response = self.api.get('/api/machines/search-by-serial/', {'serial_number': '0500'})
+        self.assertEqual(response.status_code, 200)
+
+        machine.serial_number = '0001-A'
+        with self.captureOnCommitCallbacks(execute=True):
+            machine.save()
+        self.assertEqual(self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001'}).status_code, 404)
+        self.assertEqual(self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001-A'}).status_code, 200)
+
+        machine.technique_model.name = 'ПД-переименована'
+        with self.captureOnCommitCallbacks(execute=True):
+            machine.technique_model.save()
+        response = self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001-A'})
+        self.assertEqual(response.data['data']['technique_model_name'], 'ПД-переименована')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            machine.delete()
+        response = self.api.get('/api/machines/search-by-serial/', {'serial_number': '0001-A'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_names_without_profiles(self):
+        machine = create_machines(1, self.other_client, None, start=300)[0]
+        self.api.force_authenticate(self.manager)
+        response = self.api.get(f'/api/machines/{machine.pk}/')
+        self.assertEqual(response.data['client_name'], '')
+        self.assertEqual(response.data['service_organization_name'], 'Не указана')
+
+
+class DueMaintenanceTests(TestCase):
+    """Прогноз следующего ТО /api/machines/due-maintenance/ (machines.forecast)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        service = User.objects.create_user('service', password='test', role='service')
+        other = User.objects.create_user('other', password='test', role='client')
+        # Отгружены 2022-01-01 и 2022-01-02, третья машина - у другого клиента
+        cls.machine, cls.new_machine = create_machines(2, cls.client_user, service)
+        cls.foreign, = create_machines(1, other, service, start=2)
+        cls.run_in = MaintenanceType.objects.create(name='ТО-0', interval_hours=50, is_recurring=False)
+        cls.first = MaintenanceType.objects.create(name='ТО-1', interval_hours=200)
+        cls.second = MaintenanceType.objects.create(name='ТО-2', interval_hours=400)
+        # Справочник заранее: новая запись сменила бы версию справочников и ключи прогноза
+        ServiceCompany.objects.create(name='ООО Сервис')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def add_maintenance(self, maintenance_type, day, hours):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_maintenance(self.machine, day, hours, maintenance_type)
+
+    def due(self, machine, **params):
+        response = self.api.get('/api/machines/due-maintenance/', {'serial_number': machine.serial_number, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]
+
+    def test_next_mark(self):
+        # 5 м/час в день: отметка 200 м/час - через 40 дней после отгрузки
+        self.add_maintenance(self.run_in, date(2022, 1, 11), 50)
+        row = self.due(self.machine)
+        self.assertEqual(
+            (row['maintenance_type_name'], row['due_hours'], row['due_date'], row['hours_per_day']),
+            ('ТО-1', 200, date(2022, 2, 10), 5.0),
+        )
+
+        # Прогноз в кэше пересчитан по новому ТО; на отметке 400 - ТО с большей периодичностью
+        visit = self.add_maintenance(self.first, date(2022, 2, 10), 200)
+        row = self.due(self.machine)
+        self.assertEqual((row['maintenance_type_name'], row['due_hours'], row['due_date']), ('ТО-2', 400, date(2022, 3, 22)))
+        self.assertTrue(row['overdue'])
+        self.assertGreater(row['estimated_hours'], 400)
+
+        # Удаление ТО возвращает прежний срок
+        with self.captureOnCommitCallbacks(execute=True):
+            visit.delete()
+        self.assertEqual(self.due(self.machine)['due_date'], date(2022, 2, 10))
+
+    def test_fleet_rate_and_calendar(self):
+        # Машина без наработки получает медианный темп парка
+        self.add_maintenance(self.run_in, date(2022, 1, 11), 50)
+        today = date.today()
+        Machine.objects.filter(pk=self.new_machine.pk).update(shipment_date=today)
+        row = self.due(self.new_machine)
+        self.assertEqual(
+            (row['maintenance_type_name'], row['due_hours'], row['hours_per_day'], row['days_left']),
+            ('ТО-0', 50, 5.0, 10),
+        )
+        self.assertFalse(row['overdue'])
+
+        # Календарная периодичность раньше отметки наработки
+        MaintenanceType.objects.create(name='Сезонное ТО', interval_days=5)
+        cache.clear()
+        row = self.due(self.new_machine)
+        self.assertEqual((row['maintenance_type_name'], row['due_hours'], row['days_left']), ('Сезонное ТО', None, 5))
+
+    def test_within_days(self):
+        self.add_maintenance(self.run_in, date(2022, 1, 11), 50)
+        Machine.objects.filter(pk=self.new_machine.pk).update(shipment_date=date.today())
+
+        # Ближайшие сроки первыми (обкатка третьей машины - 2022-01-13);
+        # within_days включает просроченные
+        response = self.api.get('/api/machines/due-maintenance/')
+        self.assertEqual(
+            [row['machine'] for row in response.data['results']],
+            [self.foreign.pk, self.machine.pk, self.new_machine.pk],
+        )
+        response = self.api.get('/api/machines/due-maintenance/', {'within_days': 5})
+        self.assertEqual([row['machine'] for row in response.data['results']], [self.foreign.pk, self.machine.pk])
+        response = self.api.get('/api/machines/due-maintenance/', {'within_days': 'неделя'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cache_per_machine(self):
+        # Весь парк считается при первом чтении, дальше строки машин читаются из кэша
+        self.api.get('/api/machines/due-maintenance/')
+        generation = cache.get(forecast.cache_key())['generation']
+        foreign_row = cache.get(forecast.row_key(generation, self.foreign.pk))
+        with self.assertNumQueries(0):
+            rows = forecast.get_forecast([self.machine.pk, self.foreign.pk])
+        self.assertEqual(rows[self.foreign.pk], foreign_row)
+
+        # Новое ТО перезаписывает строку только своей машины
+        self.add_maintenance(self.run_in, date(2022, 1, 11), 50)
+        self.assertEqual(cache.get(forecast.row_key(generation, self.machine.pk))['last_hours'], 50)
+        self.assertEqual(cache.get(forecast.row_key(generation, self.foreign.pk)), foreign_row)
+
+        # Отсутствующая строка досчитывается, строка удаленной машины убирается
+        cache.delete(forecast.row_key(generation, self.new_machine.pk))
+        self.assertIn(self.new_machine.pk, forecast.get_forecast([self.new_machine.pk]))
+        self.assertIsNotNone(cache.get(forecast.row_key(generation, self.new_machine.pk)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.foreign.delete()
+        self.assertIsNone(cache.get(forecast.row_key(generation, self.foreign.pk)))
+
+    def test_scope(self):
+        self.api.force_authenticate(self.client_user)
+        response = self.api.get('/api/machines/due-maintenance/')
+        self.assertEqual({row['machine'] for row in response.data['results']}, {self.machine.pk, self.new_machine.pk})
+        self.api.force_authenticate(None)
+        self.assertEqual(self.api.get('/api/machines/due-maintenance/').status_code, 403)
+
+
+class MachineHistoryTests(TestCase):
+    """Хронология обслуживания машины /api/machines/{id}/history/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        other = User.objects.create_user('other', password='test', role='client')
+        service = User.objects.create_user('service', password='test', role='service')
+        cls.machine, = create_machines(1, cls.client_user, service)
+        cls.foreign, = create_machines(1, other, service, start=1)
+        cls.first = create_maintenance(cls.machine, date(2023, 3, 1), 300)
+        cls.failure = create_complaint(cls.machine, date(2023, 4, 1), 350)
+        cls.second = create_maintenance(cls.machine, date(2023, 6, 1), 500)
+        cls.late_failure = create_complaint(cls.machine, date(2023, 6, 1), 510)
+        create_maintenance(cls.foreign)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def test_timeline(self):
+        # Машина, ТО и рекламации - три запроса при любой длине истории
+        with self.assertNumQueries(3):
+            response = self.api.get(f'/api/machines/{self.machine.pk}/history/')
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['machine']['serial_number'], self.machine.serial_number)
+        self.assertEqual((data['maintenance_count'], data['complaints_count']), (2, 2))
+        # Новые сверху; в один день ТО идет перед рекламацией
+        self.assertEqual(
+            [(event['type'], event['date'], event['record']['id']) for event in data['timeline']],
+            [
+                ('maintenance', '2023-06-01', self.second.pk),
+                ('complaint', '2023-06-01', self.late_failure.pk),
+                ('complaint', '2023-04-01', self.failure.pk),
+                ('maintenance', '2023-03-01', self.first.pk),
+            ],
+        )
+
+    def test_scope(self):
+        self.assertEqual(self.api.get(f'/api/machines/{self.foreign.pk}/history/').status_code, 404)
+        self.api.force_authenticate(None)
+        self.assertEqual(self.api.get(f'/api/machines/{self.machine.pk}/history/').status_code, 403)
+
+
+class KeysetPaginationTests(TestCase):
+    """Курсорная пагинация списка машин (?pagination=cursor)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        client = User.objects.create_user('client', password='test', role='client')
+        service = User.objects.create_user('service', password='test', role='service')
+        cls.machines = create_machines(7, client, service)
+
+        # Сводка: у двух машин одна дата ТО, у одной даты нет, у двух нет строки сводки
+        for machine, day in zip(cls.machines, [date(2023, 5, 1), date(2023, 3, 1), date(2023, 3, 1), date(2023, 4, 1)]):
+            MachineStats.objects.filter(machine=machine).update(last_maintenance_date=day)
+        MachineStats.objects.filter(machine__in=cls.machines[5:]).delete()
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def walk(self, ordering, link='next'):
+        """id машин по всем страницам курсора в порядке обхода"""
+        params = {'pagination': 'cursor', 'fields': 'id'}
+        if ordering:
+            params['ordering'] = ordering
+        response = self.api.get('/api/machines/', params)
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            if not response.data[link]:
+                return pages
+            response = self.api.get(response.data[link])
+
+    @patch.object(KeysetPagination, 'page_size', 3)
+    def test_pages(self):
+        # Сортировка представления по умолчанию (-shipment_date) + id
+        expected = list(Machine.objects.order_by('-shipment_date', '-id').values_list('pk', flat=True))
+        pages = self.walk(None)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+        response = self.api.get('/api/machines/', {'pagination': 'cursor'})
+        self.assertIsNone(response.data['previous'])
+        self.assertNotIn('count', response.data)
+        # Со второй страницы назад - снова первая, у нее нет предыдущей
+        response = self.api.get(self.api.get(response.data['next']).data['previous'])
+        self.assertEqual([row['id'] for row in response.data['results']], expected[:3])
+        self.assertIsNone(response.data['previous'])
+
+    @patch.object(KeysetPagination, 'page_size', 2)
+    def test_ties(self):
+        # Одинаковые значения ключа различаются по id: ни одна запись не теряется и не повторяется
+        for machine in self.machines:
+            create_maintenance(machine, hours=300)
+        response = self.api.get('/api/maintenance/', {'pagination': 'cursor', 'ordering': '-operating_hours'})
+        ids = []
+        while True:
+            ids += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.api.get(response.data['next'])
+        self.assertEqual(ids, sorted(Maintenance.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_invalid_cursor(self):
+        for cursor in ('курсор', 'e30=', 'eyJwIjogWzFdfQ=='):
+            with self.subTest(cursor=cursor):
+                response = self.api.get('/api/machines/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_query_budget(self):
+        # Только выборка страницы: без COUNT(*) и агрегата валидаторов ETag
+        for params in [{'pagination': 'cursor'}, {'pagination': 'cursor', 'ordering': '-stats__operating_hours'}]:
+            with self.subTest(params=params), self.assertNumQueries(1):
+                response = self.api.get('/api/machines/', params)
+            self.assertEqual(len(response.data['results']), len(self.machines))
+            self.assertNotIn('ETag', response.headers)
+
+    @patch.object(KeysetPagination, 'page_size', 2)
+    def test_nullable_key(self):
+        ids = [machine.pk for machine in self.machines]
+        # Без даты ТО (NULL) - в конце по возрастанию и в начале по убыванию
+        ascending = [ids[1], ids[2], ids[3], ids[0], ids[4], ids[5], ids[6]]
+        descending = [ids[6], ids[5], ids[4], ids[0], ids[3], ids[2], ids[1]]
+
+        for ordering, expected in [('stats__last_maintenance_date', ascending),
+                                   ('-stats__last_maintenance_date', descending)]:
+            with self.subTest(ordering=ordering):
+                pages = self.walk(ordering)
+                self.assertEqual(sum(pages, []), expected)
+
+                # Обратный обход с последней страницы возвращает те же страницы
+                response = self.api.get('/api/machines/', {
+                    'pagination': 'cursor', 'ordering': ordering, 'fields': 'id',
+                })
+                while response.data['next']:
+                    response = self.api.get(response.data['next'])
+                backward = [[row['id'] for row in response.data['results']]]
+                while response.data['previous']:
+                    response = self.api.get(response.data['previous'])
+                    backward.append([row['id'] for row in response.data['results']])
+                self.assertEqual(backward[::-1], pages)
+
+
+class RoleScopingTests(TestCase):
+    """Область видимости и права на изменение машин, ТО и рекламаций по ролям"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        cls.service_user = User.objects.create_user('service', password='test', role='service')
+        other_client = User.objects.create_user('other_client', password='test', role='client')
+        other_service = User.objects.create_user('other_service', password='test', role='service')
+        cls.no_role = User.objects.create_user('staff', password='test')
+
+        # Машина клиента обслуживает другая организация, машину организации - другой клиент
+        cls.own, = create_machines(1, cls.client_user, other_service)
+        cls.serviced, = create_machines(1, other_client, cls.service_user, start=1)
+        cls.foreign, = create_machines(1, other_client, other_service, start=2)
+        cls.maintenance = {machine: create_maintenance(machine) for machine in (cls.own, cls.serviced, cls.foreign)}
+        cls.complaints = {machine: create_complaint(machine) for machine in (cls.own, cls.serviced, cls.foreign)}
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+
+    def visible(self, url):
+        response = self.api.get(url, {'fields': 'id'})
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.data['results']}
+
+    def assert_scope(self, user, machines):
+        self.api.force_authenticate(user)
+        self.assertEqual(self.visible('/api/machines/'), {machine.pk for machine in machines})
+        self.assertEqual(self.visible('/api/maintenance/'), {self.maintenance[machine].pk for machine in machines})
+        self.assertEqual(self.visible('/api/complaints/'), {self.complaints[machine].pk for machine in machines})
+
+    def assert_editable(self, user, machines):
+        """Изменение доступно ровно для записей машин machines, чужие записи - 404"""
+        self.api.force_authenticate(user)
+        for machine in (self.own, self.serviced, self.foreign):
+            expected = 200 if machine in machines else 404
+            with self.subTest(user=user.username, machine=machine.serial_number):
+                response = self.api.patch(f'/api/machines/{machine.pk}/', {'consignee': 'ООО Получатель'})
+                self.assertEqual(response.status_code, expected)
+                response = self.api.patch(
+                    f'/api/maintenance/{self.maintenance[machine].pk}/', {'operating_hours': 310}
+                )
+                self.assertEqual(response.status_code, expected)
+
+    def test_client(self):
+        self.assert_scope(self.client_user, [self.own])
+        self.assert_editable(self.client_user, [self.own])
+        self.assertEqual(
+            set(Machine.objects.editable_by(self.client_user)), {self.own}
+        )
+
+    def test_service(self):
+        self.assert_scope(self.service_user, [self.serviced])
+        self.assert_editable(self.service_user, [self.serviced])
+        # Рекламации - по обслуживаемым машинам, а не по справочнику сервисных компаний
+        response = self.api.patch(
+            f'/api/complaints/{self.complaints[self.serviced].pk}/', {'spare_parts': 'Фильтр'}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.api.patch(f'/api/complaints/{self.complaints[self.own].pk}/', {'spare_parts': 'Фильтр'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_manager(self):
+        everything = [self.own, self.serviced, self.foreign]
+        self.assert_scope(self.manager, everything)
+        self.assert_editable(self.manager, everything)
+
+    def test_user_without_role(self):
+        # Публичный список машин, без ТО и рекламаций и без изменений
+        self.api.force_authenticate(self.no_role)
+        self.assertEqual(len(self.visible('/api/machines/')), 3)
+        self.assertEqual(self.visible('/api/maintenance/'), set())
+        self.assertEqual(self.visible('/api/complaints/'), set())
+        response = self.api.patch(f'/api/machines/{self.own.pk}/', {'consignee': 'ООО Получатель'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Machine.objects.editable_by(self.no_role).exists())
+
+    def test_anonymous(self):
+        # Все машины, но только публичные поля карточки
+        response = self.api.get('/api/machines/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        first = response.data['results'][0]
+        self.assertIn('engine_serial', first)
+        for field in ('id', 'client', 'service_organization', 'consignee', 'delivery_address', 'supply_contract'):
+            self.assertNotIn(field, first)
+
+        response = self.api.get(f'/api/machines/{self.own.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('client', response.data)
+        # Поля детального сериализатора не запрашиваются и через ?fields= / ?include=
+        for params in ({'fields': 'client'}, {'include': 'operating_hours'}):
+            self.assertEqual(self.api.get(f'/api/machines/{self.own.pk}/', params).status_code, 400)
+
+        for url in ('/api/maintenance/', '/api/complaints/', f'/api/machines/{self.own.pk}/history/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.api.get(url).status_code, 403)
+        response = self.api.patch(f'/api/machines/{self.own.pk}/', {'consignee': 'ООО Получатель'})
+        self.assertEqual(response.status_code, 403)
+
+
+class ChangesFeedTests(TestCase):
+    """Лента изменений /api/changes/ (machines.changes)"""
+
+    STREAMS = ('machines', 'maintenance', 'complaints', 'deleted')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        other = User.objects.create_user('other', password='test', role='client')
+        service = User.objects.create_user('service', password='test', role='service')
+        cls.own = create_machines(2, cls.client_user, service)
+        cls.foreign = create_machines(1, other, service, start=2)
+        cls.maintenance = [create_maintenance(machine) for machine in cls.own + cls.foreign]
+        cls.complaints = [create_complaint(machine) for machine in cls.own + cls.foreign]
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def read(self, since=None, limit=None):
+        """(записи страницы как (поток, id), ответ)"""
+        params = {key: value for key, value in (('since', since), ('limit', limit)) if value is not None}
+        response = self.api.get('/api/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        records = [(name, row['id']) for name in self.STREAMS for row in response.data[name]]
+        return records, response.data
+
+    def read_all(self, since=None, limit=None):
+        records, data = self.read(since, limit)
+        while data['has_more']:
+            page, data = self.read(data['next'], limit)
+            records += page
+        return records, data['next']
+
+    def age(self, seconds):
+        """Все записи изменены seconds секунд назад"""
+        moment = timezone.now() - timedelta(seconds=seconds)
+        for model in (Machine, Maintenance, Complaint):
+            model.objects.update(updated_at=moment)
+
+    @override_settings(CHANGES_SETTLE_SECONDS=0)
+    def test_pages(self):
+        # Страницы по 2 записи: каждая запись трех потоков ровно один раз
+        records, cursor = self.read_all(limit=2)
+        expected = (
+            [('machines', machine.pk) for machine in self.own + self.foreign]
+            + [('maintenance', record.pk) for record in self.maintenance]
+            + [('complaints', record.pk) for record in self.complaints]
+        )
+        self.assertCountEqual(records, expected)
+        self.assertEqual(len(records), len(set(records)))
+        self.assertEqual(self.read(cursor)[0], [])
+
+        # Клиент получает только записи своих машин
+        self.api.force_authenticate(self.client_user)
+        records, _ = self.read_all(limit=2)
+        self.assertEqual(len(records), 6)
+        self.assertNotIn(('machines', self.foreign[0].pk), records)
+
+    def test_settle_window(self):
+        self.age(60)
+        _, cursor = self.read_all()
+        self.assertEqual(self.read(cursor)[0], [])
+
+        # Транзакция зафиксирована через 3 с после изменения - запись за курсором
+        # дочитанной ленты, но в пределах окна и приходит повторным чтением
+        record = self.maintenance[0]
+        Maintenance.objects.filter(pk=record.pk).update(updated_at=timezone.now() - timedelta(seconds=3))
+        records, cursor = self.read_all(cursor)
+        self.assertEqual(records, [('maintenance', record.pk)])
+        # Изменения окна приходят повторно, пока оно не пройдет
+        self.assertEqual(self.read(cursor)[0], [('maintenance', record.pk)])
+
+        with override_settings(CHANGES_SETTLE_SECONDS=0):
+            _, cursor = self.read_all(cursor)
+        self.assertEqual(self.read(cursor)[0], [])
+
+    def test_tombstones(self):
+        self.age(60)
+        _, manager_cursor = self.read_all()
+        self.api.force_authenticate(self.client_user)
+        _, client_cursor = self.read_all()
+
+        # Машина удаляется каскадом вместе со своими ТО и рекламацией
+        deleted = [
+            ('maintenance', self.maintenance[0].pk),
+            ('maintenance', self.maintenance[1].pk),
+            ('complaint', self.complaints[1].pk),
+            ('machine', self.own[1].pk),
+        ]
+        foreign = ('maintenance', self.maintenance[2].pk)
+        self.maintenance[0].delete()
+        self.maintenance[2].delete()
+        self.own[1].delete()
+
+        # Отметки об удалении - в области видимости владельцев машины на момент удаления
+        _, data = self.read(client_cursor)
+        self.assertCountEqual([(row['model'], row['id']) for row in data['deleted']], deleted)
+        self.assertTrue(all(row['deleted_at'] for row in data['deleted']))
+
+        self.api.force_authenticate(self.manager)
+        _, data = self.read(manager_cursor)
+        self.assertCountEqual(
+            [(row['model'], row['id']) for row in data['deleted']], deleted + [foreign]
+        )
+
+    def test_invalid_cursor(self):
+        response = self.api.get('/api/changes/', {'since': 'курсор'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.data)
+
+
+class ExportTests(TestCase):
+    """Выгрузка списков в CSV и XLSX (silant_project.export)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        ClientProfile.objects.create(user=cls.client_user, company_name='ООО Клиент')
+        other = User.objects.create_user('other', password='test', role='client')
+        service = User.objects.create_user('service', password='test', role='service')
+        cls.machines = create_machines(2, cls.client_user, service)
+        create_machines(1, other, service, start=2)
+        create_maintenance(cls.machines[0], hours=300)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def export(self, url, **params):
+        response = self.api.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, content = self.export('/api/machines/export/', format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'attachment; filename="machines_\d{8}\.csv"')
+        # BOM для Excel, заголовки - verbose_name, строки в сортировке списка (-shipment_date)
+        self.assertTrue(content.startswith('\ufeff'.encode('utf-8')))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:3], ['Заводской номер машины', 'Модель техники', 'Модель двигателя'])
+        self.assertEqual([row[0] for row in rows[1:]], ['0001', '0000'])
+        self.assertEqual(rows[1][1], 'ПД-1')
+        self.assertEqual(rows[1][-2:], ['ООО Клиент', ''])
+
+        # Фильтры и поиск списка действуют и на выгрузку
+        _, content = self.export('/api/machines/export/', format='csv', search='0000')
+        self.assertEqual(len(content.decode('utf-8-sig').splitlines()), 2)
+
+    def test_xlsx(self):
+        response, content = self.export('/api/maintenance/export/', format='xlsx')
+        self.assertEqual(response['Content-Type'], XLSXRenderer.media_type)
+        sheet = load_workbook(io.BytesIO(content)).active
+        rows = list(sheet.values)
+        self.assertEqual(rows[0][:2], ('Заводской номер машины', 'Модель техники'))
+        self.assertEqual(rows[1][:2], ('0000', 'ПД-0'))
+        self.assertEqual(len(rows), 2)
+
+    def test_xlsx_stream(self):
+        # Первая часть архива отдается до чтения всех строк
+        read = []
+
+        def rows():
+            for number in range(5):
+                read.append(number)
+                yield (f'Строка\x01 {number}', number, None, number / 2, number % 2 == 0,
+                       date(2024, 1, 1 + number), timezone.datetime(2024, 1, 1, 12, 30))
+
+        with patch('silant_project.export.EXPORT_CHUNK_SIZE', 2):
+            stream = xlsx_stream('Техническое обслуживание [ТО] машин "Силант"', ['Текст', 'Число'], rows())
+            content = next(stream)
+            self.assertLess(len(read), 5)
+            content += b''.join(stream)
+
+        sheet = load_workbook(io.BytesIO(content)).active
+        self.assertEqual(sheet.title, 'Техническое обслуживание ТО маш')
+        values = list(sheet.values)
+        self.assertEqual(values[0][:2], ('Текст', 'Число'))
+        self.assertEqual(len(values), 6)
+        self.assertEqual(
+            values[2],
+            ('Строка 1', 1, None, 0.5, False, timezone.datetime(2024, 1, 2), timezone.datetime(2024, 1, 1, 12, 30)),
+        )
+
+    def test_access(self):
+        self.assertEqual(self.api.get('/api/machines/export/', {'format': 'json'}).status_code, 404)
+        self.api.force_authenticate(None)
+        self.assertEqual(self.api.get('/api/machines/export/', {'format': 'csv'}).status_code, 403)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Чтение с реплики. Реплика - отдельный файл SQLite, в который копируется
+    основная база (replicate); изменения после копирования есть только в основной
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика подменяется на время класса (в настройках ее может не быть или она -
+        # зеркало основной базы): тестовый раннер не создает для нее базу,
+        # файл реплики заполняет replicate()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.configured_replica = connections.settings.get(REPLICA_DATABASE)
+        if cls.configured_replica is not None:
+            connections[REPLICA_DATABASE].close()
+            del connections[REPLICA_DATABASE]
+        connections.settings[REPLICA_DATABASE] = {
+            **connections[DEFAULT_DB_ALIAS].settings_dict,
+            'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        cls.databases = {DEFAULT_DB_ALIAS, REPLICA_DATABASE}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_DATABASE].close()
+        del connections[REPLICA_DATABASE]
+        if cls.configured_replica is None:
+            del connections.settings[REPLICA_DATABASE]
+        else:
+            connections.settings[REPLICA_DATABASE] = cls.configured_replica
+        cls.directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user('manager', password='test', role='manager')
+        self.machine = create_machines(1, None, None)[0]
+        self.replicate()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def replicate(self):
+        connections[REPLICA_DATABASE].close()
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        replica = sqlite3.connect(connections[REPLICA_DATABASE].settings_dict['NAME'])
+        primary.connection.backup(replica)
+        replica.close()
+
+    def consignee(self):
+        return self.api.get(f'/api/machines/{self.machine.pk}/').data['consignee']
+
+    def test_safe_requests_read_replica(self):
+        # Вне запроса чтение и запись идут в основную базу
+        Machine.objects.filter(pk=self.machine.pk).update(consignee='Основная')
+
+        self.assertNotEqual(self.consignee(), 'Основная')
+        response = self.api.get('/api/machines/')
+        self.assertEqual(response.data['count'], 1)
+
+        create_machines(1, None, None, start=1)
+        self.assertEqual(self.api.get('/api/machines/').data['count'], 1)
+        # Лента изменений читает с основной базы
+        self.assertEqual(len(self.api.get('/api/changes/').data['machines']), 2)
+
+        self.replicate()
+        self.assertEqual(self.consignee(), 'Основная')
+        self.assertEqual(self.api.get('/api/machines/').data['count'], 2)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.api.patch(
+            f'/api/machines/{self.machine.pk}/', {'consignee': 'Новый'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.assertEqual(self.consignee(), 'Новый')
+
+        # Без cookie клиент снова читает с реплики, пока она не догнала основную базу
+        del self.api.cookies[PRIMARY_COOKIE]
+        self.assertNotEqual(self.consignee(), 'Новый')
+        self.replicate()
+        self.assertEqual(self.consignee(), 'Новый')
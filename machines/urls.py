@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MachineViewSet
+from .views import ChangesView, MachineViewSet
 
 app_name = 'machines'
 
@@ -9,4 +9,5 @@ router.register(r'machines', MachineViewSet, basename='machine')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('changes/', ChangesView.as_view(), name='changes'),
 ]
@@ -1,23 +1,74 @@
+import heapq
+from django.db.models import Prefetch
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from .models import Machine
 from .serializers import MachinePublicSerializer, MachineDetailSerializer
 from .permissions import MachinePermission
 from .filters import MachineFilter
+from .query_plan import plan_queryset
+from . import cache as public_card_cache
+from . import changes
+from . import forecast
+from .conditional import ConditionalGetMixin
+from maintenance.models import Maintenance
+from maintenance.serializers import MaintenanceSerializer
+from complaints.models import Complaint
+from complaints.serializers import ComplaintSerializer
+from silant_project.export import ExportMixin
+from silant_project.fieldsets import SparseFieldsetMixin
+from silant_project.pagination import SilantPagination
 
-class MachineViewSet(viewsets.ModelViewSet):
+class MachineViewSet(ConditionalGetMixin, SparseFieldsetMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Machine.objects.all()
     permission_classes = [MachinePermission]
     
     # Добавляем фильтрацию, поиск и сортировку
     filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
     filterset_class = MachineFilter
-    ordering_fields = ['shipment_date', 'serial_number']
+    # Сортировка и по сводке: ?ordering=-stats__operating_hours (см. machines.stats)
+    ordering_fields = [
+        'shipment_date',
+        'serial_number',
+        'stats__operating_hours',
+        'stats__complaint_count',
+        'stats__total_downtime',
+        'stats__last_maintenance_date',
+    ]
     ordering = ['-shipment_date']  # Сортировка по умолчанию по дате отгрузки (по убыванию)
     search_fields = ['serial_number', 'consignee']
+    # ETag/Last-Modified учитывают пересчет сводки по машине
+    conditional_related = ['stats']
+    # Постраничная пагинация или курсорная (?pagination=cursor) для больших таблиц
+    pagination_class = SilantPagination
+    # Колонки выгрузки /api/machines/export/?format=csv|xlsx
+    export_fields = [
+        'serial_number',
+        'technique_model__name',
+        'engine_model__name',
+        'engine_serial',
+        'transmission_model__name',
+        'transmission_serial',
+        'drive_axle_model__name',
+        'drive_axle_serial',
+        'steer_axle_model__name',
+        'steer_axle_serial',
+        'supply_contract',
+        'shipment_date',
+        'consignee',
+        'delivery_address',
+        'equipment',
+        'client__client_profile__company_name',
+        'service_organization__service_profile__organization_name',
+    ]
+    export_filename = 'machines'
     
     def get_serializer_class(self):
         # Для неавторизованных пользователей используем ограниченный сериализатор
@@ -28,34 +79,92 @@ class MachineViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """
-        Фильтрация машин в зависимости от роли пользователя
+        Машины, доступные пользователю. При чтении выбираются только связи и
+        колонки, которые использует сериализатор (публичный или детальный,
+        с учетом ?fields=, ?omit= и ?include=)
         """
-        user = self.request.user
+        queryset = self.get_role_queryset()
+        if self.request.method in SAFE_METHODS:
+            queryset = plan_queryset(queryset, self.get_serializer())
+        if self.action == 'history':
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'maintenance_set',
+                    queryset=Maintenance.objects.select_related(
+                        'maintenance_type', 'service_company'
+                    ).order_by('-maintenance_date', '-id')
+                ),
+                Prefetch(
+                    'complaint_set',
+                    queryset=Complaint.objects.select_related(
+                        'failure_node', 'recovery_method', 'service_company'
+                    ).order_by('-failure_date', '-id')
+                ),
+            )
+        return queryset
     
-        # Неавторизованные пользователи видят все машины (но ограниченные поля)
-        if not user.is_authenticated:
-            return Machine.objects.all()
+    def get_role_queryset(self):
+        """
+        Машины, видимые пользователю (см. silant_project.scoping):
+        неавторизованные видят все машины, но ограниченные поля
+        """
+        return Machine.objects.for_user(self.request.user)
     
-        # Проверяем, есть ли у пользователя атрибут role и методы ролей
-        if hasattr(user, 'role'):
-            # Менеджер видит все машины
-            if user.role == 'manager':
-                return Machine.objects.all()
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, MachinePermission])
+    def history(self, request, pk=None):
+        """
+        История обслуживания машины: ТО и рекламации одной хронологией (новые сверху)
+        Доступно по URL: /api/machines/{id}/history/
         
-            # Клиент видит только свои машины
-            if user.role == 'client':
-                return Machine.objects.filter(client=user)
+        Машина выбирается с учетом роли пользователя, ТО и рекламации
+        подгружаются через prefetch_related - всего три запроса
+        """
+        machine = self.get_object()
+        maintenance = machine.maintenance_set.all()
+        complaints = machine.complaint_set.all()
         
-            # Сервисная организация видит обслуживаемые машины
-            if user.role == 'service':
-                return Machine.objects.filter(service_organization=user)
-    
-        # Суперпользователь видит все машины
-        if user.is_superuser:
-            return Machine.objects.all()
+        context = self.get_serializer_context()
+        maintenance_data = MaintenanceSerializer(maintenance, many=True, context=context).data
+        complaints_data = ComplaintSerializer(complaints, many=True, context=context).data
+        
+        # Оба списка уже отсортированы по убыванию даты - сливаем без пересортировки
+        timeline = heapq.merge(
+            ({'type': 'maintenance', 'date': record['maintenance_date'], 'record': record}
+             for record in maintenance_data),
+            ({'type': 'complaint', 'date': record['failure_date'], 'record': record}
+             for record in complaints_data),
+            key=lambda event: event['date'],
+            reverse=True
+        )
+        
+        return Response({
+            'machine': self.get_serializer(machine).data,
+            'maintenance_count': len(maintenance_data),
+            'complaints_count': len(complaints_data),
+            'timeline': list(timeline),
+        })
     
-        # По умолчанию показываем все машины
-        return Machine.objects.all()
+    @action(detail=False, methods=['get'], url_path='due-maintenance',
+            permission_classes=[IsAuthenticated, MachinePermission], pagination_class=PageNumberPagination)
+    def due_maintenance(self, request):
+        """
+        Прогноз следующего ТО машин пользователя (см. machines.forecast), ближайшие сроки первыми
+        Доступно по URL: /api/machines/due-maintenance/?within_days=30
+        
+        Действуют фильтры и поиск списка машин; within_days - только ТО
+        в ближайшие N дней, включая просроченные
+        """
+        within_days = request.query_params.get('within_days')
+        if within_days is not None:
+            try:
+                within_days = int(within_days)
+            except ValueError:
+                raise ValidationError({'within_days': ['Введите целое число']})
+        
+        machines = self.filter_queryset(self.get_role_queryset()).values_list('pk', 'serial_number')
+        entries = forecast.due_entries(machines.order_by(), within_days)
+        page = self.paginate_queryset(entries)
+        return self.get_paginated_response(page)
     
     @action(detail=False, methods=['get'], url_path='search-by-serial')
     def search_by_serial(self, request):
@@ -72,11 +181,13 @@ class MachineViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            machine = Machine.objects.get(serial_number=serial_number)
-            serializer = MachinePublicSerializer(machine)
+            # Карточка берется из кэша, неизвестные номера отсекаются без запроса к базе
+            card = public_card_cache.get_public_card(serial_number)
+            if card is None:
+                raise Machine.DoesNotExist
             return Response({
                 'success': True,
-                'data': serializer.data
+                'data': card
             })
         except Machine.DoesNotExist:
             return Response(
@@ -94,3 +205,28 @@ class MachineViewSet(viewsets.ModelViewSet):
                 }, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class ChangesView(APIView):
+    """
+    Лента изменений машин, ТО и рекламаций для синхронизации (см. machines.changes).
+    Доступно по URL: /api/changes/?since=<курсор>&limit=<N>
+    
+    Последние CHANGES_SETTLE_SECONDS секунд изменений выдаются повторно.
+    Записи транзакций, зафиксированных позже этого окна после изменения,
+    могут быть пропущены
+    """
+    permission_classes = [IsAuthenticated]
+    # Курсор ленты не должен обгонять отставание реплики
+    read_from_replica = False
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', changes.CHANGES_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'limit': ['Введите целое число']})
+        limit = min(max(limit, 1), changes.CHANGES_MAX_PAGE_SIZE)
+
+        since = request.query_params.get('since')
+        position = changes.decode_cursor(since) if since else None
+        return Response(changes.get_changes(request, position, limit))
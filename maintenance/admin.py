@@ -39,14 +39,8 @@ class MaintenanceAdmin(admin.ModelAdmin):
     service_company_display.admin_order_field = 'service_company__name'
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if hasattr(request.user, 'role') and request.user.role == 'manager':
-            return qs
-        elif hasattr(request.user, 'role') and request.user.role == 'client':
-            return qs.filter(machine__client=request.user)
-        elif hasattr(request.user, 'role') and request.user.role == 'service':
-            return qs.filter(machine__service_organization=request.user)
-        return qs
+        # Та же область видимости, что и в API (silant_project.scoping)
+        return super().get_queryset(request).for_user(request.user)
     
     def save_model(self, request, obj, form, change):
         if not change:  # Только при создании
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directories', '0002_directory'),
+        ('machines', '0005_machine_machine_shipment_id_idx'),
+        ('maintenance', '0003_maintenance_created_by'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['-maintenance_date', '-id'], name='maint_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['operating_hours', 'id'], name='maint_hours_id_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directories', '0002_directory'),
+        ('machines', '0006_alter_machine_client_and_more'),
+        ('maintenance', '0004_maintenance_maint_date_id_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='maintenance',
+            name='machine',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='machines.machine', verbose_name='Машина'),
+        ),
+        migrations.AlterField(
+            model_name='maintenance',
+            name='maintenance_type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='directories.maintenancetype', verbose_name='Вид ТО'),
+        ),
+        migrations.AlterField(
+            model_name='maintenance',
+            name='service_company',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_records', to='directories.servicecompany', verbose_name='Сервисная компания'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['machine', '-maintenance_date'], name='maint_machine_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['maintenance_type', '-maintenance_date'], name='maint_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['service_company', '-maintenance_date'], name='maint_company_date_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from silant_project.search import create_fulltext_index, drop_fulltext_index
+
+TABLE = 'maintenance_maintenance'
+# № заказ-наряда ищется по подстроке (icontains): в индексе только организация
+FIELDS = ['maintenance_company']
+CONFIG = 'simple'
+
+
+def create_index(apps, schema_editor):
+    create_fulltext_index(schema_editor, TABLE, FIELDS, CONFIG)
+
+
+def drop_index(apps, schema_editor):
+    drop_fulltext_index(schema_editor, TABLE, FIELDS, CONFIG)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0005_alter_maintenance_machine_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
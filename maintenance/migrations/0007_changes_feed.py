@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+from silant_project.search import create_fulltext_index, drop_fulltext_index
+
+TABLE = 'maintenance_maintenance'
+FIELDS = ['maintenance_company']
+CONFIG = 'simple'
+
+
+def create_index(apps, schema_editor):
+    create_fulltext_index(schema_editor, TABLE, FIELDS, CONFIG)
+
+
+def drop_index(apps, schema_editor):
+    drop_fulltext_index(schema_editor, TABLE, FIELDS, CONFIG)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0006_maintenance_fulltext_index'),
+    ]
+
+    operations = [
+        # SQLite пересоздает таблицу при добавлении полей и теряет триггеры
+        # полнотекстового индекса: индекс удаляется и строится заново
+        migrations.RunPython(drop_index, create_index),
+        migrations.AddField(
+            model_name='maintenance',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Создано'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='maintenance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменено'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['updated_at', 'id'], name='maint_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['created_at'], name='maint_created_idx'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
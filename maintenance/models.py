@@ -2,12 +2,23 @@ from django.db import models
 from django.conf import settings
 from machines.models import Machine
 from directories.models import MaintenanceType, ServiceCompany
+from silant_project.scoping import RoleScopedQuerySet
+
+
+class MaintenanceQuerySet(RoleScopedQuerySet):
+    """ТО видны в пределах машин пользователя"""
+
 
 class Maintenance(models.Model):
     """Модель технического обслуживания"""
     
     # 1. Вид ТО (справочник)
-    maintenance_type = models.ForeignKey(MaintenanceType, on_delete=models.CASCADE, verbose_name='Вид ТО')
+    maintenance_type = models.ForeignKey(
+        MaintenanceType,
+        on_delete=models.CASCADE,
+        db_index=False,  # индекс maint_type_date_idx
+        verbose_name='Вид ТО'
+    )
     
     # 2. Дата проведения ТО
     maintenance_date = models.DateField(verbose_name='Дата проведения ТО')
@@ -25,13 +36,19 @@ class Maintenance(models.Model):
     maintenance_company = models.CharField(max_length=200, verbose_name='Организация, проводившая ТО')
     
     # 7. Машина (база данных машин)
-    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, verbose_name='Машина')
+    machine = models.ForeignKey(
+        Machine,
+        on_delete=models.CASCADE,
+        db_index=False,  # индекс maint_machine_date_idx
+        verbose_name='Машина'
+    )
     
     # 8. Сервисная компания (справочник)
     service_company = models.ForeignKey(
         ServiceCompany, 
         on_delete=models.CASCADE, 
         related_name='maintenance_records',
+        db_index=False,  # индекс maint_company_date_idx
         verbose_name='Сервисная компания'
     )
     
@@ -44,10 +61,29 @@ class Maintenance(models.Model):
         blank=True
     )
     
+    # Время создания и последнего изменения (лента изменений /api/changes/)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Изменено')
+    
+    objects = MaintenanceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Техническое обслуживание'
         verbose_name_plural = 'Техническое обслуживание'
         ordering = ['-maintenance_date']
+        indexes = [
+            # Ключи курсорной пагинации: сортировка по умолчанию и ordering_fields + id
+            models.Index(fields=['-maintenance_date', '-id'], name='maint_date_id_idx'),
+            models.Index(fields=['operating_hours', 'id'], name='maint_hours_id_idx'),
+            # Область видимости (через машину) + сортировка по умолчанию
+            models.Index(fields=['machine', '-maintenance_date'], name='maint_machine_date_idx'),
+            # Фильтры-справочники + диапазон дат ТО
+            models.Index(fields=['maintenance_type', '-maintenance_date'], name='maint_type_date_idx'),
+            models.Index(fields=['service_company', '-maintenance_date'], name='maint_company_date_idx'),
+            # Лента изменений: ключ курсора (updated_at, id), выборка новых записей
+            models.Index(fields=['updated_at', 'id'], name='maint_updated_id_idx'),
+            models.Index(fields=['created_at'], name='maint_created_idx'),
+        ]
     
     def __str__(self):
         return f"ТО {self.maintenance_type} - {self.machine.serial_number}"
@@ -1,5 +1,8 @@
 from rest_framework import permissions
 
+from silant_project.scoping import has_role
+
+
 class MaintenancePermission(permissions.BasePermission):
     """
     Разрешения для ТО согласно таблице ролей:
@@ -7,6 +10,9 @@ class MaintenancePermission(permissions.BasePermission):
     - Клиент: просмотр, внесение данных (только для своих машин)
     - Сервисная организация: просмотр, внесение данных (только для обслуживаемых машин)
     - Менеджер: просмотр, внесение данных (все)
+    
+    Ограничение по машинам накладывается в SQL (Maintenance.objects.for_user),
+    поэтому объект из get_object() уже доступен пользователю
     """
     
     def has_permission(self, request, view):
@@ -18,24 +24,4 @@ class MaintenancePermission(permissions.BasePermission):
         return True
     
     def has_object_permission(self, request, view, obj):
-        user = request.user
-    
-        # Суперпользователь имеет полный доступ
-        if user.is_superuser:
-            return True
-    
-        # Проверяем, есть ли у пользователя атрибут role
-        if hasattr(user, 'role'):
-            # Менеджер имеет полный доступ
-            if user.role == 'manager':
-                return True
-        
-            # Клиент имеет доступ к ТО своих машин
-            if user.role == 'client':
-                return obj.machine.client == user
-        
-            # Сервисная организация имеет доступ к ТО обслуживаемых машин
-            if user.role == 'service':
-                return obj.machine.service_organization == user
-    
-        return False
+        return has_role(request.user)
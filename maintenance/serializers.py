@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from silant_project.fieldsets import SparseFieldsetSerializerMixin
 from .models import Maintenance
 
-class MaintenanceSerializer(serializers.ModelSerializer):
+class MaintenanceSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     machine_serial = serializers.CharField(source='machine.serial_number', read_only=True)
     machine_model = serializers.CharField(source='machine.technique_model.name', read_only=True)
     service_company_name = serializers.CharField(source='service_company.name', read_only=True)
@@ -40,3 +41,26 @@ class MaintenanceSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError("Вы можете создавать ТО только для обслуживаемых машин")
         
         return super().create(validated_data)
+
+
+class MaintenanceBulkItemSerializer(serializers.ModelSerializer):
+    """
+    Элемент пакетного создания ТО. Связи передаются id и загружаются
+    для всего пакета сразу (см. silant_project.bulk)
+    """
+    machine = serializers.IntegerField()
+    maintenance_type = serializers.IntegerField()
+    service_company = serializers.IntegerField()
+    
+    class Meta:
+        model = Maintenance
+        fields = [
+            'machine',
+            'maintenance_type',
+            'maintenance_date',
+            'operating_hours',
+            'work_order_number',
+            'work_order_date',
+            'maintenance_company',
+            'service_company',
+        ]
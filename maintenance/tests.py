@@ -1,3 +1,160 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from directories.models import MaintenanceType, ServiceCompany
+from machines.models import MachineStats
+from machines.tests import create_machines
+from silant_project.bulk import BULK_CREATE_LIMIT
+from .models import Maintenance
+
+
+class MaintenanceSearchTests(TestCase):
+    """Поиск ТО (?search=) по полнотекстовому индексу и icontains"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        client = User.objects.create_user('client', password='test', role='client')
+        service = User.objects.create_user('service', password='test', role='service')
+        cls.machine, = create_machines(1, client, service)
+        maintenance_type = MaintenanceType.objects.create(name='ТО-1')
+        service_company = ServiceCompany.objects.create(name='ООО Сервис')
+
+        def add(day, work_order_number, maintenance_company):
+            return Maintenance.objects.create(
+                machine=cls.machine, maintenance_type=maintenance_type, maintenance_date=day,
+                operating_hours=300, work_order_number=work_order_number, work_order_date=day,
+                maintenance_company=maintenance_company, service_company=service_company,
+            )
+
+        cls.branch = add(date(2023, 3, 1), '#2024-46КЕ1', 'Ромашка Сервис, северный филиал')
+        cls.head = add(date(2023, 4, 1), '#2024-14КЕ2', 'Ромашка')
+        cls.other = add(date(2023, 5, 1), '#2025-66КЕ3', 'Лютик')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def search(self, **params):
+        response = self.api.get('/api/maintenance/', {'fields': 'id', **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_rank(self):
+        # Короткое совпадение релевантнее длинного, без ?ordering= - по релевантности
+        self.assertEqual(self.search(search='ромашка'), [self.head.pk, self.branch.pk])
+        self.assertEqual(
+            self.search(search='ромашка', ordering='maintenance_date'), [self.branch.pk, self.head.pk],
+        )
+        # Совпадения только по icontains (заводской номер) не отбрасываются
+        self.assertCountEqual(
+            self.search(search=self.machine.serial_number),
+            [self.branch.pk, self.head.pk, self.other.pk],
+        )
+
+    def test_work_order_substring(self):
+        # № заказ-наряда ищется по любой части, а не по префиксу слова
+        self.assertEqual(self.search(search='КЕ1'), [self.branch.pk])
+        self.assertEqual(self.search(search='2024-14'), [self.head.pk])
+        self.assertEqual(self.search(search='КЕ ромашка'), [self.head.pk, self.branch.pk])
+
+
+class MaintenanceBulkCreateTests(TestCase):
+    """Пакетный POST списка ТО (silant_project.bulk)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        other = User.objects.create_user('other', password='test', role='client')
+        service = User.objects.create_user('service', password='test', role='service')
+        cls.own, = create_machines(1, cls.client_user, service)
+        cls.foreign, = create_machines(1, other, service, start=1)
+        cls.maintenance_type = MaintenanceType.objects.create(name='ТО-1', interval_hours=200)
+        cls.service_company = ServiceCompany.objects.create(name='ООО Сервис')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+
+    def item(self, machine, hours=100, **fields):
+        return {
+            'machine': machine.pk,
+            'maintenance_type': self.maintenance_type.pk,
+            'maintenance_date': '2022-01-21',
+            'operating_hours': hours,
+            'work_order_number': f'#{hours}',
+            'work_order_date': '2022-01-21',
+            'maintenance_company': 'ООО Сервис',
+            'service_company': self.service_company.pk,
+            **fields,
+        }
+
+    def post(self, user, items):
+        self.api.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.api.post('/api/maintenance/', items, format='json')
+
+    def test_create(self):
+        response = self.post(self.client_user, [self.item(self.own, 100), self.item(self.own, 150)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['operating_hours'] for row in response.data], [100, 150])
+        created = Maintenance.objects.filter(machine=self.own)
+        self.assertEqual(created.count(), 2)
+        self.assertEqual({record.created_by for record in created}, {self.client_user})
+
+    def test_limit(self):
+        response = self.post(self.manager, [self.item(self.own)] * (BULK_CREATE_LIMIT + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+        self.assertEqual(self.post(self.manager, []).status_code, 400)
+        self.assertFalse(Maintenance.objects.exists())
+
+    def test_item_errors(self):
+        # Ошибки по элементам в порядке запроса, пакет не принимается целиком
+        response = self.post(self.manager, [
+            self.item(self.own),
+            self.item(self.own, hours=-1),
+            self.item(self.own, maintenance_type=0),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(list(response.data[1]), ['operating_hours'])
+        self.assertEqual(list(response.data[2]), ['maintenance_type'])
+        self.assertFalse(Maintenance.objects.exists())
+
+    def test_foreign_machine(self):
+        # Машина вне области видимости - такая же ошибка, как несуществующая
+        response = self.post(self.client_user, [self.item(self.own), self.item(self.foreign)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data[0], list(response.data[1])), ({}, ['machine']))
+        self.assertFalse(Maintenance.objects.exists())
+
+        self.assertEqual(self.post(self.manager, [self.item(self.foreign)]).status_code, 201)
+
+    def test_rollback(self):
+        # Ошибка после вставки откатывает весь пакет
+        with patch('maintenance.views.refresh_machine_stats', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post(self.manager, [self.item(self.own), self.item(self.foreign)])
+        self.assertFalse(Maintenance.objects.exists())
+
+    def test_refresh_summaries(self):
+        # Прогноз уже в кэше: пакет пересчитывает его и сводку машины без сигналов
+        self.api.force_authenticate(self.manager)
+        self.api.get('/api/machines/due-maintenance/')
+
+        self.post(self.manager, [self.item(self.own, 100), self.item(self.own, 200, maintenance_date='2022-02-10')])
+        stats = MachineStats.objects.get(machine=self.own)
+        self.assertEqual((stats.maintenance_count, stats.operating_hours), (2, 200))
+        self.assertEqual(stats.last_maintenance_date, date(2022, 2, 10))
 
-# Create your tests here.
+        response = self.api.get('/api/machines/due-maintenance/', {'serial_number': self.own.serial_number})
+        row = response.data['results'][0]
+        self.assertEqual((row['last_hours'], row['due_hours']), (200, 400))
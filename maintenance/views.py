@@ -1,59 +1,84 @@
 from rest_framework import viewsets
+from rest_framework.permissions import SAFE_METHODS
+from directories.models import MaintenanceType, ServiceCompany
+from machines.conditional import ConditionalGetMixin
+from machines.models import Machine
+from machines.query_plan import plan_queryset
+from machines import forecast
+from machines.stats import refresh_machine_stats
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from .models import Maintenance
-from .serializers import MaintenanceSerializer
+from .serializers import MaintenanceSerializer, MaintenanceBulkItemSerializer
 from .permissions import MaintenancePermission
 from .filters import MaintenanceFilter
+from silant_project.bulk import BulkCreateMixin
+from silant_project.export import ExportMixin
+from silant_project.fieldsets import SparseFieldsetMixin
+from silant_project.pagination import SilantPagination
+from silant_project.search import FullTextSearchFilter
 
-class MaintenanceViewSet(viewsets.ModelViewSet):
+class MaintenanceViewSet(ConditionalGetMixin, SparseFieldsetMixin, BulkCreateMixin, ExportMixin,
+                         viewsets.ModelViewSet):
     """ViewSet для ТО с учетом ролей пользователей"""
     queryset = Maintenance.objects.select_related(
         'machine', 'maintenance_type', 'service_company'
     ).all()
     serializer_class = MaintenanceSerializer
     permission_classes = [MaintenancePermission]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_class = MaintenanceFilter
     search_fields = ['machine__serial_number', 'work_order_number', 'maintenance_company']
+    # Организация ищется по полнотекстовому индексу (миграция 0008), № заказ-наряда -
+    # по подстроке: номера вида #2024-46КЕ1 ищутся по любой части ('КЕ1')
+    fulltext_fields = ['maintenance_company']
+    fulltext_config = 'simple'
     ordering_fields = ['maintenance_date', 'operating_hours', 'machine__serial_number']
     ordering = ['-maintenance_date']  # Сортировка по умолчанию по дате проведения ТО
+    # Постраничная пагинация или курсорная (?pagination=cursor) для больших таблиц
+    pagination_class = SilantPagination
+    # ETag/Last-Modified учитывают и изменения машины (серийный номер, модель)
+    conditional_related = ['machine']
+    # Колонки выгрузки /api/maintenance/export/?format=csv|xlsx
+    export_fields = [
+        ('machine__serial_number', 'Заводской номер машины'),
+        ('machine__technique_model__name', 'Модель техники'),
+        'maintenance_type__name',
+        'maintenance_date',
+        'operating_hours',
+        'work_order_number',
+        'work_order_date',
+        'maintenance_company',
+        'service_company__name',
+    ]
+    export_filename = 'maintenance'
+    # Пакетный POST списком записей (синхронизация после объезда машин)
+    bulk_serializer_class = MaintenanceBulkItemSerializer
 
     def get_queryset(self):
-        """Фильтрация ТО в зависимости от роли пользователя"""
-        user = self.request.user
-        
-        # Неавторизованные пользователи не имеют доступа
-        if not user.is_authenticated:
-            return Maintenance.objects.none()
-        
-        # Суперпользователь видит все ТО
-        if user.is_superuser:
-            return Maintenance.objects.select_related(
-                'machine', 'maintenance_type', 'service_company'
-            )
-        
-        # Проверяем, есть ли у пользователя атрибут role
-        if hasattr(user, 'role'):
-            # Менеджер видит все ТО
-            if user.role == 'manager':
-                return Maintenance.objects.select_related(
-                    'machine', 'maintenance_type', 'service_company'
-                )
-            
-            # Клиент видит ТО только своих машин
-            if user.role == 'client':
-                return Maintenance.objects.filter(
-                    machine__client=user
-                ).select_related('machine', 'maintenance_type', 'service_company')
-            
-            # Сервисная организация видит ТО обслуживаемых машин
-            if user.role == 'service':
-                return Maintenance.objects.filter(
-                    machine__service_organization=user
-                ).select_related('machine', 'maintenance_type', 'service_company')
-        
-        return Maintenance.objects.none()
+        """
+        ТО машин, доступных пользователю (см. silant_project.scoping).
+        При чтении выбираются только связи и колонки полей ответа (?fields=, ?omit=)
+        """
+        queryset = Maintenance.objects.for_user(self.request.user)
+        if self.request.method in SAFE_METHODS:
+            return plan_queryset(queryset, self.get_serializer())
+        return queryset.select_related('machine', 'maintenance_type', 'service_company')
+    
+    def get_bulk_relations(self):
+        return {
+            # Машины ищутся в области видимости пользователя:
+            # этот же запрос проверяет принадлежность машин
+            'machine': Machine.objects.editable_by(self.request.user).select_related('technique_model'),
+            'maintenance_type': MaintenanceType.objects.all(),
+            'service_company': ServiceCompany.objects.all(),
+        }
+    
+    def bulk_created(self, objects):
+        # Сигналы post_save при bulk_create не отправляются
+        machine_ids = {maintenance.machine_id for maintenance in objects}
+        refresh_machine_stats(machine_ids)
+        forecast.schedule_refresh(machine_ids)
     
     def perform_create(self, serializer):
         """Автоматически устанавливаем создателя при создании ТО"""
@@ -1,9 +1,12 @@
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
         path('api/', include('machines.urls')),
         path('api/', include('maintenance.urls')),
         path('api/', include('complaints.urls')),
         path('api/', include('directories.urls')),
         path('api/', include('accounts.urls')),
+        path('api/metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
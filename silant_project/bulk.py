@@ -0,0 +1,98 @@
+"""
+Пакетное создание записей: POST списка объектов на эндпоинт списка
+(/api/maintenance/, /api/complaints/). Одиночный объект обрабатывается как
+обычно.
+
+Пакет обрабатывается за фиксированное число SQL-запросов:
+- поля каждого элемента проверяются сериализатором без обращений к базе
+  (связи передаются числовыми id);
+- связи всех элементов загружаются одним запросом на каждую связь (in_bulk),
+  для машины - с учетом области видимости пользователя, это и есть
+  проверка принадлежности;
+- записи вставляются одним bulk_create в одной транзакции.
+
+Пакет принимается целиком или не принимается: при ошибках возвращается 400
+со списком ошибок по элементам в порядке запроса ({} - элемент без ошибок),
+как у сериализатора с many=True.
+"""
+from django.db import router, transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+BULK_CREATE_LIMIT = 1000
+BULK_BATCH_SIZE = 500
+
+
+class BulkCreateMixin:
+    """
+    Пакетный POST для ModelViewSet.
+
+    bulk_serializer_class - сериализатор полей одного элемента, связи в нем
+    объявлены как IntegerField; get_bulk_relations() - {поле связи: queryset},
+    в котором ищутся переданные id. prepare_bulk_objects() и bulk_created() -
+    точки расширения до и после вставки (bulk_create не вызывает save() и сигналы)
+    """
+    bulk_serializer_class = None
+    bulk_create_limit = BULK_CREATE_LIMIT
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        return self.bulk_create(request)
+
+    def get_bulk_relations(self):
+        return {}
+
+    def prepare_bulk_objects(self, objects):
+        """Вычисляемые поля перед вставкой"""
+
+    def bulk_created(self, objects):
+        """Вызывается внутри транзакции после вставки"""
+
+    def bulk_create(self, request):
+        items = request.data
+        if not items:
+            raise ValidationError({'non_field_errors': ['Пустой список записей']})
+        if len(items) > self.bulk_create_limit:
+            raise ValidationError({
+                'non_field_errors': [f'Не больше {self.bulk_create_limit} записей за один запрос']
+            })
+
+        errors = [{} for _ in items]
+        validated = [None] * len(items)
+        for index, item in enumerate(items):
+            serializer = self.bulk_serializer_class(data=item, context=self.get_serializer_context())
+            if serializer.is_valid():
+                validated[index] = serializer.validated_data
+            else:
+                errors[index] = dict(serializer.errors)
+
+        self.resolve_bulk_relations(validated, errors)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        objects = [model(**data, created_by=request.user) for data in validated]
+        self.prepare_bulk_objects(objects)
+        with transaction.atomic(using=router.db_for_write(model)):
+            model.objects.bulk_create(objects, batch_size=BULK_BATCH_SIZE)
+            self.bulk_created(objects)
+
+        serializer = self.get_serializer(objects, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def resolve_bulk_relations(self, validated, errors):
+        """Замена id связей на объекты: один запрос на связь для всего пакета"""
+        does_not_exist = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+        for field, queryset in self.get_bulk_relations().items():
+            ids = {data[field] for data in validated if data is not None and data.get(field) is not None}
+            found = queryset.in_bulk(ids) if ids else {}
+            for index, data in enumerate(validated):
+                if data is None or data.get(field) is None:
+                    continue
+                pk = data[field]
+                if pk in found:
+                    data[field] = found[pk]
+                else:
+                    errors[index].setdefault(field, []).append(str(does_not_exist).format(pk_value=pk))
@@ -0,0 +1,256 @@
+"""
+Выгрузка списков API в CSV и XLSX (/api/<список>/export/?format=csv|xlsx).
+
+Выгрузка использует тот же queryset, что и список: область видимости роли,
+фильтры, поиск и сортировку представления. Строки читаются из базы порциями
+через .iterator(chunk_size=...) в виде кортежей значений (без сериализаторов)
+и сразу отдаются клиенту через StreamingHttpResponse, поэтому расход памяти
+не зависит от размера таблицы.
+
+XLSX - zip-архив (Office Open XML), который пишется прямо в ответ: служебные
+части книги постоянные, лист строится строка за строкой (строки - inline,
+без таблицы общих строк), сжатые данные отдаются клиенту по мере записи
+каждой порции строк. Архив пишется без перемотки (дескрипторы данных после
+каждой части), поэтому временный файл не нужен.
+"""
+import csv
+import io
+import math
+import re
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl.utils import get_column_letter
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.renderers import BaseRenderer
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Дата в Excel - число дней от 1899-12-30; стили ячеек: 1 - дата, 2 - дата и время
+XLSX_EPOCH = datetime(1899, 12, 30)
+XLSX_DATE_STYLE = 1
+XLSX_DATETIME_STYLE = 2
+# Управляющие символы недопустимы в XML
+ILLEGAL_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# Недопустимо в названии листа (не длиннее 31 символа)
+SHEET_TITLE_RE = re.compile(r'[\[\]:*?/\\]')
+
+SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{RELATIONSHIP_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        f'<workbook xmlns="{SPREADSHEET_NS}" xmlns:r="{RELATIONSHIP_NS}">'
+        '<sheets><sheet name={title} sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{RELATIONSHIP_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{RELATIONSHIP_NS}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{SPREADSHEET_NS}">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+SHEET_START = f'{XML_DECLARATION}<worksheet xmlns="{SPREADSHEET_NS}"><sheetData>'
+SHEET_END = '</sheetData></worksheet>'
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Формат ?format=csv. Файл выгрузки отдается напрямую, через рендерер
+    проходят только ответы с ошибками (403, 400)
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        items = data.items() if isinstance(data, dict) else enumerate(data)
+        for key, value in items:
+            if isinstance(value, (list, tuple)):
+                value = '; '.join(str(item) for item in value)
+            writer.writerow([key, value])
+        return buffer.getvalue().encode(self.charset)
+
+
+class XLSXRenderer(CSVRenderer):
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    format = 'xlsx'
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: write возвращает строку, а не пишет ее"""
+
+    def write(self, value):
+        return value
+
+
+def export_columns(model, fields):
+    """
+    Пути ORM и заголовки колонок. Поле задается путем ('technique_model__name')
+    или парой (путь, заголовок); по умолчанию заголовок - verbose_name первого поля пути
+    """
+    columns = []
+    for field in fields:
+        if isinstance(field, (list, tuple)):
+            path, header = field
+        else:
+            path = field
+            header = str(model._meta.get_field(path.split('__')[0]).verbose_name)
+        columns.append((path, header))
+    return columns
+
+
+def iter_rows(queryset, paths):
+    return queryset.values_list(*paths).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_stream(headers, rows):
+    writer = csv.writer(Echo())
+    # BOM - чтобы Excel открыл UTF-8 с кириллицей без перекодировки
+    yield '\ufeff' + writer.writerow(headers)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(['' if value is None else value for value in row]))
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+class ZipOutput(io.RawIOBase):
+    """Файл без перемотки для zipfile: записанные байты забираются методом take"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def xlsx_cell(reference, value):
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, Decimal)) or isinstance(value, float) and math.isfinite(value):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        serial = (value - XLSX_EPOCH) / timedelta(days=1)
+        return f'<c r="{reference}" s="{XLSX_DATETIME_STYLE}"><v>{serial!r}</v></c>'
+    if isinstance(value, date):
+        serial = (value - XLSX_EPOCH.date()).days
+        return f'<c r="{reference}" s="{XLSX_DATE_STYLE}"><v>{serial}</v></c>'
+    text = escape(ILLEGAL_XML_RE.sub('', str(value)))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_row(number, values):
+    cells = ''.join(
+        xlsx_cell(f'{get_column_letter(column)}{number}', value)
+        for column, value in enumerate(values, 1) if value is not None
+    )
+    return f'<row r="{number}">{cells}</row>'
+
+
+def xlsx_stream(title, headers, rows):
+    output = ZipOutput()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            if name == 'xl/workbook.xml':
+                content = content.format(title=quoteattr(SHEET_TITLE_RE.sub('', title)[:31]))
+            archive.writestr(name, XML_DECLARATION + content)
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            buffer = [SHEET_START, xlsx_row(1, headers)]
+            for number, row in enumerate(rows, 2):
+                buffer.append(xlsx_row(number, row))
+                if len(buffer) >= EXPORT_CHUNK_SIZE:
+                    sheet.write(''.join(buffer).encode('utf-8'))
+                    buffer = []
+                    chunk = output.take()
+                    if chunk:
+                        yield chunk
+            buffer.append(SHEET_END)
+            sheet.write(''.join(buffer).encode('utf-8'))
+    yield output.take()
+
+
+class ExportMixin:
+    """
+    Действие export для ViewSet. Колонки задаются атрибутом export_fields,
+    имя файла - export_filename. Выгрузка доступна только авторизованным
+    пользователям (анонимный список машин показывает не все поля)
+    """
+    export_fields = []
+    export_filename = 'export'
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, XLSXRenderer])
+    def export(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise NotAuthenticated()
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = export_columns(queryset.model, self.export_fields)
+        headers = [header for _, header in columns]
+        rows = iter_rows(queryset, [path for path, _ in columns])
+
+        filename = f'{self.export_filename}_{date.today():%Y%m%d}.{request.accepted_renderer.format}'
+        if request.accepted_renderer.format == 'xlsx':
+            title = str(queryset.model._meta.verbose_name_plural)
+            response = StreamingHttpResponse(
+                xlsx_stream(title, headers, rows), content_type=XLSXRenderer.media_type
+            )
+        else:
+            response = StreamingHttpResponse(
+                csv_stream(headers, rows), content_type='text/csv; charset=utf-8'
+            )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
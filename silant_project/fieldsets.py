@@ -0,0 +1,73 @@
+"""
+Выборочные поля ответа: ?fields=id,serial_number и ?omit=equipment
+на списках и карточках машин, ТО и рекламаций.
+
+Набор полей передается сериализатору через контекст, и лишние поля
+удаляются из сериализатора до выборки. Поэтому plan_queryset (см.
+machines.query_plan) строит select_related и only только по оставшимся
+полям: ответ без названий моделей не присоединяет справочники, а без
+описаний не читает их текст.
+
+Поля из optional_fields сериализатора (сводка по машине) по умолчанию не
+выводятся: их нужно запросить через ?include=operating_hours,... или
+перечислить в ?fields=. Без них список не присоединяет таблицу сводки.
+
+Действует только для list и retrieve: вложенные сериализаторы других
+действий (history, лента изменений) выводят все поля, кроме дополнительных.
+"""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+INCLUDE_PARAM = 'include'
+
+
+def parse_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Сериализатор, поля которого ограничиваются контекстом
+    'fieldset' = (fields или None, omit, include)
+    """
+    # Поля, которые выводятся только по запросу (?include= или ?fields=)
+    optional_fields = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, omit, include = self.context.get('fieldset') or (None, set(), set())
+
+        errors = {}
+        for param, names in [(FIELDS_PARAM, fields or set()), (OMIT_PARAM, omit), (INCLUDE_PARAM, include)]:
+            unknown = names - set(self.fields)
+            if unknown:
+                errors[param] = [f'Неизвестные поля: {", ".join(sorted(unknown))}']
+        if errors:
+            raise ValidationError(errors)
+
+        for name in list(self.fields):
+            if fields is not None:
+                drop = name not in fields
+            else:
+                drop = name in self.optional_fields and name not in include
+            if drop or name in omit:
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """Разбор ?fields=, ?omit= и ?include= для ViewSet, сериализатор - с SparseFieldsetSerializerMixin"""
+    sparse_fieldset_actions = ['list', 'retrieve']
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action not in self.sparse_fieldset_actions:
+            return context
+
+        params = self.request.query_params
+        fields = parse_names(params.get(FIELDS_PARAM, '')) or None
+        omit = parse_names(params.get(OMIT_PARAM, ''))
+        include = parse_names(params.get(INCLUDE_PARAM, ''))
+        if fields is not None or omit or include:
+            context['fieldset'] = (fields, omit, include)
+        return context
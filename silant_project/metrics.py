@@ -0,0 +1,208 @@
+"""
+Метрики запросов к серверу и /api/metrics в текстовом формате Prometheus.
+
+RequestMetricsMiddleware для каждого запроса замеряет время ответа, число и
+суммарное время SQL-запросов (через connection.execute_wrapper), размер и
+статус ответа и накапливает их по имени маршрута (view_name) и HTTP-методу.
+Медленные запросы пишутся в журнал 'silant.metrics' вместе с самыми долгими
+SQL-запросами.
+
+Метрики хранятся в памяти процесса: при нескольких процессах сервера
+каждый процесс отдает свои значения.
+"""
+import heapq
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .scoping import has_full_access
+
+logger = logging.getLogger('silant.metrics')
+
+# Границы корзин гистограммы времени ответа, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_TEXT_LIMIT = 500
+
+
+class QueryCollector:
+    """Обертка выполнения SQL: число запросов, суммарное время и самые долгие запросы"""
+
+    def __init__(self, top=5):
+        self.top = top
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            entry = (duration, self.count, sql[:SQL_TEXT_LIMIT])
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def top_queries(self):
+        return sorted(self.slowest, reverse=True)
+
+
+class MetricsRegistry:
+    """Накопленные метрики по (маршрут, метод)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = {}
+        self.statuses = {}
+
+    def observe(self, view, method, status, duration, queries, query_duration, size):
+        key = (view, method)
+        with self.lock:
+            stats = self.requests.get(key)
+            if stats is None:
+                stats = self.requests[key] = {
+                    'buckets': [0] * len(LATENCY_BUCKETS),
+                    'count': 0,
+                    'duration': 0.0,
+                    'queries': 0,
+                    'query_duration': 0.0,
+                    'bytes': 0,
+                }
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][index] += 1
+                    break
+            stats['count'] += 1
+            stats['duration'] += duration
+            stats['queries'] += queries
+            stats['query_duration'] += query_duration
+            stats['bytes'] += size
+            status_key = (view, method, str(status))
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+
+    def render(self):
+        """Текстовый формат Prometheus (version 0.0.4)"""
+        with self.lock:
+            requests = {key: {**stats, 'buckets': list(stats['buckets'])} for key, stats in self.requests.items()}
+            statuses = dict(self.statuses)
+
+        lines = [
+            '# HELP silant_http_requests_total Количество запросов по маршруту, методу и статусу',
+            '# TYPE silant_http_requests_total counter',
+        ]
+        for (view, method, status), count in sorted(statuses.items()):
+            lines.append(f'silant_http_requests_total{labels(view=view, method=method, status=status)} {count}')
+
+        lines += [
+            '# HELP silant_http_request_duration_seconds Время ответа',
+            '# TYPE silant_http_request_duration_seconds histogram',
+        ]
+        for (view, method), stats in sorted(requests.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                cumulative += count
+                lines.append(
+                    f'silant_http_request_duration_seconds_bucket'
+                    f'{labels(view=view, method=method, le=repr(bound))} {cumulative}'
+                )
+            lines.append(
+                f'silant_http_request_duration_seconds_bucket'
+                f'{labels(view=view, method=method, le="+Inf")} {stats["count"]}'
+            )
+            lines.append(f'silant_http_request_duration_seconds_sum{labels(view=view, method=method)} {stats["duration"]:.6f}')
+            lines.append(f'silant_http_request_duration_seconds_count{labels(view=view, method=method)} {stats["count"]}')
+
+        for name, field, help_text, fmt in [
+            ('silant_db_queries_total', 'queries', 'Количество SQL-запросов', '{}'),
+            ('silant_db_query_duration_seconds_total', 'query_duration', 'Суммарное время SQL-запросов', '{:.6f}'),
+            ('silant_http_response_bytes_total', 'bytes', 'Суммарный размер ответов', '{}'),
+        ]:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (view, method), stats in sorted(requests.items()):
+                lines.append(f'{name}{labels(view=view, method=method)} {fmt.format(stats[field])}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in values.items()) + '}'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """Замер времени ответа, SQL-запросов, размера и статуса каждого запроса"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500) / 1000
+        self.top_queries = getattr(settings, 'METRICS_SLOW_SQL_TOP', 5)
+
+    def __call__(self, request):
+        collector = QueryCollector(top=self.top_queries)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        # Размер потокового ответа заранее неизвестен
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(
+            view, request.method, response.status_code,
+            duration, collector.count, collector.duration, size
+        )
+
+        if duration >= self.slow_request:
+            self.log_slow_request(request, view, response, duration, collector)
+        return response
+
+    def log_slow_request(self, request, view, response, duration, collector):
+        queries = '\n'.join(
+            f'  {query_duration * 1000:.1f} мс: {sql}'
+            for query_duration, _, sql in collector.top_queries()
+        )
+        logger.warning(
+            'Медленный запрос %s %s (%s) -> %s: %.0f мс, SQL: %s за %.0f мс\n%s',
+            request.method, request.get_full_path(), view, response.status_code,
+            duration * 1000, collector.count, collector.duration * 1000, queries
+        )
+
+
+def metrics_view(request):
+    """
+    /api/metrics: при заданном METRICS_TOKEN доступ по заголовку
+    'Authorization: Bearer <токен>', иначе - менеджерам и администраторам
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        # Сравнение за постоянное время: время ответа не подсказывает токен
+        allowed = hmac.compare_digest(
+            request.headers.get('Authorization', '').encode('utf-8'), f'Bearer {token}'.encode('utf-8')
+        )
+    else:
+        allowed = request.user.is_authenticated and has_full_access(request.user)
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
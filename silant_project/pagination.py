@@ -0,0 +1,239 @@
+"""
+Пагинация списков API.
+
+По умолчанию используется постраничная пагинация (?page=N). Для больших
+таблиц доступен режим курсора (?pagination=cursor, далее ?cursor=...):
+страница выбирается условием по ключу сортировки (keyset), без COUNT(*)
+и OFFSET, поэтому любая страница стоит столько же, сколько первая.
+"""
+import base64
+import json
+from datetime import date
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def is_nullable(model, path):
+    """Может ли ключ сортировки быть NULL: поле с null=True или обратная связь на пути"""
+    for attr in path.split('__'):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # Аннотация - значение неизвестно
+            return True
+        if field.null or (field.is_relation and not field.concrete):
+            return True
+        if not field.is_relation:
+            return False
+        model = field.related_model
+    return False
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация.
+
+    Ключ - сортировка представления (ordering или разрешенный ordering_fields
+    параметр ?ordering=) плюс id как уникальный дополнительный ключ.
+    Курсор хранит значения ключа последней (первой) строки страницы.
+    """
+    page_size = PageNumberPagination.page_size
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(term) for term in ordering]
+        self.nullable = {
+            term.lstrip('-') for term in ordering if is_nullable(queryset.model, term.lstrip('-'))
+        }
+        # Значения ключа выбираются в том же запросе (поля могут быть отложены через only)
+        queryset = queryset.annotate(**{
+            self.key_name(index): F(term.lstrip('-')) for index, term in enumerate(ordering)
+        }).order_by(*[self.order_term(term) for term in ordering])
+        if cursor is not None:
+            queryset = queryset.filter(self.after(ordering, cursor['position']))
+
+        # Одна лишняя строка показывает, есть ли следующая страница
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None and (has_more or not reverse)
+        return results
+
+    def get_ordering(self, request, queryset, view):
+        """Сортировка из OrderingFilter представления + id для однозначности"""
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+
+        ordering = [term for term in ordering if term.lstrip('-') not in ('id', 'pk')]
+        descending = bool(ordering) and ordering[0].startswith('-')
+        return ordering + ['-id' if descending else 'id']
+
+    @staticmethod
+    def invert(term):
+        return term[1:] if term.startswith('-') else f'-{term}'
+
+    def order_term(self, term):
+        """
+        Сортировка по полю ключа. NULL (например, нет строки сводки машины)
+        считается наибольшим значением: в конце по возрастанию, в начале по убыванию
+        """
+        field = term.lstrip('-')
+        if field not in self.nullable:
+            return term
+        if term.startswith('-'):
+            return F(field).desc(nulls_first=True)
+        return F(field).asc(nulls_last=True)
+
+    def after(self, ordering, position):
+        """
+        Условие "строка идет после курсора" для лексикографического ключа:
+        (a > x) OR (a = x AND b > y) OR ... с NULL как наибольшим значением
+        """
+        condition = Q()
+        equal = Q()
+        for term, value in zip(ordering, position):
+            field = term.lstrip('-')
+            descending = term.startswith('-')
+            if value is None:
+                # После NULL по убыванию идут все непустые значения, по возрастанию - ничего
+                later = Q(**{f'{field}__isnull': False}) if descending else None
+                same = Q(**{f'{field}__isnull': True})
+            else:
+                later = Q(**{f'{field}__{"lt" if descending else "gt"}': value})
+                if field in self.nullable and not descending:
+                    later |= Q(**{f'{field}__isnull': True})
+                same = Q(**{field: value})
+            if later is not None:
+                condition |= equal & later
+            equal &= same
+        return condition
+
+    @staticmethod
+    def key_name(index):
+        return f'cursor_key_{index}'
+
+    def position(self, instance):
+        """Значения ключа сортировки для строки"""
+        values = []
+        for index in range(len(self.ordering)):
+            value = getattr(instance, self.key_name(index))
+            if isinstance(value, date):
+                value = value.isoformat()
+            values.append(value)
+        return values
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position = cursor['p']
+            reverse = bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return {'position': position, 'reverse': reverse}
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        ).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SilantPagination(BasePagination):
+    """
+    Постраничная пагинация с опциональным курсорным режимом.
+    Курсорный режим включается параметром ?pagination=cursor
+    (ссылки next/previous уже содержат курсор)
+    """
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.paginator = None
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.paginator = KeysetPagination()
+        else:
+            self.paginator = PageNumberPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination().get_paginated_response_schema(schema)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def to_html(self):
+        return self.paginator.to_html()
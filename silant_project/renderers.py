@@ -0,0 +1,76 @@
+"""
+Быстрые JSON-рендерер и парсер на orjson.
+
+Рендерер выбирается по запросу: заголовком
+'Accept: application/json; engine=orjson' или параметром ?format=orjson.
+Обычный 'Accept: application/json' и '*/*' по-прежнему отдает JSONRenderer
+DRF. Парсер принимает тела 'application/json' вместо JSONParser.
+
+orjson сам сериализует даты и время, UUID и строки без экранирования
+(UTF-8); Decimal, timedelta, ленивые строки и QuerySet передаются
+кодировщику DRF, поэтому ответ совпадает с JSONRenderer по содержанию.
+Если orjson не установлен, оба класса работают как стандартные DRF.
+
+Тип с параметром (engine=orjson) DRF не сопоставляет с 'Accept: */*',
+поэтому ?format= выбирается ContentNegotiation без сверки с Accept.
+"""
+from rest_framework.exceptions import NotAcceptable, ParseError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость
+    orjson = None
+
+ORJSON_OPTIONS = 0
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+default_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    media_type = 'application/json; engine=orjson'
+    format = 'orjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type or self.media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        content = orjson.dumps(data, default=default_encoder.default, option=options)
+        # Как JSONRenderer: U+2028/U+2029 экранируются, чтобы ответ был корректным JavaScript
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class ContentNegotiation(DefaultContentNegotiation):
+    """Явно указанный формат (?format= или суффикс) выбирает рендерер независимо от Accept"""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            format = format_suffix or request.query_params.get(self.settings.URL_FORMAT_OVERRIDE)
+            if not format:
+                raise
+            renderer = self.filter_renderers(renderers, format)[0]
+            return renderer, renderer.media_type
@@ -0,0 +1,100 @@
+"""
+Чтение с реплики базы данных (псевдоним 'replica' в DATABASES).
+
+ReplicaRoutingMiddleware отправляет на реплику чтение в запросах безопасными
+методами (GET, HEAD, OPTIONS) к представлениям DRF: списки, карточки,
+аналитика. Представление с read_from_replica = False читает с основной
+базы (лента изменений: курсор не должен обгонять отставание реплики).
+
+Запись всегда идет в основную базу. После запроса, который что-то записал,
+браузеру ставится cookie PRIMARY_COOKIE на REPLICA_PIN_SECONDS: пока она
+есть, все запросы этого клиента читают с основной базы и видят свои
+изменения. В рамках одного запроса после записи и внутри транзакции чтение
+тоже идет с основной базы.
+
+Без реплики в DATABASES маршрутизатор ничего не меняет. Кэши, которые
+заполняются при чтении (справочники, аналитика, публичные карточки), могут
+получить данные реплики с отставанием до следующей инвалидации.
+"""
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.views import APIView
+
+REPLICA_DATABASE = 'replica'
+PRIMARY_COOKIE = 'silant_primary'
+
+routing_state = contextvars.ContextVar('silant_db_routing', default=None)
+
+
+class RoutingState:
+    """Маршрутизация текущего запроса: чтение с реплики и была ли запись"""
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def replica_configured():
+    """Реплика задана и это другая база (в тестах она - зеркало основной, TEST MIRROR)"""
+    if REPLICA_DATABASE not in settings.DATABASES:
+        return False
+    replica = connections[REPLICA_DATABASE].settings_dict
+    primary = connections[DEFAULT_DB_ALIAS].settings_dict
+    return any(replica[key] != primary[key] for key in ('NAME', 'HOST', 'PORT'))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA_DATABASE
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Чтение с реплики для безопасных запросов к API и закрепление клиента за основной базой после записи"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote and replica_configured():
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'cls', None)
+        routing_state.get().use_replica = (
+            replica_configured()
+            and request.method in SAFE_METHODS
+            and PRIMARY_COOKIE not in request.COOKIES
+            and view is not None and issubclass(view, APIView)
+            and getattr(view, 'read_from_replica', True)
+        )
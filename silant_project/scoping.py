@@ -0,0 +1,62 @@
+"""
+Область видимости записей по роли пользователя.
+
+Одно правило для машин, ТО и рекламаций (представления, права, админка):
+- менеджер и суперпользователь видят все записи;
+- клиент - записи своих машин (Machine.client);
+- сервисная организация - записи обслуживаемых машин (Machine.service_organization);
+- анонимные пользователи и пользователи без роли видят все записи только
+  там, где список публичный (машины), иначе - ничего.
+
+Фильтр накладывается в SQL (Model.objects.for_user(user)), поэтому объект,
+полученный через такой queryset, уже проверен - отдельная проверка
+владельца в has_object_permission не нужна.
+"""
+from django.db import models
+
+
+def has_full_access(user):
+    return user.is_superuser or getattr(user, 'role', None) == 'manager'
+
+
+def scope_key(user):
+    """Ключ области видимости для кэшей: полный доступ у всех один, остальные видят только свое"""
+    if has_full_access(user):
+        return 'manager'
+    return f'{getattr(user, "role", None)}-{user.pk}'
+
+
+def has_role(user):
+    """Пользователь с ролью системы (или суперпользователь)"""
+    return user.is_superuser or getattr(user, 'role', None) in ('manager', 'client', 'service')
+
+
+class RoleScopedQuerySet(models.QuerySet):
+    # Путь от модели к машине: '' для Machine, 'machine__' для ТО и рекламаций
+    machine_path = 'machine__'
+    # Видят ли анонимные пользователи и пользователи без роли все записи
+    public = False
+
+    def for_user(self, user):
+        """Записи, доступные пользователю"""
+        if user is None or not user.is_authenticated:
+            return self.all() if self.public else self.none()
+        if has_full_access(user):
+            return self.all()
+
+        role = getattr(user, 'role', None)
+        if role == 'client':
+            return self.filter(**{f'{self.machine_path}client': user})
+        if role == 'service':
+            return self.filter(**{f'{self.machine_path}service_organization': user})
+        return self.all() if self.public else self.none()
+
+    def editable_by(self, user):
+        """
+        Записи, к которым пользователь может добавлять данные (ТО, рекламации):
+        та же область видимости, но без публичного доступа для анонимных
+        пользователей и пользователей без роли
+        """
+        if user is None or not user.is_authenticated or not has_role(user):
+            return self.none()
+        return self.for_user(user)
@@ -0,0 +1,252 @@
+"""
+Полнотекстовый поиск для параметра ?search=.
+
+SQLite: виртуальная таблица FTS5 <таблица>_fts с внешним содержимым,
+синхронизируется триггерами на INSERT/UPDATE/DELETE (в том числе при
+bulk_create и queryset.update).
+PostgreSQL: GIN-индекс по выражению to_tsvector(...) - поддерживается
+самой базой, триггеры не нужны.
+
+Индексы создаются миграциями приложений через create_fulltext_index /
+drop_fulltext_index, поиск выполняет FullTextSearchFilter. SQLite при
+AddField/AlterField пересоздает таблицу без триггеров, поэтому такие
+миграции удаляют индекс до изменения таблицы и создают заново после.
+"""
+import operator
+import re
+from functools import reduce
+
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import Expression, RawSQL
+from django.db.models.sql.constants import INNER, LOUTER
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+WORD_RE = re.compile(r'\w+')
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def tsvector_sql(fields, config, table=None):
+    """Выражение tsvector (одинаковое для индекса и запроса)"""
+    prefix = f'"{table}".' if table else ''
+    document = " || ' ' || ".join(f"coalesce({prefix}\"{field}\", '')" for field in fields)
+    return f"to_tsvector('{config}', {document})"
+
+
+def create_fulltext_index(schema_editor, table, fields, config='simple'):
+    """Создание полнотекстового индекса для полей таблицы (вызывается из миграций)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        fts = fts_table(table)
+        columns = ', '.join(fields)
+        new_values = ', '.join(f'new.{field}' for field in fields)
+        old_values = ', '.join(f'old.{field}' for field in fields)
+        statements = [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            # Индексация уже существующих записей
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+    elif vendor == 'postgresql':
+        statements = [
+            f'CREATE INDEX {table}_fts_idx ON "{table}" USING GIN ({tsvector_sql(fields, config)})',
+        ]
+    else:
+        statements = []
+
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_index(schema_editor, table, fields, config='simple'):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        fts = fts_table(table)
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_fts_idx')
+
+
+class FullTextQuery:
+    """
+    Запрос к полнотекстовому индексу таблицы.
+    Каждое слово ищется как префикс ('шум' находит 'шумит'),
+    слова одного поискового термина - как фраза
+    """
+
+    def __init__(self, queryset, fields, config='simple'):
+        self.table = queryset.model._meta.db_table
+        self.fields = fields
+        self.config = config
+        self.vendor = connections[queryset.db].vendor
+
+    @property
+    def supported(self):
+        return self.vendor in ('sqlite', 'postgresql')
+
+    def term_query(self, term):
+        words = WORD_RE.findall(term.lower())
+        if not words:
+            return None
+        if self.vendor == 'sqlite':
+            return '"{}"*'.format(' '.join(words))
+        return ' <-> '.join(words) + ':*'
+
+    def any_query(self, terms):
+        queries = [query for query in map(self.term_query, terms) if query]
+        if not queries:
+            return None
+        separator = ' OR ' if self.vendor == 'sqlite' else ' | '
+        return separator.join(f'({query})' for query in queries)
+
+    def matching_ids(self, query):
+        """Подзапрос id записей, найденных индексом"""
+        if self.vendor == 'sqlite':
+            fts = fts_table(self.table)
+            return RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [query])
+        return RawSQL(
+            f'SELECT id FROM "{self.table}" '
+            f'WHERE {tsvector_sql(self.fields, self.config)} @@ to_tsquery(%s, %s)',
+            [self.config, query]
+        )
+
+    def annotate_rank(self, queryset, query):
+        """queryset с релевантностью search_rank: чем меньше, тем выше в выдаче"""
+        if self.vendor == 'sqlite':
+            # MATCH выполняется один раз: найденные записи присоединяются по id
+            queryset = queryset.all()
+            alias = queryset.query.join(
+                RankJoin(fts_table(self.table), query, queryset.query.get_initial_alias())
+            )
+            return queryset.annotate(search_rank=RankColumn(alias))
+        return queryset.annotate(search_rank=RawSQL(
+            f'-ts_rank({tsvector_sql(self.fields, self.config, self.table)}, to_tsquery(%s, %s))',
+            [self.config, query], output_field=FloatField()
+        ))
+
+
+class RankJoin:
+    """
+    LEFT JOIN (SELECT rowid, bm25(...) FROM <fts> WHERE <fts> MATCH ...) по id
+    для SQLite. Элемент Query.alias_map (интерфейс описан в Join): записи,
+    найденные не индексом (icontains по остальным полям), получают NULL
+    """
+    join_type = LOUTER
+    nullable = True
+    filtered_relation = None
+
+    def __init__(self, fts, query, parent_alias, table_alias=None):
+        self.fts = fts
+        self.query = query
+        self.table_name = f'{fts}_rank'
+        self.parent_alias = parent_alias
+        self.table_alias = table_alias
+
+    def as_sql(self, compiler, connection):
+        qn = compiler.quote_name_unless_alias
+        return (
+            f'{self.join_type} (SELECT rowid, bm25({self.fts}) AS score FROM {self.fts} '
+            f'WHERE {self.fts} MATCH %s) {qn(self.table_alias)} '
+            f'ON ({qn(self.table_alias)}.rowid = {qn(self.parent_alias)}."id")',
+            [self.query],
+        )
+
+    def relabeled_clone(self, change_map):
+        clone = self.__class__(
+            self.fts, self.query,
+            change_map.get(self.parent_alias, self.parent_alias),
+            change_map.get(self.table_alias, self.table_alias),
+        )
+        clone.join_type = self.join_type
+        return clone
+
+    def demote(self):
+        clone = self.relabeled_clone({})
+        clone.join_type = INNER
+        return clone
+
+    def promote(self):
+        clone = self.relabeled_clone({})
+        clone.join_type = LOUTER
+        return clone
+
+    @property
+    def identity(self):
+        return self.__class__, self.table_name, self.parent_alias, self.query
+
+    def __eq__(self, other):
+        if not isinstance(other, RankJoin):
+            return NotImplemented
+        return self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+
+class RankColumn(Expression):
+    """Столбец score присоединенного RankJoin"""
+
+    def __init__(self, alias):
+        super().__init__(output_field=FloatField())
+        self.alias = alias
+
+    def as_sql(self, compiler, connection):
+        return f'{compiler.quote_name_unless_alias(self.alias)}.score', []
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(change_map.get(self.alias, self.alias))
+
+    def get_group_by_cols(self):
+        return [self]
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter, который ищет по полям view.fulltext_fields через
+    полнотекстовый индекс, а по остальным search_fields - как обычно (icontains).
+    Без явного ?ordering= результаты сортируются по релевантности
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fulltext_fields = getattr(view, 'fulltext_fields', None)
+        search_terms = self.get_search_terms(request)
+        fulltext = FullTextQuery(
+            queryset, fulltext_fields or [], getattr(view, 'fulltext_config', 'simple')
+        )
+        if not fulltext_fields or not search_terms or not fulltext.supported:
+            return super().filter_queryset(request, queryset, view)
+
+        orm_lookups = [
+            self.construct_search(str(field), queryset)
+            for field in self.get_search_fields(view, request) or []
+            if field not in fulltext_fields
+        ]
+
+        conditions = []
+        for term in search_terms:
+            lookups = [Q(**{orm_lookup: term}) for orm_lookup in orm_lookups]
+            query = fulltext.term_query(term)
+            if query:
+                lookups.append(Q(pk__in=fulltext.matching_ids(query)))
+            conditions.append(reduce(operator.or_, lookups, Q(pk__in=[])))
+        queryset = queryset.filter(reduce(operator.and_, conditions))
+
+        rank_query = fulltext.any_query(search_terms)
+        if rank_query and api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = fulltext.annotate_rank(queryset, rank_query).order_by(
+                F('search_rank').asc(nulls_last=True), *queryset.query.order_by
+            )
+        return queryset
@@ -64,7 +64,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым - чтобы время ответа включало всю цепочку middleware
+    'silant_project.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # До сессий: запись сессии тоже закрепляет клиента за основной базой
+    'silant_project.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -100,14 +104,114 @@ AUTH_USER_MODEL = 'accounts.User'  # замените 'your_app' на назва
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# По умолчанию - SQLite (db.sqlite3), DB_ENGINE=postgresql - PostgreSQL.
+# Соединения переиспользуются между запросами (DB_CONN_MAX_AGE секунд) с
+# проверкой перед использованием. Для PostgreSQL вместо этого можно включить
+# пул psycopg (DB_POOL=1, нужен пакет psycopg[pool]); постоянные соединения
+# Django с пулом несовместимы, поэтому при пуле CONN_MAX_AGE = 0
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_POOL = os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'yes')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'silant'),
+            'USER': os.environ.get('DB_USER', 'silant'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                    'timeout': 10,
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    # journal_mode=WAL записывается в сам файл базы и при работе рядом с ним
+    # появляются -wal/-shm. db.sqlite3 из репозитория (демо-данные) остается в
+    # обычном режиме: WAL включается для баз из DB_NAME и DB_TEST_NAME или явно
+    # DB_SQLITE_WAL=1
+    DB_SQLITE_WAL = os.environ.get(
+        'DB_SQLITE_WAL', '1' if os.environ.get('DB_NAME') or os.environ.get('DB_TEST_NAME') else '',
+    ).lower() in ('1', 'true', 'yes')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Тестовая база - в памяти; DB_TEST_NAME - файл, чтобы тесты и
+            # benchmark_api работали с теми же PRAGMA, что и рабочая база
+            'TEST': {'NAME': os.environ.get('DB_TEST_NAME')},
+            'OPTIONS': {
+                # Ожидание блокировки записи другим процессом (busy_timeout), секунды
+                'timeout': 20,
+                # Транзакция сразу берет блокировку записи: параллельные транзакции
+                # ждут ее по timeout, а не получают "database is locked" при записи
+                'transaction_mode': 'IMMEDIATE',
+                # WAL: чтение не блокируется записью; synchronous=NORMAL в режиме WAL
+                # не теряет целостность при сбое процесса; mmap и кэш страниц - 256 и 64 МБ
+                'init_command': ';'.join([
+                    *(['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL'] if DB_SQLITE_WAL else []),
+                    'PRAGMA mmap_size=268435456',
+                    'PRAGMA cache_size=-65536',
+                    'PRAGMA temp_store=MEMORY',
+                ]),
+            },
+        }
+    }
+
+# Реплика для чтения (см. silant_project.replicas): DB_REPLICA_HOST для
+# PostgreSQL, DB_REPLICA_NAME - файл копии для SQLite. После записи клиент
+# REPLICA_PIN_SECONDS читает с основной базы; отставание реплики должно быть меньше
+if DB_ENGINE == 'postgresql' and os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+    }
+elif DB_ENGINE != 'postgresql' and os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {**DATABASES['default'], 'NAME': os.environ['DB_REPLICA_NAME']}
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['silant_project.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+
+# Лента изменений (/api/changes/): дочитанная лента возвращает курсор на
+# CHANGES_SETTLE_SECONDS назад. Запись из транзакции, зафиксированной позже,
+# чем через это время после изменения, клиент ленты пропустит
+CHANGES_SETTLE_SECONDS = int(os.environ.get('CHANGES_SETTLE_SECONDS', 5))
+
+
+# Cache
+# По умолчанию - кэш в памяти процесса. Для нескольких процессов сервера
+# можно указать общий бэкенд (Redis, Memcached), код от этого не меняется
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'silant',
     }
 }
 
 
+# Метрики запросов (/api/metrics)
+# Запросы дольше METRICS_SLOW_REQUEST_MS пишутся в журнал 'silant.metrics'
+# вместе с METRICS_SLOW_SQL_TOP самыми долгими SQL-запросами.
+# При заданном METRICS_TOKEN метрики доступны по заголовку Authorization: Bearer <токен>
+METRICS_SLOW_REQUEST_MS = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+METRICS_SLOW_SQL_TOP = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -155,6 +259,19 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # orjson - по запросу (Accept: application/json; engine=orjson или ?format=orjson),
+    # должен стоять раньше JSONRenderer; см. silant_project.renderers
+    'DEFAULT_RENDERER_CLASSES': [
+        'silant_project.renderers.ORJSONRenderer',
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'silant_project.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'silant_project.renderers.ContentNegotiation',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
@@ -0,0 +1,164 @@
+import io
+import json
+import re
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from directories.models import FailureNode
+from .metrics import LATENCY_BUCKETS, labels, registry
+from .renderers import ORJSONParser, ORJSONRenderer
+
+BUNDLE_VIEW = 'directories:directory-bundle'
+
+
+class RequestMetricsTests(TestCase):
+    """RequestMetricsMiddleware и /api/metrics в формате Prometheus"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        cls.client_user = User.objects.create_user('client', password='test', role='client')
+        FailureNode.objects.create(name='Двигатель')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.api = APIClient()
+
+    def metrics(self):
+        # metrics_view - обычное представление Django: пользователь из сессии
+        self.api.force_login(self.manager)
+        response = self.api.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode('utf-8')
+
+    def sample(self, text, name, **label_values):
+        match = re.search(rf'^{re.escape(name + labels(**label_values))} (\S+)$', text, re.MULTILINE)
+        self.assertIsNotNone(match, f'{name} {label_values}')
+        return float(match.group(1))
+
+    def test_observe(self):
+        # Первый ответ собирается из базы, второй - из кэша
+        first = self.api.get('/api/directories/bundle/')
+        second = self.api.get('/api/directories/bundle/')
+        self.api.get('/api/directories/bundle/', HTTP_IF_NONE_MATCH=second['ETag'])
+        self.api.get('/api/nothing-here/')
+
+        stats = registry.requests[(BUNDLE_VIEW, 'GET')]
+        self.assertEqual(stats['count'], 3)
+        self.assertGreater(stats['queries'], 0)
+        self.assertEqual(stats['bytes'], len(first.content) + len(second.content))
+        self.assertEqual(registry.statuses[(BUNDLE_VIEW, 'GET', '304')], 1)
+        self.assertEqual(registry.requests[('unresolved', 'GET')]['count'], 1)
+
+    def test_prometheus(self):
+        self.api.get('/api/directories/bundle/')
+        self.api.get('/api/directories/bundle/')
+        text = self.metrics()
+
+        self.assertIn('# TYPE silant_http_request_duration_seconds histogram', text)
+        self.assertEqual(self.sample(text, 'silant_http_requests_total', view=BUNDLE_VIEW, method='GET', status='200'), 2)
+        # Корзины накопительные, +Inf равна числу запросов
+        buckets = [
+            self.sample(text, 'silant_http_request_duration_seconds_bucket', view=BUNDLE_VIEW, method='GET', le=repr(bound))
+            for bound in LATENCY_BUCKETS
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(
+            self.sample(text, 'silant_http_request_duration_seconds_bucket', view=BUNDLE_VIEW, method='GET', le='+Inf'), 2
+        )
+        self.assertEqual(self.sample(text, 'silant_http_request_duration_seconds_count', view=BUNDLE_VIEW, method='GET'), 2)
+        self.assertGreater(self.sample(text, 'silant_db_queries_total', view=BUNDLE_VIEW, method='GET'), 0)
+
+    def test_label_escaping(self):
+        self.assertEqual(labels(view='a"b\\c\nd'), '{view="a\\"b\\\\c\\nd"}')
+
+    def test_access(self):
+        self.assertEqual(self.api.get('/api/metrics').status_code, 403)
+        self.api.force_login(self.client_user)
+        self.assertEqual(self.api.get('/api/metrics').status_code, 403)
+        self.api.force_login(self.manager)
+        self.assertEqual(self.api.get('/api/metrics').status_code, 200)
+        self.api.force_login(User.objects.create_superuser('admin', password='test'))
+        self.assertEqual(self.api.get('/api/metrics').status_code, 200)
+
+        # С токеном доступ только по заголовку Authorization
+        with override_settings(METRICS_TOKEN='metrics-token'):
+            self.assertEqual(self.api.get('/api/metrics').status_code, 403)
+            self.api.logout()
+            self.assertEqual(self.api.get('/api/metrics', HTTP_AUTHORIZATION='Bearer metrics-token').status_code, 200)
+            for authorization in ('Bearer metrics-toke', 'Bearer токен', ''):
+                self.assertEqual(self.api.get('/api/metrics', HTTP_AUTHORIZATION=authorization).status_code, 403)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        # Порог читается при создании middleware - нужен новый клиент
+        api = APIClient()
+        with self.assertLogs('silant.metrics', 'WARNING') as logs:
+            api.get('/api/directories/bundle/')
+        self.assertIn('Медленный запрос GET /api/directories/bundle/ (directories:directory-bundle) -> 200', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+class ORJSONTests(TestCase):
+    """Рендерер и парсер orjson и выбор рендерера (silant_project.renderers)"""
+
+    URL = '/api/directories/bundle/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='test', role='manager')
+        FailureNode.objects.create(name='Двигатель\u2028"узел"')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+
+    def test_negotiation(self):
+        default = self.api.get(self.URL, HTTP_ACCEPT='*/*')
+        self.assertEqual(default['Content-Type'], 'application/json')
+        self.assertEqual(self.api.get(self.URL, HTTP_ACCEPT='application/json')['Content-Type'], 'application/json')
+
+        # orjson - только по явному запросу, содержимое то же
+        for params, accept in (({}, 'application/json; engine=orjson'), ({'format': 'orjson'}, '*/*'),
+                               ({'format': 'orjson'}, 'text/html')):
+            with self.subTest(params=params, accept=accept):
+                response = self.api.get(self.URL, params, HTTP_ACCEPT=accept)
+                self.assertEqual(response['Content-Type'], 'application/json; engine=orjson')
+                self.assertEqual(json.loads(response.content), json.loads(default.content))
+        self.assertEqual(self.api.get(self.URL, {'format': 'yaml'}).status_code, 404)
+
+    def test_render(self):
+        data = {
+            'amount': Decimal('1.50'),
+            'moment': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            'name': gettext_lazy('Двигатель'),
+            'text': 'a\u2028b\u2029c',
+            1: 'ключ-число',
+        }
+        content = ORJSONRenderer().render(data)
+        # Как JSONRenderer: разделители строк JavaScript экранированы
+        self.assertNotIn('\u2028'.encode('utf-8'), content)
+        self.assertEqual(json.loads(content), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_parse(self):
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"имя": [1, 2.5, null]}'.encode('utf-8'))), {'имя': [1, 2.5, None]})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{'))
+
+        # Тела application/json разбирает ORJSONParser
+        self.api.force_authenticate(self.manager)
+        response = self.api.post('/api/maintenance/', '{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.data['detail'])